@@ -17,36 +17,51 @@
 # US Patents 2008-2021: US7424516, US20140161250, US20140177813, US8638908, US8068604, US8553852, US10530923, US10530924
 # China Patent: CN102017585  -  Europe Patent: EU2156652  -  Patents Pending
 
-import base64
 import os
-import shutil
 import json
 import re
-import git
-import random
-import difflib
 import datetime
 import time
 
 from copy import deepcopy
+from functools import partial
+from threading import Thread
 from adapt.intent import IntentBuilder
-from git import InvalidGitRepositoryError
 
-from mycroft.audio import wait_while_speaking
 from ovos_bus_client import Message
 from mycroft.skills.core import intent_handler
 from neon_utils.message_utils import get_message_user, request_from_mobile, request_for_neon, build_message
 from neon_utils.skills.neon_skill import NeonSkill
 from neon_utils.user_utils import get_user_prefs
-from neon_utils.web_utils import scrape_page_for_links as scrape
-from neon_utils.parse_utils import clean_quotes
 from ovos_utils import classproperty
 from ovos_utils.log import LOG
 from ovos_utils.process_utils import RuntimeRequirements
-from mycroft.util.parse import normalize
-from mycroft.util.audio_utils import play_audio_file
 
 from .utils_emulate import Conversation, ConversationManager
+from .utils_match import PerspectiveTranslator, get_option_matcher, build_phrase_index, normalize_phrase
+from .utils_prefetch import Prefetcher
+from .utils_replay import SessionRecorder
+from .utils_eval import ExpressionError, compile_expression, evaluate_expression, get_compiled_expression
+from .utils_isolation import IsolatedPool
+from .utils_mail import EmailQueue, OutboundEmail, send_each
+from .utils_transcript import TRANSCRIPT_DB, TranscriptStore, TranscriptCompactor, transcript_source
+from .utils_sync import ScriptSyncWorker
+from .utils_scheduler import ScriptScheduler
+from .utils_script import MANIFEST_FILENAME, ScriptIndex, ScriptIndexCache, ScriptCatalog, load_manifest, \
+    get_manifest_entry, validate_compiled_script, get_current_container, read_compiled_script, LineData, OP_RUNTIME, OP_RUNTIME_RAW, OP_VARIABLE, OP_INVALID
+
+# Heavy or rarely used dependencies (git, bs4, nltk, difflib, audio playback) are imported on first use to keep skill
+# load off the boot critical path
+
+
+def clean_quotes(raw_utt: str) -> str:
+    """
+    Strips quotes from a fully quoted string; see `neon_utils.parse_utils.clean_quotes` (imported on first use)
+    :param raw_utt: Input string to be cleaned
+    :return: string with all paired quote characters removed
+    """
+    from neon_utils.parse_utils import clean_quotes as _clean_quotes
+    return _clean_quotes(raw_utt)
 
 # TIMEOUT = 8
 
@@ -94,18 +109,23 @@ class CustomConversations(NeonSkill):
         self.text_location = f"{self.__location__}/script_txt"
         self.audio_location = f"{self.__location__}/script_audio"
         self.transcript_location = f"{self.__location__}/script_transcript"
+        self.session_location = f"{self.__location__}/script_sessions"
 
         # self.update_message = False
         self.reload_skill = False  # This skill should not be reloaded or else active users break
         self.runtime_execution, self.variable_functions = {}, {}
-        self.perspective_changes = {"am": "are",
-                                    "your": "my",
-                                    "my": "your",
-                                    "me": "you",
-                                    "i": "you",
-                                    "you": "i",
-                                    "myself": "yourself",
-                                    "yourself": "myself"}
+        self._opcode_table = list()
+        # Words swapped in captured input, by script language (English is used for languages not listed)
+        self.perspective_changes = {"en": {"am": "are",
+                                           "your": "my",
+                                           "my": "your",
+                                           "me": "you",
+                                           "i": "you",
+                                           "you": "i",
+                                           "myself": "yourself",
+                                           "yourself": "myself"}}
+        self._perspective_translators = dict()  # Dict of languages to PerspectiveTranslator
+        self._phrase_audio = dict()  # Dict of script audio directory names to dict of normalized phrase to recording
 
         # Commands that should not carry over to subsequent lines implicitly
         self.no_implicit_multiline = ("if", "else", "case", "loop", "goto", "tag", "@")
@@ -113,8 +133,17 @@ class CustomConversations(NeonSkill):
         # Commands for which wildcards (*) should be replaced with unique variable names
         self.substitute_wildcards = ("sub_key", "sub_values")
 
+        # Commands compiled once per process; variables are bound at evaluation instead of substituted into text
+        self.bound_variable_commands = ("python",)
+        # ScriptIndex per script shared by conversations, rebuilt when the compiled script changes
+        self._script_indexes = ScriptIndexCache(self._build_script_index)
+        # Per-user turn budgets so one looping script can't hold the thread serving other users
+        self._scheduler = ScriptScheduler()
+        # Input-independent dependencies (table_scrape pages, Run targets) fetched while scripts wait for input
+        self._prefetcher = Prefetcher()
+
         # Commands that exist in a script before executable code
-        self.header_options = ("script", "description", "author", "timeout", "claps", "synonym")
+        self.header_options = ("script", "description", "author", "timeout", "claps", "synonym", "speak mode")
 
         # If statement comparators
         self.string_comparators = ("IN", "CONTAINS", "STARTSWITH", "ENDSWITH")
@@ -125,6 +154,25 @@ class CustomConversations(NeonSkill):
         self.speak_timeout = 5
         self.response_timeout = 10
 
+        # Background worker updating `text_location` from git; hold its lock while reading compiled scripts
+        self._script_sync = ScriptSyncWorker(self.text_location, on_change=self._on_scripts_changed)
+        # Results of `neon-cc-precompile` for `text_location`, reloaded when the manifest file changes
+        self._script_manifest = dict()
+        self._script_manifest_mtime = None
+        # Details and synonyms of the scripts in `text_location`, read from the manifest or container headers
+        self._script_catalog = ScriptCatalog(self.text_location, self.file_ext)
+        self._registered_synonyms = set()
+        # Records session inputs to `session_location` for replay when "record_sessions" is enabled
+        self._session_recorder = None
+        # Worker processes evaluating `Python:` lines when "isolate_scripts" is enabled
+        self._isolation = None
+        # Emails from scripts and email requests, sent in the background so handlers return once an email is queued
+        self._email_queue = EmailQueue(self._send_email_batch)
+        # Indexed copy of transcripts in `transcript_location` when "index_transcripts" is enabled
+        self._transcript_store = None
+        # Archives finished transcript files in the background when "compact_transcripts" is enabled
+        self._transcript_compactor = None
+
     @classproperty
     def runtime_requirements(self):
         return RuntimeRequirements(network_before_load=True,
@@ -184,6 +232,8 @@ class CustomConversations(NeonSkill):
             "profile": self._variable_profile,
             "skill": self._variable_skill
         }
+        # Handlers by opcode of compiled script instructions (see `ScriptIndex.compile_instructions`)
+        self._opcode_table = list(self.runtime_execution.values()) + list(self.variable_functions.values())
 
         # # Catch invalid/uninitialized update key
         # if not self.settings.get("updates"):
@@ -204,29 +254,64 @@ class CustomConversations(NeonSkill):
         self.add_event("neon.run_alert_script", self.handle_start_script)
         self.add_event("neon.friendly_chat", self._run_friendly_chat)
         self.add_event('speak', self.check_speak_event)
+        self.add_event("neon.script_resume", self._handle_resume_script)
+        self.add_event("neon.script_scheduler_metrics", self._handle_scheduler_metrics)
+        self.add_event("neon.script_prefetch_metrics", self._handle_prefetch_metrics)
+        self.add_event("neon.script_isolation_metrics", self._handle_isolation_metrics)
+        self.add_event("neon.script_catalog", self._handle_script_catalog)
+        self.add_event("neon.script_email_metrics", self._handle_email_metrics)
+        self.add_event("neon.script_transcripts", self._handle_transcript_query)
+        self.add_event("neon.script_transcript_runs", self._handle_transcript_runs)
+        self.add_event("neon.script_compaction_metrics", self._handle_compaction_metrics)
+        if self.settings.get("record_sessions"):
+            self._session_recorder = SessionRecorder(self.session_location)
+        if self.settings.get("isolate_scripts"):
+            self._isolation = IsolatedPool(workers=self.settings.get("isolated_workers") or 2,
+                                           preload=(evaluate_expression.__module__,))
+        if self.settings.get("index_transcripts"):
+            self._transcript_store = TranscriptStore(os.path.join(self.transcript_location, TRANSCRIPT_DB))
+        if self.settings.get("compact_transcripts"):
+            try:
+                self._transcript_compactor = TranscriptCompactor(self.transcript_location,
+                                                                 self.settings.get("transcript_archive_by") or "day",
+                                                                 self.settings.get("transcript_retention_days") or 0)
+            except ValueError as e:
+                LOG.error(e)
+        if self._transcript_store or self._transcript_compactor:
+            Thread(target=self._prepare_transcripts, name="TranscriptIngest", daemon=True).start()
+        # Scanning scripts and registering their synonyms is deferred so it doesn't delay skill load
+        Thread(target=self._prepare_script_catalog, name="ScriptCatalog", daemon=True).start()
         LOG.debug(">>> CC Skill Initialized! <<<")
 
         if self.auto_update:
             self._update_scripts()
 
+    def shutdown(self):
+        self._script_sync.stop()
+        self._prefetcher.shutdown()
+        self._email_queue.stop(10)
+        if self._isolation:
+            self._isolation.shutdown()
+        if self._session_recorder:
+            self._session_recorder.close()
+        if self._transcript_compactor:
+            self._transcript_compactor.stop(10)
+        if self._transcript_store:
+            self._transcript_store.close()
+        NeonSkill.shutdown(self)
+
     @intent_handler(IntentBuilder("UpdateScripts").require("UpdateScripts").optionally("Neon").build())
     def handle_update_scripts(self, message):
         if self.allow_update:
             LOG.debug(message)
             self.speak_dialog("update_started")
-            success = self._update_scripts()
-            time.sleep(1)
-            if success:
-                self.speak_dialog("update_success", message=message)
-            else:
-                self.speak_dialog("update_failed", message=message)
+            self._update_scripts(message)
         else:
             self.speak_dialog("update_disallowed")
 
     @intent_handler(IntentBuilder("TellAvailableScripts").require('tell').build())
     def handle_tell_available(self, message):
-        available = [os.path.splitext(x)[0].replace("_", " ") for x in os.listdir(self.text_location)
-                     if os.path.isfile(os.path.join(self.text_location, x)) and x.endswith(".ncs")]
+        available = [name.replace("_", " ") for name in self._get_script_catalog().names]
         LOG.info(available)
         if available:
             self.speak_dialog("available_script", {"available": f'{", ".join(available[:-1])}, and {available[-1]}'})
@@ -236,6 +321,18 @@ class CustomConversations(NeonSkill):
                 # self.mobile_skill_intent("scripts_list", {"files": available}, message)
                 # self.socket_io_emit("scripts_list", f"&files={available}", message.context["flac_filename"])
 
+    @intent_handler(IntentBuilder("StartSynonym").require("ScriptSynonym").build())
+    def handle_start_synonym(self, message):
+        """
+        Starts the script declaring a synonym spoken by the user
+        :param message: Message object
+        """
+        script_name = self._get_script_catalog().match_synonym(message.data.get("utterance", ""))
+        LOG.info(f"Synonym for {script_name}")
+        if script_name:
+            message.data["file_to_run"] = script_name
+            self.handle_start_script(message)
+
     @intent_handler(IntentBuilder("SetDefault").require('default'))
     def handle_set_default(self, message):
         utt = message.data.get("utterance")
@@ -275,13 +372,12 @@ class CustomConversations(NeonSkill):
                 email_addr = preference_user["email"]
 
                 if email_addr:
-                    with open(file_to_send, "rb") as f:
-                        encoded = base64.b64encode(f.read()).decode("utf-8")
-                    attachments = {f"{script_name}.txt": encoded}
+                    # The attachment is read and encoded when the email is sent
+                    attachments = {f"{script_name}.txt": file_to_send}
                     # LOG.debug(f"file copied to {dest}")
                     title = f"Neon Script: {script_name.replace('_', ' ')}"
                     body = f"\nAttached is your requested Neon Script: {script_name}\n\n-Neon"
-                    self.send_email(title, body, email_addr=email_addr, attachments=attachments)
+                    self._email_queue.enqueue(OutboundEmail(email_addr, title, body, attachments))
                     self.speak_dialog("email_sent", {"script": script_name, "email": email_addr})
                 else:
                     self.speak_dialog("no_email")
@@ -299,6 +395,9 @@ class CustomConversations(NeonSkill):
         LOG.debug(message.data.get("utterance"))
         file_to_run = message.data.get('file_to_run')
         script_filename = file_to_run.rstrip().replace(" ", "_").replace("-", "_")
+        if not os.path.isfile(os.path.join(self.text_location, script_filename + self.file_ext)):
+            # The requested name may be a synonym declared by a script
+            script_filename = self._get_script_catalog().match_synonym(file_to_run) or script_filename
         LOG.info(script_filename)
         # active_dict = self.active_conversations.get(user).get_current_conversation()
         # LOG.info(f"Active dict is {active_dict}")
@@ -328,10 +427,9 @@ class CustomConversations(NeonSkill):
             # We have this in cache now, load values from there
             LOG.debug("Loading from Cache!")
             try:
-                cache = self.get_cached_data(script_filename + self.file_ext,
-                                             os.path.join(self.__location__, "script_txt"))
-                # TODO: Claps and Synonyms here! DM
-                LOG.info(json.dumps(cache, indent=4))
+                cache, script_index = self._load_compiled_script(script_filename)
+                # TODO: Claps here! DM
+                LOG.debug(f'Loaded {script_filename} (compiler version {cache[9].get("cversion")})')
             except Exception as e:
                 LOG.error(e)
                 # active_dict = self._load_to_cache(active_dict, file_to_run, user)
@@ -349,22 +447,33 @@ class CustomConversations(NeonSkill):
             except Exception as e:
                 LOG.error(e)
                 script_meta = None
+            header = None
+            if self._session_recorder:
+                header = self._session_recorder.start_session(user, script_filename)
+                self._session_recorder.record(user, "start", message.msg_type, message.data, message.context)
             # initialize conversation
             self._init_conversation(user=user, script_meta=script_meta, script_filename=script_filename)
+            if header:
+                # Seed this user's random choices so the session can be replayed without affecting other users
+                self.active_conversations[user].rng.seed(header["seed"])
             active_dict = self.active_conversations.get(user).get_current_conversation()
 
             self.update_transcript(f'RUNNING SCRIPT {active_dict["script_filename"]}\n',
                                    filename=active_dict["script_filename"],
-                                   start_time=active_dict["script_start_time"]
+                                   start_time=active_dict["script_start_time"],
+                                   user=user
                                    )
             try:
-                active_dict["formatted_script"] = cache[0]
+                # Script lines are shared by every conversation running this script; variables are per conversation
+                active_dict["formatted_script"] = script_index.formatted_script
                 active_dict["speaker_data"] = cache[1]
                 active_dict["variables"] = cache[2]
-                active_dict["loops_dict"] = cache[3]
-                active_dict["goto_tags"] = cache[4]
+                active_dict["loops_dict"] = script_index.loops_dict
+                active_dict["goto_tags"] = script_index.goto_tags
                 active_dict["timeout"] = cache[5]
                 active_dict["timeout_action"] = cache[6]
+                active_dict["script_index"] = script_index
+                self._get_phrase_audio(active_dict)
                 # active_dict["script_meta"] = cache[9]
             except Exception as e:
                 LOG.error(e)
@@ -375,7 +484,7 @@ class CustomConversations(NeonSkill):
 
             # Check if script was found and loaded
             if active_dict:
-                LOG.debug(f">>> {json.dumps(active_dict.to_json(), indent=4)}")
+                LOG.debug(f">>> {json.dumps(active_dict.to_json(), indent=4, default=str)}")
                 # If language is specified, change to that now
                 # if active_dict["speaker_data"]:
                 #     cache_lang = None
@@ -429,7 +538,7 @@ class CustomConversations(NeonSkill):
                         active_dict["current_index"] += 1
                 LOG.debug(f'script starting at {active_dict["current_index"]}')
                 # LOG.debug(f"DM: Continue Script Execution Call")
-                self._continue_script_execution(message, user)
+                self._run_script_turn(message, user, new_input=True)
         else:
             self.speak_dialog("ProblemInFile", {"file_name": script_filename.replace('_', ' ')})
             self.active_conversations.pop(user)
@@ -513,45 +622,98 @@ class CustomConversations(NeonSkill):
         current_conversation = Conversation(script_meta=script_meta, script_filename=script_filename)
         self.active_conversations.get(user).push(current_conversation)
 
-    def _update_scripts(self):
+    def _update_scripts(self, message=None):
         """
-        Updates conversation files from Git
+        Queues an update of conversation files from Git. Scripts are updated in the background; running conversations
+        keep the script data they were started with.
+        :param message: Message associated with an update request to notify the user on completion
         """
-        try:
-            git_remote = self.settings["scripts_repo"]
-            branch = self.settings["scripts_branch"]
+        git_remote = self.settings["scripts_repo"]
+        branch = self.settings["scripts_branch"]
+        self._script_sync.request_sync(git_remote, branch,
+                                       lambda success, changed: self._on_script_sync_complete(success, changed,
+                                                                                              message))
 
-            # Initialize Scripts repository
-            try:
-                if not os.path.isdir(self.text_location):
-                    os.makedirs(self.text_location)
-                repo = git.Repo(self.text_location)
-            except InvalidGitRepositoryError:
-                shutil.move(self.text_location, f"{self.text_location}_bak")
-                repo = git.Repo.clone_from("https://github.com/neongeckocom/neon-scripts", self.text_location)
-
-            urls = repo.remote("origin").urls
-            for url in urls:
-                # Check for configuration repo change
-                if url != git_remote:
-                    # TODO: Backup? DM
-                    LOG.debug("Update remote!")
-                    repo.delete_remote("origin")
-                    repo.create_remote("origin", git_remote)
-                    repo.git.reset("--hard")
-                    repo.remote("origin").pull(branch)
-                    repo.git.reset("--hard", f"origin/{branch}")
-            repo.remote("origin").pull(branch)
-
-            # Handle non-git scripts backup
-            if os.path.isdir(f"{self.text_location}_bak"):
-                shutil.move(f"{self.text_location}_bak", os.path.join(self.text_location, "backup", "old"))
+    def _on_script_sync_complete(self, success, changed, message=None):
+        """
+        Called by the script sync worker after an update from Git
+        :param success: True if the update completed
+        :param changed: set of script names that were changed by the update
+        :param message: Message associated with an update request, if any
+        """
+        LOG.info(f"Script update success={success}, changed={changed}")
+        if success:
             self.update_skill_settings({"last_updated": str(datetime.datetime.now())}, skill_global=True)
+            if changed:
+                # Register synonyms of new scripts
+                self._prepare_script_catalog()
             # self.ngi_settings.update_yaml_file("last_updated", value=str(datetime.datetime.now()), final=True)
-            return True
+        if message:
+            if success:
+                self.speak_dialog("update_success", message=message)
+            else:
+                self.speak_dialog("update_failed", message=message)
+
+    def _on_scripts_changed(self, changed):
+        """
+        Called by the script sync worker while the working tree is locked to invalidate data derived from changed scripts
+        :param changed: set of script names that were changed
+        """
+        for script_name in changed:
+            self._script_indexes.discard(script_name)
+        # Prefetched Run targets may be outdated
+        self._prefetcher.clear()
+        self._script_catalog.invalidate()
+
+    def _get_script_manifest(self) -> dict:
+        """
+        Get the precompile manifest for `text_location`, reloading it if the file has changed
+        :return: manifest dict (empty if scripts haven't been precompiled)
+        """
+        try:
+            mtime = os.path.getmtime(os.path.join(self.text_location, MANIFEST_FILENAME))
+        except OSError:
+            mtime = None
+        if mtime != self._script_manifest_mtime:
+            self._script_manifest = load_manifest(self.text_location) if mtime else dict()
+            self._script_manifest_mtime = mtime
+        return self._script_manifest
+
+    def _prepare_script_catalog(self):
+        """
+        Build the script catalog and register script synonyms in the background after the skill is initialized
+        """
+        try:
+            self._get_script_catalog()
         except Exception as e:
             LOG.error(e)
-            return False
+
+    def _get_script_catalog(self) -> ScriptCatalog:
+        """
+        Get the catalog of scripts in `text_location`, updating it and registering new synonyms if scripts changed
+        :return: ScriptCatalog
+        """
+        # Refreshing may replace (and close) containers other threads read while holding the lock
+        with self._script_sync.lock:
+            changed = self._script_catalog.refresh()
+        if changed:
+            for phrase in self._script_catalog.synonyms:
+                if phrase not in self._registered_synonyms:
+                    self.register_vocabulary(phrase, "ScriptSynonym")
+                    self._registered_synonyms.add(phrase)
+        return self._script_catalog
+
+    def _build_script_index(self, cache) -> ScriptIndex:
+        """
+        Build the shared read-only lines and derived indexes for a compiled script
+        :param cache: compiled script data
+        :return: ScriptIndex for the script
+        """
+        script_index = ScriptIndex(cache[0], cache[3], cache[4], cache[9])
+        script_index.compile_instructions(self.runtime_execution, self.variable_functions,
+                                          self.substitute_wildcards + self.bound_variable_commands,
+                                          self.string_comparators)
+        return script_index
 
     def _check_script_file(self, filename, compiled=True):
         """
@@ -560,8 +722,22 @@ class CustomConversations(NeonSkill):
         :return:
         """
         if compiled:
+            entry = get_manifest_entry(self._get_script_manifest(), self.text_location, filename)
+            if entry:
+                if entry["errors"]:
+                    LOG.error(f"{filename} failed precompile validation: {entry['errors']}")
+                return not entry["errors"]
+            # Containers are only written for valid scripts; check the header without decoding the script
+            with self._script_sync.lock:
+                container = get_current_container(self.text_location, filename)
+                errors = container.validate() if container else None
+            if container:
+                if errors:
+                    LOG.error(f"{filename} container is invalid: {errors}")
+                return not errors
             try:
-                cache_data = self.get_cached_data(filename, os.path.join(self.__location__, "script_txt"))
+                with self._script_sync.lock:
+                    cache_data = self.get_cached_data(filename, os.path.join(self.__location__, "script_txt"))
                 # meta = {"cversion": self._version,
                 #         "compiled": round(time.time()),
                 #         "compiler": "Neon AI Script Parser",
@@ -569,11 +745,12 @@ class CustomConversations(NeonSkill):
                 #         "author": None,
                 #         "description": "",
                 #         "raw_file": "".join(raw_text)}
-                if cache_data[9].get("cversion"):
-                    LOG.debug(f'compiler version={cache_data[9].get("cversion")}')
-                    return True
-                else:
+                errors, _ = validate_compiled_script(cache_data)
+                if errors:
+                    LOG.error(f"{filename} is invalid: {errors}")
                     return False
+                LOG.debug(f'compiler version={cache_data[9].get("cversion")}')
+                return True
             except Exception as e:
                 LOG.error(e)
                 return False
@@ -590,12 +767,240 @@ class CustomConversations(NeonSkill):
             # Empty file
             return False
 
+    def _run_script_turn(self, message, user, new_input=False, resume=None):
+        """
+        Continue script execution for a user as one scheduled turn
+        :param message: incoming messagebus Message
+        :param user: nick on klat server, else "local"
+        :param new_input: True if this turn handles user input or a new script
+        :param resume: resume sequence number if this turn resumes a yielded script
+        """
+        if not self._scheduler.start_turn(user, new_input, resume):
+            LOG.debug(f"{user} ignoring stale resume {resume}")
+            return
+        try:
+            self._continue_script_execution(message, user)
+        finally:
+            self._scheduler.end_turn(user)
+
+    def _yield_script(self, message, user):
+        """
+        Called when a turn is over budget. Queues the script to resume after other pending messages, or exits it if it
+        has yielded in the same state before without any user input.
+        :param message: incoming messagebus Message
+        :param user: nick on klat server, else "local"
+        """
+        active_dict = self.active_conversations[user].get_current_conversation()
+        state = (active_dict["script_filename"], active_dict["current_index"], active_dict["last_indent"],
+                 len(self.active_conversations[user]), repr(active_dict["variables"]))
+        if self._scheduler.check_yield(user, state):
+            LOG.debug(f'{user} yielding at index {active_dict["current_index"]}')
+            self.bus.emit(message.forward("neon.script_resume", {**message.data,
+                                                                 "resume": self._scheduler.yield_turn(user)}))
+        else:
+            line = active_dict["formatted_script"][min(active_dict["current_index"],
+                                                       len(active_dict["formatted_script"]) - 1)]
+            LOG.error(f'{active_dict["script_filename"]} repeats without input at line {line["line_number"]}')
+            self.speak_dialog("error_at_line", {"error": "infinite loop",
+                                                "line": line["line_number"],
+                                                "detail": line["text"],
+                                                "script": active_dict["script_filename"]})
+            self._run_exit(user, "", message)
+            # Continue any script that was waiting on this one
+            if user in self.active_conversations:
+                self._continue_script_execution(message, user)
+
+    def _handle_resume_script(self, message):
+        """
+        Resumes a script that yielded at the end of its last turn, unless it has exited or continued since
+        :param message: Message emitted by `_yield_script`
+        """
+        user = get_message_user(message)
+        if user in self.active_conversations:
+            self._run_script_turn(message, user, resume=message.data.get("resume"))
+
+    def _handle_scheduler_metrics(self, message):
+        """
+        Responds with per-user script execution metrics
+        :param message: Message requesting metrics
+        """
+        self.bus.emit(message.reply("neon.script_scheduler_metrics.response", data=self._scheduler.get_metrics()))
+
+    def _handle_prefetch_metrics(self, message):
+        """
+        Responds with counts and hit rates of dependencies prefetched while scripts wait for input
+        :param message: Message requesting metrics
+        """
+        self.bus.emit(message.reply("neon.script_prefetch_metrics.response", data=self._prefetcher.get_metrics()))
+
+    def _handle_script_catalog(self, message):
+        """
+        Responds with the details of available scripts
+        :param message: Message requesting the catalog
+        """
+        self.bus.emit(message.reply("neon.script_catalog.response",
+                                    data={"scripts": self._get_script_catalog().get_entries()}))
+
+    def _send_email_batch(self, emails):
+        """
+        Called by the email queue worker to send a batch of emails
+        :param emails: list of email request dicts with recipient, subject, body, and base64 encoded attachments
+        :return: list of True/False per email sent
+        """
+        return send_each(lambda email: self.send_email(email["subject"], email["body"], email_addr=email["recipient"],
+                                                      attachments=email["attachments"]), emails)
+
+    def _prepare_transcripts(self):
+        """
+        Ingest transcripts written before indexing was enabled, then archive transcripts of runs that have finished
+        """
+        if self._transcript_store:
+            try:
+                self._transcript_store.ingest_directory(self.transcript_location)
+            except Exception as e:
+                LOG.error(e)
+        if self._transcript_compactor:
+            self._transcript_compactor.request_compaction()
+
+    def _handle_compaction_metrics(self, message):
+        """
+        Responds with transcripts archived and expired, bytes saved, and compaction throughput, or an empty dict if
+        compaction is disabled
+        :param message: Message requesting metrics
+        """
+        self.bus.emit(message.reply("neon.script_compaction_metrics.response",
+                                    data=self._transcript_compactor.get_metrics() if self._transcript_compactor
+                                    else dict()))
+
+    def _handle_transcript_query(self, message):
+        """
+        Responds with transcript lines matching the requested script, user, speaker, time range (epoch seconds), and
+        full-text query, or an empty list if transcripts aren't indexed
+        :param message: Message with optional `script`, `user`, `speaker`, `start`, `end`, `text`, and `limit`
+        """
+        lines = []
+        if self._transcript_store:
+            filters = {key: message.data[key] for key in ("script", "user", "speaker", "start", "end", "text", "limit")
+                       if message.data.get(key) is not None}
+            try:
+                lines = self._transcript_store.query(**filters)
+            except Exception as e:
+                LOG.error(e)
+        self.bus.emit(message.reply("neon.script_transcripts.response", data={"lines": lines}))
+
+    def _handle_transcript_runs(self, message):
+        """
+        Responds with script runs in the transcript index, newest first
+        :param message: Message with optional `script`, `start`, `end`, and `limit`
+        """
+        runs = []
+        if self._transcript_store:
+            filters = {key: message.data[key] for key in ("script", "start", "end", "limit")
+                       if message.data.get(key) is not None}
+            try:
+                runs = self._transcript_store.get_runs(**filters)
+            except Exception as e:
+                LOG.error(e)
+        self.bus.emit(message.reply("neon.script_transcript_runs.response", data={"runs": runs}))
+
+    def _handle_email_metrics(self, message):
+        """
+        Responds with counts of emails queued, sent, retried, and dropped
+        :param message: Message requesting metrics
+        """
+        self.bus.emit(message.reply("neon.script_email_metrics.response", data=self._email_queue.get_metrics()))
+
+    def _handle_isolation_metrics(self, message):
+        """
+        Responds with counts of calls to isolated worker processes, or an empty dict if isolation is disabled
+        :param message: Message requesting metrics
+        """
+        self.bus.emit(message.reply("neon.script_isolation_metrics.response",
+                                    data=self._isolation.get_metrics() if self._isolation else {}))
+
+    def _prefetch_dependencies(self, user, active_dict):
+        """
+        Start fetching the input-independent dependencies of lines that may run after the current wait for input.
+        Previously prefetched results the script can no longer reach are discarded.
+        :param user: nick on klat server, else "local"
+        :param active_dict: conversation waiting at its current index
+        """
+        script_index = active_dict["script_index"]
+        if not script_index:
+            return
+        fetches = dict()
+        for idx in script_index.lookahead(active_dict["current_index"] + 1):
+            line = script_index.formatted_script[idx]
+            if line["command"] == "run":
+                filename = str(line["text"]).strip().replace(" ", "_")
+                if filename and "{" not in filename:
+                    fetches[("run", filename)] = partial(self._load_compiled_script, filename)
+            elif line["command"] == "variable":
+                url = self._get_table_scrape_url(line)
+                if url:
+                    fetches[("table_scrape", url)] = partial(self._scrape_links, url)
+        self._prefetcher.prefetch(user, fetches)
+
+    @staticmethod
+    def _get_table_scrape_url(line):
+        """
+        Get the URL scraped by a variable line, if it is a constant
+        :param line: variable line dict
+        :return: URL passed to table_scrape, else None
+        """
+        value = (line.get("data") or {}).get("variable_value") or str(line["text"]).split("=", 1)[-1]
+        value = str(value).strip()
+        if value.startswith("table_scrape") and "(" in value and "{" not in value:
+            return value.split("(")[1].split(")")[0].strip() or None
+        return None
+
+    @staticmethod
+    def _scrape_links(url):
+        """
+        Scrape a page for named links
+        :param url: page to scrape
+        :return: dict of link names to URLs
+        """
+        from neon_utils.web_utils import scrape_page_for_links
+        return scrape_page_for_links(url)
+
+    def _load_compiled_script(self, filename):
+        """
+        Load a compiled script and its shared ScriptIndex, built from the same version of the script
+        :param filename: script filename (without extension)
+        :return: compiled script data, ScriptIndex
+        """
+        cache, key = self._read_compiled_script(filename)
+        return cache, self._script_indexes.get(filename, cache, key)
+
+    def _read_compiled_script(self, filename):
+        """
+        Read compiled script data from its precompiled container if it is up to date, where script lines are decoded
+        once per process, else from the compiled script file
+        :param filename: script filename (without extension)
+        :return: compiled script data, key identifying the version of the file read (None if there is no script)
+        """
+        # Containers are replaced (and closed) when a sync changes them, so read while the working tree is locked
+        with self._script_sync.lock:
+            container = get_current_container(self.text_location, filename + self.file_ext)
+            if container:
+                return container.to_cache(), (container.path, *container.key)
+            return read_compiled_script(os.path.join(self.__location__, "script_txt", filename + self.file_ext))
+
     def _continue_script_execution(self, message, user="local"):
         """
         Continues iterating through script execution until we have to wait for a response
         :param user: nick on klat server, else "local"
         """
         LOG.info(f"THE MESSAGE CONTEXT IS {message.context}")
+        if user in self.active_conversations and not self._scheduler.in_turn(user):
+            # Execution started outside a scheduled turn still runs as one, so every step is budgeted
+            self._run_script_turn(message, user)
+            return
+        if user in self.active_conversations and user not in self.awaiting_input and \
+                not self._scheduler.step(user):
+            self._yield_script(message, user)
+            return
         line_to_evaluate, active_dict = None, None
         try:
             active_dict = self.active_conversations.get(user).get_current_conversation()
@@ -629,113 +1034,66 @@ class CustomConversations(NeonSkill):
 
                         # Check if outdented
                         if line_to_evaluate["indent"] < prev_line_indent:
-                            parent_case_indents = list(deepcopy(line_to_evaluate["parent_case_indents"]))
-                            execute_this_line = True
-
-                            # Iterate over parent cases
-                            while parent_case_indents:
-                                LOG.debug(f'parent case in effect! {parent_case_indents}')
-                                parent_indent = parent_case_indents.pop()
-
-                                # This is the another case
-                                if line_to_evaluate["indent"] == parent_indent + 1:
-                                    # line_to_evaluate["parent_case_indents"].pop()
-                                    LOG.debug(f"case ended")
-                                    execute_this_line = False
-                                    # Iterate through formatted_script until indent
-                                    # less than or equal to indent_of_parent
-                                    while active_dict["formatted_script"][active_dict["current_index"]]["indent"] > \
-                                            parent_indent:
-                                        if active_dict["current_index"] == len(active_dict["formatted_script"]) - 1:
-                                            LOG.warning("EOF reached evaluating case!")
-                                            self._run_exit(user, text, message)
-                                            break
-                                        active_dict["current_index"] += 1
-                                    # LOG.debug(f"DM: Continue Script Execution Call")
-                                    self._continue_script_execution(message, user)
-                                    break
-                                # We are still in our case, continue as normal
-                                elif line_to_evaluate["indent"] > parent_indent + 1:
-                                    break
-
-                                # Else we are outside this case, look for an outer one and continue
+                            case_exit = active_dict["script_index"].case_exits.get(active_dict["current_index"])
+
+                            # This is another option of a parent case, skip to the end of that case
+                            if case_exit is not None:
+                                LOG.debug(f"case ended")
+                                execute_this_line = False
+                                if case_exit >= len(active_dict["formatted_script"]):
+                                    LOG.warning("EOF reached evaluating case!")
+                                    self._run_exit(user, text, message)
                                 else:
-                                    LOG.debug(f'Outside of case, parent_case_indents={parent_case_indents}')
+                                    active_dict["current_index"] = case_exit
+                                # LOG.debug(f"DM: Continue Script Execution Call")
+                                self._continue_script_execution(message, user)
 
                         # This is outside any cases
                         if execute_this_line:
                             LOG.debug(f'execute {command}: {text}')
+                            kind, opcode, operand, extra = \
+                                active_dict["script_index"].instructions[active_dict["current_index"]]
                             # This is an executable line
-                            if command in self.runtime_execution:
-                                # LOG.info(f"{command} IN RUNTIME EXECUTION")
-                                # If this is not a sub_key/value command
-                                if command not in self.substitute_wildcards:
-                                    # LOG.info(f"{command} NOT IN SUBSTITUTE WILDCARDS")
-                                    # Make sure string comparators are capitalized and right value is a set
-                                    if command == "if":
-                                        left, right, comparison = None, None, ""
-                                        for comparator in self.string_comparators:
-                                            if comparator.lower() in text.lower().split():
-                                                comparison = comparator
-                                                text = re.sub(f" {comparator.lower()} ", f" {comparator} ", text)
-                                                left, right = text.split(f" {comparator} ", 1)
-                                                break  # Only one comparator should be in a line
-                                            elif f"!{comparator.lower()}" in text.lower().split():
-                                                comparison = f"!{comparator}"
-                                                text = re.sub(f" !{comparator.lower()} ", f" !{comparator} ", text)
-                                                left, right = text.split(f" !{comparator} ", 1)
-                                                break  # Only one comparator should be in a line
-
-                                        # Make sure right value is a list for IN/!IN
-                                        if left and right and "[" not in right:
-                                            LOG.debug(f"updating right={right}")
-                                            right = re.sub("}", "[*]}", right)
-                                            LOG.debug(f"updating right={right}")
-                                            text = f" {comparison} ".join([left, right])
-                                        LOG.debug(text)
-                                    # else:
-                                    parsed_text = self._substitute_variables(user, text, message, False)
-                                    LOG.info(f"SUCCESSFULLY PARSED {text} to {parsed_text}")
+                            if kind == OP_RUNTIME or kind == OP_RUNTIME_RAW:
+                                # If this is not a sub_key/value or compiled command, substitute variables in the text
+                                # (if lines are compiled with capitalized comparators and list right values)
+                                if kind == OP_RUNTIME:
+                                    parsed_text = self._substitute_variables(user, operand, message, False)
+                                    LOG.info(f"SUCCESSFULLY PARSED {operand} to {parsed_text}")
                                 else:
-                                    parsed_text = text
+                                    parsed_text = operand
                                 # parsed_text = normalize(parsed_text)  WYSIWYG, no normalization necessary
                                 LOG.debug(f"runtime_execute({command}|{parsed_text})")
                                 LOG.debug(line_to_evaluate)
-                                message.data["parser_data"] = deepcopy(line_to_evaluate.get("data"))
-                                LOG.debug(f'parser_data={message.data.get("parser_data")}')
-
-                                # # TODO: Annotate this DM
-                                try:
-                                    if message.data.get("parser_data"):
-                                        LOG.info(f'PARSER DATA {message.data.get("parser_data")} and '
-                                                 f'PARSED TEXT {parsed_text}')
-                                        for key, val in message.data.get("parser_data").items():
-                                            if val and isinstance(val, str) and "{" in val and "}" in val and \
-                                                    command != "variable":
-                                                LOG.info(f"variables in: {val}")
-                                                message.data.get("parser_data")[key] = \
-                                                    self._substitute_variables(user, val, message, False)
-                                except Exception as e:
-                                    LOG.error(f"ERROR IN INNER TRY{e}")
+                                # Line data is shared and read-only; substituted values are held for this step only
+                                parser_data = line_to_evaluate.get("data")
+                                if extra:
+                                    substituted = dict()
+                                    try:
+                                        for key in extra:
+                                            LOG.info(f"variables in: {parser_data[key]}")
+                                            substituted[key] = self._substitute_variables(user, parser_data[key],
+                                                                                          message, False)
+                                    except Exception as e:
+                                        LOG.error(f"ERROR IN INNER TRY{e}")
+                                    parser_data = LineData(parser_data, substituted)
+                                LOG.debug(f'parser_data={parser_data}')
 
                                 # Execute the line
                                 LOG.debug(f"Active script before execution is {active_dict['script_filename']}")
-                                self.runtime_execution[command](user, parsed_text, message)
+                                self._opcode_table[opcode](user, parsed_text, message, parser_data)
                                 LOG.debug(f"Active script after execution is {active_dict['script_filename']}")
                                 if user in self.active_conversations:
                                     self._continue_script_execution(message, user)
 
                             # This is a variable assignment line TODO: Can we ever reach this? DM
-                            elif command in self.variable_functions:
+                            elif kind == OP_VARIABLE:
                                 LOG.info(f'PARSE OUT VARIABLE FOR {text}')
-                                # Parse out variable in line
-                                if '{' in text and '}' in text:
+                                if extra:
                                     LOG.warning(f"Use of braces in variable functions is depreciated, use parentheses"
                                                 f" | {text}")
-                                    key = str(text).split('{')[1].split('}')[0]
-                                elif '(' in text and ')' in text:
-                                    key = str(text).split('(')[1].split(')')[0]
-                                else:
+                                key = operand
+                                if key is None:
                                     LOG.warning(f"variable function: {command} called without an argument")
                                     self.speak_dialog("error_at_line", {"error": "variable",
                                                                         "line": line_to_evaluate["line_number"],
@@ -748,21 +1106,15 @@ class CustomConversations(NeonSkill):
                                     LOG.info(f"INITIALIZE VAR FOR {key} IF DOES NOT EXIST")
                                     LOG.warning(f"Requested input var: {key.split(',')[0]} not yet decared!")
                                     active_dict["variables"][key.split(",")[0]] = []
-                                # if isinstance(active_dict["variables"][key], str) or \
-                                #         len(active_dict["variables"][key]) <= 1:
-                                #     active_dict["variables"][key] = []
                                 LOG.info(f"About to execute {command} for {user} with {key}")
-                                self.variable_functions[command](key, user, message)
+                                self._opcode_table[opcode](key, user, message)
                                 active_dict["current_index"] += 1
-                            # This is a non-executable line, skip over to the next line
-                            elif command in ('@', 'tag'):
-                                LOG.debug(f"continuing past {command}")
-                                active_dict["current_index"] += 1
-                                # LOG.debug(f"DM: Continue Script Execution Call")
-                                self._continue_script_execution(message, user)
-                            # This line cannot be evaluated at this time, just move on
+                            # This line failed to compile
+                            elif kind == OP_INVALID:
+                                raise operand
+                            # This is a non-executable line (or cannot be evaluated at this time), just move on
                             else:
-                                LOG.debug(f"{command} is not a valid runtime option, nothing to execute, continuing")
+                                LOG.debug(f"continuing past {command}")
                                 active_dict["current_index"] += 1
                                 # LOG.debug(f"DM: Continue Script Execution Call")
                                 self._continue_script_execution(message, user)
@@ -785,18 +1137,18 @@ class CustomConversations(NeonSkill):
             self._run_exit(user, None, message)
 
     # Handle line commands at runtime
-    def _run_execute(self, user, text, message):
+    def _run_execute(self, user, text, message, parser_data=None):
         """
         Called at script execution when an execute line is encountered. Emits a message and sets "last_request" variable
         to check for the response in check_neon_speak before continuing
         :param user: nick on klat server, else "local"
         :param text: string to execute
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         active_dict = self.active_conversations.get(user).get_current_conversation()
-        parsed_data = message.data.get("parser_data")
-        if parsed_data:
-            text = parsed_data.get("command")
+        if parser_data:
+            text = parser_data.get("command")
         LOG.info(f"EXECUTE {text}")
         if text == "Execute:":
             active_dict["current_index"] += 1
@@ -824,16 +1176,16 @@ class CustomConversations(NeonSkill):
                 # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_loop(self, user, text, message):
+    def _run_loop(self, user, text, message, parser_data=None):
         """
         Called at script execution when a loop line is encountered
         :param user: nick on klat server, else "local"
         :param text: line containing loop name and condition (START/END/UNTIL)
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         active_dict = self.active_conversations.get(user).get_current_conversation()
-        parsed_data = message.data.get("parser_data")
-        if parsed_data:
+        if parser_data:
             # TODO: Add parsing and handle it here DM
             pass
 
@@ -879,17 +1231,17 @@ class CustomConversations(NeonSkill):
             # This is the start of a loop. Just continue
             active_dict["current_index"] += 1
 
-    def _run_goto(self, user, text, message):
+    def _run_goto(self, user, text, message, parser_data=None):
         """
         Called at script execution when a goto line is encountered. Goes to the specified line by number or label
         :param user: nick on klat server, else "local"
         :param text: argument to goto line; either a number or raw tag name
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.debug(text)
         active_dict = self.active_conversations[user].get_current_conversation()
 
-        parser_data = message.data.get("parser_data")
         if parser_data and parser_data.get("destination"):
             to_find = active_dict["goto_tags"].get(parser_data["destination"], parser_data["destination"])
         elif str(text).isnumeric():
@@ -925,12 +1277,14 @@ class CustomConversations(NeonSkill):
         LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_python(self, user, text, message):
+    def _run_python(self, user, text, message, parser_data=None):
         """
-        Called at script execution when a python line is encountered
+        Called at script execution when a python line is encountered. The line is compiled once and cached (LRU);
+        variables referenced in the line are bound to their current values at evaluation.
         :param user: nick on klat server, else "local"
         :param text: string to execute
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         active_dict = self.active_conversations[user].get_current_conversation()
         # TODO: Use parser_data
@@ -939,29 +1293,31 @@ class CustomConversations(NeonSkill):
             # LOG.debug(f"DM: Continue Script Execution Call")
             # self._continue_script_execution(message, user)
         else:
-            from math import sqrt, log, log10, sin, cos, tan, sinh, cosh, tanh, asin, acos, atan, e, pi
             LOG.debug(text)
-            if "=" in text:
-                var_to_assign = text.split('=', 1)[0].strip()
-                to_evaluate = text.split('=', 1)[1].strip()
-            else:
-                var_to_assign = None
-                to_evaluate = text
             try:
-                LOG.debug(to_evaluate)
-                ret = eval(to_evaluate, {}, {"sqrt": sqrt, "ln": log, "log": log10,
-                                             "sin": sin, "cos": cos, "tan": tan,
-                                             "sinh": sinh, "cosh": cosh, "tanh": tanh,
-                                             "asin": asin, "acos": acos, "atan": atan,
-                                             "sleep": time.sleep, "time": time, "e": e, "pi": pi})
+                try:
+                    expression = get_compiled_expression(text)
+                except ExpressionError as e:
+                    # Lines referencing variable functions or other scripts' variables are substituted first
+                    LOG.debug(f"Substituting variables before compiling: {e}")
+                    expression = compile_expression(self._substitute_variables(user, text, message, False))
+                variables = dict()
+                for name in expression.names:
+                    value = self._get_python_variable(active_dict, name)
+                    if value is not None:
+                        variables[name] = value
+                if self._isolation:
+                    ret = self._isolation.call(evaluate_expression, expression.text, variables)
+                else:
+                    ret = expression.evaluate(variables)
                 LOG.debug(ret)
-                if var_to_assign:
+                if expression.target:
                     if isinstance(ret, int):
                         ret = int(ret)
                     else:
                         ret = round(ret, 3)
                     LOG.debug(ret)
-                    active_dict["variables"][var_to_assign] = str(ret)
+                    active_dict["variables"][expression.target] = str(ret)
             except Exception as e:
                 LOG.error(e)
                 self.speak_dialog("error_at_line", {"error": "python execution",
@@ -970,19 +1326,37 @@ class CustomConversations(NeonSkill):
                                                     "detail": text})
             active_dict["current_index"] += 1
 
-    def _run_neon_speak(self, user, text, message):
+    @staticmethod
+    def _get_python_variable(active_dict, name):
+        """
+        Get the current value of a variable referenced by a python line
+        :param active_dict: active conversation
+        :param name: variable name
+        :return: first value of the variable, else None if it is not declared
+        """
+        value = active_dict["variables"].get(name)
+        if value is None:
+            for script in active_dict["pending_scripts"]:
+                if name in script.get("variables", {}):
+                    value = script["variables"][name]
+                    break
+        if isinstance(value, list):
+            value = value[0] if value else None
+        return value
+
+    def _run_neon_speak(self, user, text, message, parser_data=None):
         """
         Called at script execution when a Neon speak line is encountered
         :param user: nick on klat server, else "local"
         :param text: string to speak
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         active_dict = self.active_conversations[user].get_current_conversation()
-        parser_data = message.data.get("parser_data")
         if parser_data:
             if parser_data.get("name") != "Neon":          # TODO: Neon/Name speak should be the same now!
                 LOG.warning(f"Neon Speak called instead of Name Speak!!")
-                self._run_name_speak(user, text, message)
+                self._run_name_speak(user, text, message, parser_data)
                 return
             text = clean_quotes(parser_data.get("phrase"))
         else:
@@ -991,34 +1365,95 @@ class CustomConversations(NeonSkill):
         if not text or text.lower().endswith("speak:"):
             active_dict["current_index"] += 1
         else:
-            active_dict["current_index"] += 1  # Increment position first in case speak is fast
+            # Static lines with a recording in the script's audio directory are played instead of using TTS
+            phrase_audio = self._get_phrase_audio(active_dict)
+            audio = None
+            if phrase_audio and ScriptIndex.is_static_speak(active_dict["formatted_script"][
+                                                                 active_dict["current_index"]]):
+                audio = phrase_audio.get(normalize_phrase(text))
+
+            # With `Speak mode: coalesce`, speak this line and the static lines following it as one emission
+            lines = [text]
+            script_index = active_dict["script_index"]
+            if not audio and script_index and script_index.coalesce_speak:
+                run_end = script_index.speak_runs.get(active_dict["current_index"], active_dict["current_index"] + 1)
+                for line in active_dict["formatted_script"][active_dict["current_index"] + 1:run_end]:
+                    phrase = clean_quotes(line["data"]["phrase"])
+                    if normalize_phrase(phrase) in phrase_audio:
+                        break  # Recorded lines are played on their own
+                    lines.append(phrase)
+            active_dict["current_index"] += len(lines)  # Increment position first in case speak is fast
+            text = " ".join(lines)
 
-            to_speak = build_message("neon speak", text, message, active_dict["speaker_data"])
             active_dict["last_request"] = text
-            LOG.info(f"ABOUT TO SPEAK {text}")
-            self.speak(text, message=to_speak)
+            if audio and self._play_recording(text, audio, message, active_dict["speaker_data"]):
+                LOG.info(f"PLAYED RECORDING {audio}")
+            else:
+                to_speak = build_message("neon speak", text, message, active_dict["speaker_data"])
+                LOG.info(f"ABOUT TO SPEAK {text}")
+                self.speak(text, message=to_speak)
             # LOG.info(f"{text} SUCCESSFULLY SPOKEN")
             user_input = message.data.get("utterances")
+            transcript = ""
             if user_input:
-                LOG.debug(f'{message.data.get("parser_data").keys()} AP')
-                self.update_transcript(
-                    f'{datetime.datetime.now().isoformat()}, {user} said: \"{user_input[0]}\" \n',
-                    filename=active_dict["script_filename"],
-                    start_time=active_dict["script_start_time"]
-                    )
-            self.update_transcript(f'{datetime.datetime.now().isoformat()}, Neon said: "{text}" \n',
+                LOG.debug(f'{list(parser_data or ())} AP')
+                transcript += f'{datetime.datetime.now().isoformat()}, {user} said: \"{user_input[0]}\" \n'
+            # Transcript entries are kept per script line
+            for line in lines:
+                transcript += f'{datetime.datetime.now().isoformat()}, Neon said: "{line}" \n'
+            self.update_transcript(transcript,
                                    filename=active_dict["script_filename"],
-                                   start_time=active_dict["script_start_time"]
+                                   start_time=active_dict["script_start_time"],
+                                   user=user
                                    )
         # self._continue_script_execution(message, user)
 
-    def _run_name_speak(self, user, text, message):
+    def _get_phrase_audio(self, active_dict) -> dict:
+        """
+        Get the index of prerecorded phrases for a conversation's script, building it on first use
+        :param active_dict: conversation to get recordings for
+        :return: dict of normalized phrase to audio file path
+        """
+        script_title = active_dict["script_meta"].get("title", active_dict["script_filename"])
+        dir_name = str(script_title).strip('"').lower().replace(" ", "_")
+        if dir_name not in self._phrase_audio:
+            self._phrase_audio[dir_name] = build_phrase_index(os.path.join(self.audio_location, dir_name))
+        return self._phrase_audio[dir_name]
+
+    def _play_recording(self, text, audio, message, speaker_data=None) -> bool:
+        """
+        Play a prerecorded phrase in place of speaking it with TTS
+        :param text: phrase being spoken
+        :param audio: path to the recording of text
+        :param message: incoming messagebus Message
+        :param speaker_data: speaker data the phrase would be spoken with
+        :return: True if the recording was sent or queued, False if text should be spoken with TTS instead
+        """
+        if message.context.get("klat_data"):
+            speaker_data = speaker_data or {}
+            speech = get_user_prefs(message)["speech"]
+            language = speaker_data.get("language") or speech["tts_language"]
+            self.send_with_audio(text, audio, message, lang=language,
+                                 speaker={"name": speaker_data.get("name") or "Neon",
+                                          "language": language,
+                                          "gender": speaker_data.get("gender") or speech.get("tts_gender"),
+                                          "voice": None})
+            return True
+        if request_from_mobile(message):
+            # Mobile clients can't play files from this device; speak with TTS
+            return False
+        # Queued with TTS output so the recording plays after anything already being spoken
+        self.play_audio(audio)
+        return True
+
+    def _run_name_speak(self, user, text, message, parser_data=None):
         # TODO: Neon/Name speak are the same now!
         """
         Called at script execution when a named speak line is encountered
         :param user: nick on klat server, else "local"
         :param text: string to speak
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         active_dict = self.active_conversations.get(user).get_current_conversation()
         # Catch indented section start line
@@ -1026,16 +1461,15 @@ class CustomConversations(NeonSkill):
             active_dict["current_index"] += 1
         else:
             speaker_dict = active_dict["speaker_data"]
-            if message.data.get("parser_data"):
-                parser_data = message.data.get("parser_data")
+            if parser_data:
                 speaker = clean_quotes(parser_data.get("name"))  # TODO: Handle variable here DM
                 text = parser_data.get("phrase", text)
                 if '"' in text or "'" in text:
                     text = clean_quotes(text)
-                speaker_data = deepcopy(speaker_dict)
-                speaker_data["name"] = speaker
-                speaker_data["gender"] = parser_data.get("gender", speaker_dict.get("gender"))
-                speaker_data["language"] = parser_data.get("language", speaker_dict.get("language"))
+                speaker_data = dict(speaker_dict,
+                                    name=speaker,
+                                    gender=parser_data.get("gender", speaker_dict.get("gender")),
+                                    language=parser_data.get("language", speaker_dict.get("language")))
                 LOG.debug(speaker_data)
             else:
                 LOG.warning("Couldn't parse speaker data!")
@@ -1078,26 +1512,28 @@ class CustomConversations(NeonSkill):
             if user_input:
                 self.update_transcript(f'{datetime.datetime.now().isoformat()}, {user} said: \"{user_input[0]}\" \n',
                                        filename=active_dict["script_filename"],
-                                       start_time=active_dict["script_start_time"]
+                                       start_time=active_dict["script_start_time"],
+                                       user=user
                                        )
             self.update_transcript(f'{datetime.datetime.now().isoformat()}, {speaker} said: "{text}" \n',
                                    filename=active_dict["script_filename"],
-                                   start_time=active_dict["script_start_time"]
+                                   start_time=active_dict["script_start_time"],
+                                   user=user
                                    )
             active_dict["current_index"] += 1
         # self._continue_script_execution(message, user)
 
-    def _run_case(self, user, text, message):
+    def _run_case(self, user, text, message, parser_data=None):
         """
         Called at script execution when a case statement is encountered
         :param user: nick on klat server, else "local"
         :param text: case statement with variable condition
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
 
         LOG.debug(f"DM: run_case({text})")
         active_dict = self.active_conversations[user].get_current_conversation()
-        parser_data = message.data.get("parser_data")
         if parser_data:
             val_to_check = parser_data.get("variable")
         else:
@@ -1112,60 +1548,28 @@ class CustomConversations(NeonSkill):
                 val_to_check = None
                 self._run_exit(user, text, message)
 
-        # LOG.debug(f"DM: checking case with value of {val_to_check}")
-        indent_of_case = active_dict["formatted_script"][active_dict["current_index"]]["indent"]
-        # LOG.debug(f"DM: case indent={indent_of_case}")
-        line_index_to_check = active_dict["current_index"] + 1
-        LOG.debug(f'val: {val_to_check}, indent: {indent_of_case}, index: {line_index_to_check}')
+        LOG.debug(f'val: {val_to_check}, index: {active_dict["current_index"]}')
 
-        # Iterate through following script lines
-        if line_index_to_check and val_to_check:
-            while line_index_to_check <= len(active_dict["formatted_script"]):
-                try:
-                    line_to_evaluate = active_dict["formatted_script"][line_index_to_check]
-                    # LOG.debug(f"{line_to_evaluate}")
-                    # If the indent is less than or equal to the case statement, we didn't get a valid response
-                    if line_to_evaluate["indent"] <= indent_of_case:
-                        LOG.debug(f"Line outdented from case {line_to_evaluate}")
-                        # Repeat variable assignment and case evaluation
-                        active_dict["current_index"] -= 1
-                        # LOG.debug(f"DM: Continue Script Execution Call")
-                        # self._continue_script_execution(message, user)
-                        break
-                    # This line is inside of a case option, just check the next line
-                    elif line_to_evaluate["indent"] > indent_of_case + 1:
-                        line_index_to_check += 1
-                    # This is a valid case option, check if we should go here
-                    else:
-                        case_to_check = str(line_to_evaluate["text"]).lower().rstrip('\n').strip('"')
-                        # TODO: Parse above in parser DM
-                        LOG.debug(f'Checking case: {case_to_check}')
-                        # Parse valid options to match case
-                        options = [case_to_check]
-                        if " or " in case_to_check:
-                            options = case_to_check.split(" or ")
-                        # Check if match
-                        if val_to_check in options:
-                            LOG.debug(f"matched case! go to index {line_index_to_check + 1}")
-                            active_dict["current_index"] = line_index_to_check + 1
-                            # LOG.debug(f"DM: Continue Script Execution Call")
-                            # self._continue_script_execution(message, user)
-                            break
-                        else:
-                            LOG.debug(f"{val_to_check} not found in {options}")
-                            line_index_to_check += 1
-                except Exception as e:
-                    LOG.error(e)
-                    break
+        # Jump to the matching option from the case dispatch table
+        if val_to_check:
+            branch_index = active_dict["script_index"].case_branch(active_dict["current_index"], val_to_check)
+            if branch_index is not None:
+                LOG.debug(f"matched case! go to index {branch_index}")
+                active_dict["current_index"] = branch_index
+            else:
+                LOG.debug(f"{val_to_check} not found in case options")
+                # Repeat variable assignment and case evaluation
+                active_dict["current_index"] -= 1
         # self._continue_script_execution(message, user)
 
-    def _run_exit(self, user, text, message):
+    def _run_exit(self, user, text, message, parser_data=None):
         """
         Called when `Exit` line is reached, user requests exit, or a fatal script error is encountered. Notifies user
         of exit, resets language if changed at script start, and clears values for next script request.
         :param user: nick on klat server, else "local"
         :param text: `Exit` line in script file
         :param message: messagebus object of last user input
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.debug(f"Exiting {text}")
         active_dict = self.active_conversations.get(user).get_current_conversation()
@@ -1187,6 +1591,10 @@ class CustomConversations(NeonSkill):
 
         # Resume pending script by removing the script-to-exit from the pending script stack
         popped_conversation = self.active_conversations.get(user).pop()
+        if self._transcript_compactor:
+            # This run won't write to its transcript again
+            self._transcript_compactor.request_compaction([transcript_source(popped_conversation["script_filename"],
+                                                                             popped_conversation["script_start_time"])])
         # Update the user scope of variables
         self.active_conversations[user].update_user_scope(popped_conversation)
 
@@ -1199,19 +1607,24 @@ class CustomConversations(NeonSkill):
             # LOG.info(f"CLEARING SIGNALS FOR {user}")
             # self.clear_signals(f"{user}_CC_")
             self.active_conversations.pop(user)
+            self._scheduler.forget(user)
+            self._prefetcher.discard(user)
+            if self._session_recorder:
+                self._session_recorder.end_session(user)
             if self.gui_enabled:
                 self.gui.clear()
 
-    def _run_if(self, user, text, message):
+    def _run_if(self, user, text, message, parser_data=None):
         """
         Called at script execution when an if line is encountered. Evaluate the condition and either continue at the
         next line, or at the line following the "else" at the same indent as this one
         :param user: nick on klat server, else "local"
         :param text: "else:"
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         # active_dict = self.active_conversations[user]
-        parsed = message.data.get("parser_data")
+        parsed = parser_data
         LOG.info(f"RUN_IF TEXT {text} | PARSED {parsed}")
         if parsed:
             comparator = parsed.get("comparator")
@@ -1453,62 +1866,46 @@ class CustomConversations(NeonSkill):
             except Exception as e:
                 LOG.error(e)
 
-        # Update next index and save current indent
+        # Go to the next line, else the line after the else case or next line outside of if
         active_dict = self.active_conversations[user].get_current_conversation()
-        if_indent = active_dict["formatted_script"][active_dict["current_index"]]["indent"]
-        active_dict["current_index"] += 1
-
-        # Locate the else case or next line outside of if
-        if not execute_if:
-            LOG.info("LOCATING THE ELSE BLOCK")
-            while active_dict["current_index"] <= len(active_dict["formatted_script"]):
-                # Found an else at the same level, go to the following line
-                if active_dict["formatted_script"][active_dict["current_index"]]["command"] == "else" and \
-                        active_dict["formatted_script"][active_dict["current_index"]]["indent"] == if_indent:
-                    LOG.debug(f'DM: Reached else: {active_dict["formatted_script"][active_dict["current_index"]]}')
-                    active_dict["current_index"] += 1
-                    break
-                # Found an equally indented or outdented line that is NOT a comment, go here
-                elif active_dict["formatted_script"][active_dict["current_index"]]["indent"] <= if_indent and \
-                        active_dict["formatted_script"][active_dict["current_index"]]["command"]:
-                    LOG.info(f'DM: Reached line outside of if, continue from '
-                             f'here: {active_dict["formatted_script"][active_dict["current_index"]]}')
-                    break
-                else:
-                    active_dict["current_index"] += 1
+        if execute_if:
+            active_dict["current_index"] += 1
+        else:
+            active_dict["current_index"] = active_dict["script_index"].if_false_index[active_dict["current_index"]]
+            LOG.debug(f'Condition false, continue from index {active_dict["current_index"]}')
         # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_else(self, user, text, message):
+    def _run_else(self, user, text, message, parser_data=None):
         """
         Called at script execution when an else line is encountered. This is only reached at the end of an "if", so this
         always results in finding the next line outside of the if/else condition
         :param user: nick on klat server, else "local"
         :param text: "else:"
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.debug(f"DM: reached else case, continue ")
         active_dict = self.active_conversations[user].get_current_conversation()
-        else_indent = active_dict["formatted_script"][active_dict["current_index"]]["indent"]
-        active_dict["current_index"] += 1
 
-        # Continue to iterate through formatted_script until end of else case
-        while active_dict["formatted_script"][active_dict["current_index"]]["indent"] > else_indent:
-            if active_dict["current_index"] == len(active_dict["formatted_script"]) - 1:
-                LOG.warning("EOF reached evaluating case!")
-                self._run_exit(user, text, message)
-                break
-            active_dict["current_index"] += 1
+        # Skip to the end of the else case
+        block_end = active_dict["script_index"].block_end[active_dict["current_index"]]
+        if block_end >= len(active_dict["formatted_script"]):
+            LOG.warning("EOF reached evaluating case!")
+            self._run_exit(user, text, message)
+        else:
+            active_dict["current_index"] = block_end
 
         # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_sub_values(self, user, text, message):
+    def _run_sub_values(self, user, text, message, parser_data=None):
         """
         Substitute substrings in a string variable
         :param user: nick on klat server, else "local"
         :param text: sub_values script line
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.debug(text)
         active_dict = self.active_conversations[user].get_current_conversation()
@@ -1547,12 +1944,26 @@ class CustomConversations(NeonSkill):
         # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_sub_string(self, user, text, message):
+    def _get_perspective_translator(self, active_dict) -> PerspectiveTranslator:
+        """
+        Get the perspective translator for the language of a script
+        :param active_dict: active conversation
+        :return: PerspectiveTranslator for the script language
+        """
+        speaker_data = active_dict["speaker_data"] if isinstance(active_dict["speaker_data"], dict) else {}
+        lang = str(speaker_data.get("language") or self.lang or "en").lower().split("-")[0][:2]
+        if lang not in self._perspective_translators:
+            self._perspective_translators[lang] = \
+                PerspectiveTranslator(self.perspective_changes.get(lang, self.perspective_changes["en"]))
+        return self._perspective_translators[lang]
+
+    def _run_sub_string(self, user, text, message, parser_data=None):
         """
         Substitute a string variable with a different string
         :param user: nick on klat server, else "local"
         :param text: "else:"
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.debug(f"DM: {text}")
         active_dict = self.active_conversations[user].get_current_conversation()
@@ -1572,6 +1983,7 @@ class CustomConversations(NeonSkill):
         output_string = None
         LOG.debug(input_string_to_sub)
         LOG.debug(len(substitution_pairs))
+        from mycroft.util.parse import normalize
 
 ########################################################################################################################
         # Line is parsed, input string and sub pairs have been extracted
@@ -1881,10 +2293,9 @@ class CustomConversations(NeonSkill):
                                         #     active_dict["variables"][next_var_to_fill] = []
 
                                         LOG.debug(modified_input)
-                                        value = f" {modified_input.split(segment, 1)[0].strip()} "
+                                        value = modified_input.split(segment, 1)[0].strip()
                                         LOG.debug(f"perspective change for: {value}")
-                                        for perspective, replacement in self.perspective_changes.items():
-                                            value = value.replace(perspective, replacement).strip()
+                                        value = self._get_perspective_translator(active_dict).translate(value)
                                         LOG.debug(f"{next_var_to_fill} prepend {value}")
 
                                         to_update = active_dict["variables"].get(next_var_to_fill)
@@ -1913,9 +2324,7 @@ class CustomConversations(NeonSkill):
                                 #     active_dict["variables"][next_var_to_fill] = []
 
                                 LOG.debug(f"perspective change for: {modified_input}")
-                                modified_input = f" {modified_input} "
-                                for perspective, replacement in self.perspective_changes.items():
-                                    modified_input = modified_input.replace(perspective, replacement)
+                                modified_input = self._get_perspective_translator(active_dict).translate(modified_input)
                                 LOG.debug(f"{next_var_to_fill} prepend {modified_input.strip()}")
                                 to_update = active_dict["variables"].get(next_var_to_fill)
 
@@ -2016,17 +2425,17 @@ class CustomConversations(NeonSkill):
         # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_set(self, user, text, message):
+    def _run_set(self, user, text, message, parser_data=None):
         """
         Set variable values to static values at script runtime. String substitutions done in text at this point
         :param user: nick on klat server, else "local"
         :param text: variable = value
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.debug(text)
         active_dict = self.active_conversations[user].get_current_conversation()
 
-        parser_data = message.data.get("parser_data")
         if parser_data:
             var = parser_data.get("variable").strip()
             val = parser_data.get("value").strip()
@@ -2086,20 +2495,20 @@ class CustomConversations(NeonSkill):
         # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_reconvey(self, user, text, message):
+    def _run_reconvey(self, user, text, message, parser_data=None):
         """
         Handle a reconvey script command
         :param user: nick on klat server, else "local"
         :param text: variable to find associated utterance for
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.info(f"RECONVEY ENTERED for {user} with {text} ")
         LOG.info(f"DM: {text}")
-        LOG.info(message.data.get("parser_data"))
+        LOG.info(parser_data)
         active_dict = self.active_conversations[user].get_current_conversation()
         audio = None
-        if message.data.get("parser_data"):
-            parser_data = message.data.get("parser_data")
+        if parser_data:
             to_reconvey = parser_data.get("reconvey_text")
             name = clean_quotes(parser_data.get("name", "Neon"))
             # name = clean_quotes(name)  # TODO: Handle name as variable here DM
@@ -2181,6 +2590,8 @@ class CustomConversations(NeonSkill):
                 pass
             else:
                 if os.path.isfile(audio):
+                    from mycroft.audio import wait_while_speaking
+                    from mycroft.util.audio_utils import play_audio_file
                     # Skills will not block while speaking, so wait here to make sure reconveyed audio doesn't overlap
                     wait_while_speaking()
                     LOG.info(f"The audio path is {audio}")
@@ -2193,12 +2604,13 @@ class CustomConversations(NeonSkill):
                     self.speak(text)
         active_dict["current_index"] += 1
 
-    def _run_email(self, user, content, message):
+    def _run_email(self, user, content, message, parser_data=None):
         """
         Send an email with the specified subject and body
         :param user   : nick on klat server, else "local"
         :param content: title and body variable names
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
 
         """
         LOG.debug(f"DM: {content}")
@@ -2206,7 +2618,6 @@ class CustomConversations(NeonSkill):
 
         email_addr = get_user_prefs(message)["user"].get("email")
 
-        parser_data = message.data.get("parser_data")
         if parser_data:
             title = parser_data.get("subject")
             body = parser_data.get("body")
@@ -2227,28 +2638,28 @@ class CustomConversations(NeonSkill):
         if not email_addr:
             self.speak_dialog("no_email", private=True)
         else:
-            LOG.debug(f"sending: {title}")
-            self.send_email(title, body, message, email_addr)
+            LOG.debug(f"queueing: {title}")
+            self._email_queue.enqueue(OutboundEmail(email_addr, title, body))
             # self.bus.emit(Message("neon.email", {"title": title, "email": email_addr, "body": body}))
 
         active_dict["current_index"] += 1
         # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_language(self, user, content, message):
+    def _run_language(self, user, content, message, parser_data=None):
         """
         Handles a 'Language' line at runtime. Existing speaker data is overwritten with the content passed here
         :param user   : nick on klat server, else "local"
         :param content: speaker string to parse (i.e. "female en-us", "en-au male", "en-gb")
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         LOG.debug(f"DM: {content}")
         active_dict = self.active_conversations[user].get_current_conversation()
 
-        if message.data.get("parser_data") and any((message.data["parser_data"].get("language"),
-                                                    message.data["parser_data"].get("gender"))):
-            language = message.data["parser_data"].get("language", get_user_prefs(message)["speech"]["tts_language"])
-            gender = message.data["parser_data"].get("gender", get_user_prefs(message)["speech"].get("tts_gender"))
+        if parser_data and any((parser_data.get("language"), parser_data.get("gender"))):
+            language = parser_data.get("language", get_user_prefs(message)["speech"]["tts_language"])
+            gender = parser_data.get("gender", get_user_prefs(message)["speech"].get("tts_gender"))
             active_dict["speaker_data"] = {"name": "Neon",
                                            "language": language,
                                            "gender": gender,
@@ -2282,12 +2693,13 @@ class CustomConversations(NeonSkill):
         # LOG.debug(f"DM: Continue Script Execution Call")
         # self._continue_script_execution(message, user)
 
-    def _run_new_script(self, user, content, message):
+    def _run_new_script(self, user, content, message, parser_data=None):
         """
         Run a new script and handle existing script variables for this script to be resumed
         :param user   : nick on klat server, else "local"
         :param content: script filename to run
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         """
         # TODO: check this implementation thoroughly
         LOG.debug(f"content={content}")
@@ -2296,20 +2708,24 @@ class CustomConversations(NeonSkill):
         speak_name = filename.replace("_", " ")
         filename = filename.replace(" ", "_")
         if self._script_file_exists(filename):
-            cache = self.get_cached_data(filename + self.file_ext, os.path.join(self.__location__, "script_txt"))
+            cache, script_index = self._prefetcher.get(user, ("run", filename),
+                                                       partial(self._load_compiled_script, filename))
             old_dict = deepcopy(self.active_conversations[user].get_current_conversation())
             old_dict["current_index"] += 1
             script_meta = cache[9]
             self._init_conversation(user, script_meta=script_meta, script_filename=filename)
             new_dict = self.active_conversations[user].get_current_conversation()
             # new_dict["script_filename"] = filename
-            new_dict["formatted_script"] = cache[0]
-            new_dict["speaker_data"] = cache[1]
-            new_dict["variables"] = cache[2]
-            new_dict["loops_dict"] = cache[3]
-            new_dict["goto_tags"] = cache[4]
+            new_dict["formatted_script"] = script_index.formatted_script
+            # A prefetched cache is shared until the next prefetch; copy the data this conversation modifies
+            new_dict["speaker_data"] = deepcopy(cache[1])
+            new_dict["variables"] = deepcopy(cache[2])
+            new_dict["loops_dict"] = script_index.loops_dict
+            new_dict["goto_tags"] = script_index.goto_tags
             new_dict["timeout"] = cache[5]
             new_dict["timeout_action"] = cache[6]
+            new_dict["script_index"] = script_index
+            self._get_phrase_audio(new_dict)
             # new_dict = self._load_to_cache(new_dict, speak_name, user)
             new_dict["pending_scripts"].insert(0, old_dict)
             LOG.debug(f"DM: {new_dict}")
@@ -2319,17 +2735,17 @@ class CustomConversations(NeonSkill):
             self.active_conversations[user].get_current_conversation()["current_index"] += 1
         # self._continue_script_execution(message, user)
 
-    def _run_variable(self, user, text, message):
+    def _run_variable(self, user, text, message, parser_data=None):
         """
         Handle variable value determination at runtime
         :param user   : nick on klat server, else "local"
         :param text   : variable line text
         :param message: incoming messagebus Message
+        :param parser_data: line parser data with variables substituted (LineData), else None
         :return:
         """
         active_dict = self.active_conversations[user].get_current_conversation()
 
-        parser_data = message.data.get("parser_data")
         LOG.info(f"PARSER DATA IS {parser_data}")
         LOG.debug(text)
         LOG.debug(parser_data)
@@ -2435,11 +2851,14 @@ class CustomConversations(NeonSkill):
         LOG.info(var_to_fill)
         LOG.info(user)
 
+        # Keep the options to select from with the variable name, i.e. "var,options"
         if ',' in var_to_fill:
             var_to_fill, var_options = var_to_fill.split(',', 1)
+            var_to_fill = f"{var_to_fill.strip()},{var_options.strip()}"
         # LOG.debug(var_options)
         active_dict = self.active_conversations[user].get_current_conversation()
         active_dict["variable_to_fill"] = var_to_fill
+        self._prefetch_dependencies(user, active_dict)
         LOG.info(f"__variable_voice_input successfully executed for {user} with {var_to_fill}")
 
     def _variable_select_one(self, key, user, message=None):
@@ -2494,7 +2913,8 @@ class CustomConversations(NeonSkill):
             # url = key.split('(')[1][:-1].replace('"', '').replace("'", "")
             url = key
             LOG.debug(url)
-            available_links = scrape(url)
+            available_links = self._prefetcher.get(user, ("table_scrape", str(url).strip()),
+                                                   partial(self._scrape_links, url))
             # LOG.debug("scrape done.")
             LOG.debug(f"Scraped: {available_links}")
             # active_dict["variables"][key_to_update] = available_links
@@ -2515,6 +2935,7 @@ class CustomConversations(NeonSkill):
             LOG.debug(f"{key}, {user}")
             # key = key.replace("random", '')
             active_dict = self.active_conversations[user].get_current_conversation()
+            rng = self.active_conversations[user].rng
             # LOG.debug(active_dict)
             LOG.debug(f'Looking for {key} in {active_dict["variables"]}')
             LOG.debug(active_dict["variables"][key])  # List to select from
@@ -2529,7 +2950,7 @@ class CustomConversations(NeonSkill):
             LOG.debug(f'DM: {type(active_dict["variables"][key][0])}')
             if isinstance(active_dict["variables"][key][0], str):
                 try:
-                    random_items = random.sample(active_dict["variables"][key], 3)
+                    random_items = rng.sample(active_dict["variables"][key], 3)
                     LOG.debug(random_items)
                     return f'{random_items[0]}, {random_items[1]}, or {random_items[2]}'
                 except ValueError:
@@ -2538,7 +2959,7 @@ class CustomConversations(NeonSkill):
             elif isinstance(active_dict["variables"][key][0], list):
                 LOG.warning(f'{key}={active_dict["variables"][key][0]}')
                 try:
-                    random_items = random.sample(active_dict["variables"][key][0], 3)
+                    random_items = rng.sample(active_dict["variables"][key][0], 3)
                     LOG.debug(random_items)
                     return f'{random_items[0]}, {random_items[1]}, or {random_items[2]}'
                 except ValueError:
@@ -2550,7 +2971,7 @@ class CustomConversations(NeonSkill):
                 try:
                     pick_short = []
                     keys_list = list(active_dict["variables"][key][0].keys())
-                    random.shuffle(keys_list)
+                    rng.shuffle(keys_list)
                     LOG.debug(keys_list)
                     # random.shuffle(list(active_dict["variables"][key].keys()))
                     # LOG.debug(list(active_dict["variables"][key].keys()))
@@ -2563,7 +2984,7 @@ class CustomConversations(NeonSkill):
                     if len(pick_short) > 0:
                         random_items = pick_short
                     else:
-                        random_items = random.sample(list(active_dict["variables"][key][0].keys()), 3)
+                        random_items = rng.sample(list(active_dict["variables"][key][0].keys()), 3)
                     return f'{random_items[0]}, {random_items[1]}, or {random_items[2]}'
                 except ValueError:
                     random_items = list(active_dict["variables"][key][0].keys())
@@ -2600,6 +3021,7 @@ class CustomConversations(NeonSkill):
             # LOG.info(variable_name)
             LOG.debug(f'find {active_dict["variables"][variable_name][0]} in {list_of_options}')
             # LOG.info(active_dict["variables"][list_options])
+            import difflib
             closest_match = difflib.get_close_matches(f'{active_dict["variables"][variable_name][0]} ',
                                                       list_of_options, cutoff=0.4)
             LOG.debug(closest_match)
@@ -2682,6 +3104,11 @@ class CustomConversations(NeonSkill):
         to_emit = build_message("skill_data", intent, message, active_dict["speaker_data"])
         # LOG.info(f"MESSAGE BUILT WITH {to_emit.data}")
         resp = self.bus.wait_for_response(to_emit, "skills:execute.response", timeout=60)
+        if self._session_recorder:
+            if resp:
+                self._session_recorder.record(user, "skill_response", resp.msg_type, resp.data, resp.context)
+            else:
+                self._session_recorder.record(user, "skill_response")
         LOG.info(f"VARIABLE SKILL RESPONSE IS {resp}")
         LOG.info(f"MESSAGE TYPE {resp.msg_type} | MESSAGE DATA {resp.data}")
         LOG.info(f'returning: {resp.data.get("meta", {}).get("data", {}).get(data_key)}')
@@ -2878,6 +3305,8 @@ class CustomConversations(NeonSkill):
         :param message: message associated with last valid response
         """
         user = get_message_user(message)
+        if self._session_recorder:
+            self._session_recorder.record(user, "timeout", message.msg_type, message.data, message.context)
         active_dict = self.active_conversations[user].get_current_conversation()
         LOG.debug(message)
 
@@ -2907,6 +3336,10 @@ class CustomConversations(NeonSkill):
             if user not in self.active_conversations.keys():
                 pass
             else:
+                if self._session_recorder:
+                    # Responses to executed requests are inputs; anything else is output to the user
+                    kind = "speak" if message.context.get("cc_data", {}).get("execute_from_script") else "output"
+                    self._session_recorder.record(user, kind, message.msg_type, message.data, message.context)
                 active_dict = self.active_conversations[user].get_current_conversation()
 
                 if message.context.get("cc_data", {}).get("request", None):
@@ -2935,10 +3368,19 @@ class CustomConversations(NeonSkill):
             pass
 
     def converse(self, message=None):
+        # `active_conversations` only holds users with a running script (managers are removed when their stack
+        # empties), so any other utterance is rejected here without logging or building intermediate objects
+        if not self.active_conversations or not message or not message.context:
+            return False
         user = get_message_user(message)
+        conversation_manager = self.active_conversations.get(user)
+        if not conversation_manager:
+            return False
         utterances = message.data.get('utterances')
-        if not message or not message.context or not utterances:
+        if not utterances:
             return False
+        if self._session_recorder:
+            self._session_recorder.record(user, "utterance", message.msg_type, message.data, message.context)
 
         if "stop" in str(utterances[0]).split():
             # TODO: Is this necessary, if so should be a voc_match for proper language support DM
@@ -2947,13 +3389,12 @@ class CustomConversations(NeonSkill):
         elif message.context.get("cc_data", {}).get("execute_from_script", False):
             LOG.info(f'Script execute for {user}, pass: {utterances}')
             return False
-        elif user in self.active_conversations and \
-                self.active_conversations[user].get_current_conversation()\
-                        .get("script_filename"):
+        elif conversation_manager.get_current_conversation().get("script_filename"):
             LOG.info(f'Script input for {user} consume: {utterances}')
             consumed = self.check_if_script_response(message)
             LOG.info(f"consumed={consumed}")
-            if consumed:
+            # The script may have exited while handling this input
+            if consumed and user in self.active_conversations:
                 # Reset the timeout event
                 conversation_data = self.active_conversations[user].get_current_conversation()
                 event_name = f"CC_{user}_conversation"
@@ -3003,25 +3444,12 @@ class CustomConversations(NeonSkill):
                     if user in self.awaiting_input:
                         self.awaiting_input.remove(user)
 
-                    # Iterate through loops to find active loop
-                    for loop in active_dict["loops_dict"]:
-                        LOG.debug(loop)
-                        start = active_dict["loops_dict"][loop]["start"]
-                        end = active_dict["loops_dict"][loop]["end"]
-
-                        # Go to the end of this active loop and break
-                        if start < active_dict["current_index"] < end:
-                            goto_line = end
-                            i = 0
-                            # Find the index of the line number where the loop ends and continue from the following line
-                            for line in active_dict["formatted_script"]:
-                                if line["line_number"] == goto_line:
-                                    LOG.debug(f'Found loop end at {i}: {line}')
-                                    goto_idx = i + 1
-                                    goto_ind = line["indent"]
-                                    break
-                                i += 1
-                            break
+                    # Find the end of the innermost loop containing the last executed line and continue after it
+                    if active_dict["script_index"]:
+                        loop_exit = active_dict["script_index"].loop_exit(active_dict["current_index"] - 1)
+                        if loop_exit:
+                            goto_idx, goto_ind = loop_exit
+                            LOG.debug(f'Found loop end at {goto_idx - 1}')
 
                     # We have a loop end to goto
                     if goto_idx:
@@ -3032,7 +3460,7 @@ class CustomConversations(NeonSkill):
                         # time.sleep(1)
                         LOG.debug(f"about to continue from {goto_idx}")
                         # LOG.debug(f"DM: Continue Script Execution Call")
-                        self._continue_script_execution(message, user)
+                        self._run_script_turn(message, user, new_input=True)
                     # There is no active loop, just exit the whole thing
                     else:
                         LOG.debug("Exit called by user request")
@@ -3053,17 +3481,17 @@ class CustomConversations(NeonSkill):
                 if ',' in active_dict["variable_to_fill"]:
                     var_to_fill, list_to_check = active_dict["variable_to_fill"].split(',', 1)
                     LOG.debug('select from list!')
-                    LOG.debug(active_dict["variables"][list_to_check])
-                    for opt in active_dict["variables"][list_to_check]:
-                        if opt in utterance:
-                            assigned_value = opt
-                            break
+                    # Options are a list variable, else listed inline
+                    options = active_dict["variables"].get(list_to_check) or list_to_check.split(',')
+                    LOG.debug(options)
+                    assigned_value = get_option_matcher(tuple(str(opt) for opt in options)).match(utterance)
                 else:
+                    var_to_fill = active_dict["variable_to_fill"]
                     assigned_value = utterance
 
                 # If we have a valid value to assign to the variable
                 if assigned_value:
-                    to_update = active_dict["variable_to_fill"]
+                    to_update = var_to_fill
 
                     # Push new value to front of list
                     if isinstance(active_dict["variables"][to_update], list):
@@ -3081,7 +3509,6 @@ class CustomConversations(NeonSkill):
                     # active_dict["audio_responses"][active_dict["variable_to_fill"]] = \
                     #     message.data["cc_data"].get("audio_file", None)
                     if message.context.get("audio_file", None):
-                        to_update = active_dict["variable_to_fill"]
                         assigned_value = message.context["audio_file"]
                         if assigned_value.endswith(".flac"):
                             # The actual user audio is the extensionless file, mp3 is response
@@ -3106,7 +3533,7 @@ class CustomConversations(NeonSkill):
                                                 {"skill_id": "custom-conversation.neon", "result": True}))
                     time.sleep(1)
                     # LOG.debug(f"DM: Continue Script Execution Call")
-                    self._continue_script_execution(message, user)
+                    self._run_script_turn(message, user, new_input=True)
                     return True
                 else:
                     self.awaiting_input.append(user)
@@ -3136,6 +3563,10 @@ class CustomConversations(NeonSkill):
         if status == "exists":
             self.speak_dialog("upload_failed", {"name": name, "reason": "the filename already exists"}, message=message)
         elif status in ("created", "updated"):
+            # Conversations started from now on load the new version of the script
+            with self._script_sync.lock:
+                self._on_scripts_changed({os.path.splitext(message.data.get("file_basename") or
+                                                           str(name).replace(" ", "_"))[0]})
             self.speak_dialog("upload_success", {"name": name, "state": status}, message=message)
             # Update config to track last updated time
             # self.ngi_settings.update_yaml_file("updates", message.data.get("file_basename"), time.time(), final=True)
@@ -3147,15 +3578,21 @@ class CustomConversations(NeonSkill):
     def stop(self):
         pass
 
-    def update_transcript(self, utterance, filename, start_time):
+    def update_transcript(self, utterance, filename, start_time, user=None):
         """
         Called to save user-neon conversation while a script is running
         :param utterance: conversation line to be saved
         :param filename: filename of a running script
         :param start_time: time when script is considered to start running
+        :param user: user running the script
         """
         with open(os.path.join(self.transcript_location, f'{filename}_{start_time}.txt'), 'a') as transcript:
             transcript.write(utterance)
+        if self._transcript_store:
+            try:
+                self._transcript_store.append(filename, start_time, utterance, user)
+            except Exception as e:
+                LOG.error(e)
 
     # Helper functions
     # def _add_syn_intent(self, message):
@@ -0,0 +1,130 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Cost of listing available scripts and resolving a synonym: scanning and decoding every compiled script per request
+vs. the script catalog, which is refreshed with one directory stat while nothing changed.
+
+    python benchmarks/catalog.py [--scripts 200] [--lines 200] [--requests 200]
+"""
+import argparse
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script_memory import synthetic_script  # noqa: E402
+from utils_script import FORMATTED_SCRIPT, SCRIPT_META, ScriptCatalog, get_script_details, load_compiled_script, \
+    normalize_phrase, precompile_directory  # noqa: E402
+
+
+def measure(func, count):
+    """
+    :param func: callable to time
+    :param count: number of calls
+    :return: mean microseconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def write_scripts(directory, count, num_lines):
+    """
+    Write compiled scripts that each declare a synonym
+    """
+    for idx in range(count):
+        cache = list(synthetic_script(num_lines))
+        cache[FORMATTED_SCRIPT].insert(0, {"line_number": 0, "command": "synonym", "text": f'Synonym: "script {idx}"',
+                                           "indent": 0, "data": {}, "parent_case_indents": []})
+        with open(os.path.join(directory, f"script_{idx}.ncs"), "wb") as f:
+            pickle.dump(tuple(cache), f)
+
+
+def scan_available(directory):
+    return [os.path.splitext(x)[0].replace("_", " ") for x in os.listdir(directory)
+            if os.path.isfile(os.path.join(directory, x)) and x.endswith(".ncs")]
+
+
+def scan_synonym(directory, utterance):
+    phrase = normalize_phrase(utterance)
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".ncs"):
+            cache = load_compiled_script(os.path.join(directory, filename))
+            details = get_script_details(cache[FORMATTED_SCRIPT], cache[SCRIPT_META])
+            if phrase in (normalize_phrase(s) for s in details["synonyms"]):
+                return os.path.splitext(filename)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scripts", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_scripts(directory, args.scripts, args.lines)
+        utterance = f"script {args.scripts - 1}"
+        start = time.perf_counter()
+        ScriptCatalog(directory).refresh()
+        cold = (time.perf_counter() - start) * 1e3
+        precompile_directory(directory)
+        start = time.perf_counter()
+        catalog = ScriptCatalog(directory)
+        catalog.refresh()
+        precompiled = (time.perf_counter() - start) * 1e3
+        print(f"{args.scripts} scripts; catalog built in {cold:.1f}ms, {precompiled:.1f}ms from the manifest")
+
+        def catalog_available():
+            catalog.refresh()
+            return [name.replace("_", " ") for name in catalog.names]
+
+        def catalog_synonym():
+            catalog.refresh()
+            return catalog.match_synonym(utterance)
+
+        assert catalog_synonym() == scan_synonym(directory, utterance)
+        results = {"list scan": measure(lambda: scan_available(directory), args.requests),
+                   "list catalog": measure(catalog_available, args.requests),
+                   "synonym scan": measure(lambda: scan_synonym(directory, utterance), max(args.requests // 20, 1)),
+                   "synonym catalog": measure(catalog_synonym, args.requests)}
+        for name, micros in results.items():
+            print(f"{name:<18}{micros:>12.1f} us")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+`converse()` throughput for utterances from users without a running script, with and without other users running
+scripts. Requires the skill's runtime dependencies.
+
+    python benchmarks/converse.py [--calls 200000] [--script-users 100]
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_skill_module(module_name):
+    """
+    Import the installed skill package, else this repository as a package
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        sys.path.insert(0, os.path.dirname(REPO_ROOT))
+        return importlib.import_module(os.path.basename(REPO_ROOT))
+
+
+def calls_per_second(skill, message, calls):
+    """
+    Time repeated `converse` calls
+    :return: calls per second
+    """
+    converse = skill.converse
+    start = time.perf_counter()
+    for _ in range(calls):
+        converse(message)
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--script-users", type=int, default=100, help="other users with a running script")
+    parser.add_argument("--module", default="skill_custom_conversation")
+    args = parser.parse_args()
+
+    module = _import_skill_module(args.module)
+    from ovos_bus_client import Message
+    from ovos_utils.log import LOG
+    from ovos_utils.messagebus import FakeBus
+    skill = module.CustomConversations(skill_id="skill-custom_conversation.neongeckocom", bus=FakeBus())
+    # Count any logging that still happens on the reject path
+    logged = []
+    for level in ("debug", "info", "warning"):
+        setattr(LOG, level, lambda *a, **k: logged.append(a))
+
+    message = Message("recognizer_loop:utterance", {"utterances": ["what time is it"]}, {"username": "nobody"})
+    idle = calls_per_second(skill, message, args.calls)
+    for i in range(args.script_users):
+        skill._init_conversation(f"user{i}", script_filename="demo")
+    busy = calls_per_second(skill, message, args.calls)
+    skill.shutdown()
+
+    print(f"no running scripts:              {idle:12,.0f} calls/s")
+    print(f"{args.script_users:>5} other users with scripts: {busy:12,.0f} calls/s")
+    print(f"log calls on reject path:        {len(logged):12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Time a handler spends sending email and memory used to encode an attachment: sending inline with the whole file read
+and encoded at once vs. queueing for the background worker, which encodes attachments in chunks when sent.
+
+    python benchmarks/email.py [--emails 20] [--latency 0.05] [--attachment-mb 8]
+"""
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_mail import EmailQueue, OutboundEmail, encode_attachment  # noqa: E402
+
+
+def peak_memory(func):
+    """
+    :param func: callable to measure
+    :return: peak bytes allocated while calling func
+    """
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request to the email endpoint")
+    parser.add_argument("--attachment-mb", type=int, default=8)
+    args = parser.parse_args()
+
+    def send(emails):
+        time.sleep(args.latency)
+        return [True] * len(emails)
+
+    start = time.perf_counter()
+    for _ in range(args.emails):
+        send([OutboundEmail("test@neon.ai", "subject", "body").to_request()])
+    inline = (time.perf_counter() - start) / args.emails * 1000
+
+    queue = EmailQueue(send, batch_delay=0.01)
+    start = time.perf_counter()
+    for _ in range(args.emails):
+        queue.enqueue(OutboundEmail("test@neon.ai", "subject", "body"))
+    queued = (time.perf_counter() - start) / args.emails * 1000
+    queue.flush()
+    drained = (time.perf_counter() - start) * 1000
+    metrics = queue.get_metrics()
+    queue.stop()
+    print(f"inline send {inline:.3f}ms per email; enqueue {queued:.3f}ms per email, "
+          f"{args.emails} sent in {metrics['batches']} batches after {drained:.1f}ms")
+
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(os.urandom(args.attachment_mb * 1024 * 1024))
+        f.flush()
+
+        def read_all():
+            with open(f.name, "rb") as attachment:
+                return base64.b64encode(attachment.read()).decode("utf-8")
+
+        print(f"encode {args.attachment_mb}MB attachment: read all {peak_memory(read_all) / 1e6:.1f}MB peak, "
+              f"chunked {peak_memory(lambda: encode_attachment(f.name)) / 1e6:.1f}MB peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Interpreter steps per second. `dispatch` compares the per-line work of `_continue_script_execution` as it was (string
+membership tests and a copy of the line's parser data on every step) with dispatch on instructions compiled at load by
+`ScriptIndex.compile_instructions` and a LineData overlay of substituted values; handlers and variable substitution are
+no-ops so only dispatch is measured.
+`skill` runs a script of assignments, conditions and tags through the skill and reports steps per second from the
+scheduler metrics (requires the skill's runtime dependencies).
+
+    python benchmarks/interpreter.py [dispatch|skill] [--lines 1000] [--repeat 20]
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_script import ScriptIndex, LineData, normalize_condition, thaw, OP_RUNTIME, OP_RUNTIME_RAW, OP_VARIABLE, \
+    OP_INVALID  # noqa: E402
+
+SCRIPT_NAME = "interpreter_test"
+
+RUNTIME_COMMANDS = ("variable", "execute", "loop", "python", "speak", "neon speak", "name speak", "case", "exit", "if",
+                    "else", "goto", "sub_values", "sub_key", "set", "reconvey", "name reconvey", "email", "language",
+                    "run")
+VARIABLE_COMMANDS = ("select_one", "voice_input", "table_scrape", "random", "closest", "profile", "skill")
+SUBSTITUTE_WILDCARDS = ("sub_key", "sub_values")
+BOUND_VARIABLE_COMMANDS = ("python",)
+STRING_COMPARATORS = ("IN", "CONTAINS", "STARTSWITH", "ENDSWITH")
+
+
+def synthetic_lines(count):
+    """
+    Build script lines cycling through assignments, conditions, tags and comments
+    :param count: number of lines
+    :return: list of script line dicts
+    """
+    templates = (("set", "count = {count}", {"variable": "count", "value": "{count}"}),
+                 ("if", "{count} in {values}", {}),
+                 ("tag", "@step", {}),
+                 ("variable", 'answer = "{count}"', {"variable_name": "answer", "variable_value": '"{count}"'}),
+                 ("sub_key", "{answer} *", {}),
+                 ("", "# comment", {}),
+                 ("voice_input", "voice_input(answer)", {}))
+    lines = []
+    for i in range(count):
+        command, text, data = templates[i % len(templates)]
+        lines.append({"line_number": i + 1, "command": command, "text": text, "indent": 0, "data": data,
+                      "parent_case_indents": []})
+    return lines
+
+
+def legacy_step(line, runtime, variable_functions, substitute):
+    """
+    Mirrors the original command checks of `_continue_script_execution` for one line
+    """
+    command, text = line["command"], line["text"]
+    if command in runtime:
+        if command not in SUBSTITUTE_WILDCARDS and command not in BOUND_VARIABLE_COMMANDS:
+            if command == "if":
+                text = normalize_condition(text, STRING_COMPARATORS)
+            parsed_text = substitute(text)
+        else:
+            parsed_text = text
+        parser_data = thaw(line.get("data"))
+        if parser_data:
+            for key, val in parser_data.items():
+                if val and isinstance(val, str) and "{" in val and "}" in val and command != "variable":
+                    parser_data[key] = substitute(val)
+        runtime[command](parsed_text, parser_data)
+    elif command in variable_functions:
+        if '{' in text and '}' in text:
+            key = str(text).split('{')[1].split('}')[0]
+        elif '(' in text and ')' in text:
+            key = str(text).split('(')[1].split(')')[0]
+        else:
+            return
+        variable_functions[command](key, None)
+    elif command in ('@', 'tag'):
+        pass
+
+
+def compiled_step(line, instruction, table, substitute):
+    """
+    Mirrors the instruction dispatch of `_continue_script_execution` for one line
+    """
+    kind, opcode, operand, extra = instruction
+    if kind == OP_RUNTIME or kind == OP_RUNTIME_RAW:
+        parsed_text = substitute(operand) if kind == OP_RUNTIME else operand
+        parser_data = line.get("data")
+        if extra:
+            parser_data = LineData(parser_data, {key: substitute(parser_data[key]) for key in extra})
+        table[opcode](parsed_text, parser_data)
+    elif kind == OP_VARIABLE:
+        if operand is None:
+            return
+        table[opcode](operand, None)
+    elif kind == OP_INVALID:
+        raise operand
+
+
+def measure_dispatch(lines, repeat):
+    """
+    :param lines: script line dicts
+    :param repeat: passes over the lines per measurement
+    :return: (legacy steps per second, compiled steps per second)
+    """
+    def handler(*_):
+        pass
+
+    def substitute(text):
+        return text
+
+    index = ScriptIndex(lines, {})
+    runtime = {command: handler for command in RUNTIME_COMMANDS}
+    variable_functions = {command: handler for command in VARIABLE_COMMANDS}
+    instructions = index.compile_instructions(runtime, variable_functions,
+                                              SUBSTITUTE_WILDCARDS + BOUND_VARIABLE_COMMANDS, STRING_COMPARATORS)
+    table = list(runtime.values()) + list(variable_functions.values())
+    formatted_script = index.formatted_script
+    steps = len(formatted_script) * repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in formatted_script:
+            legacy_step(line, runtime, variable_functions, substitute)
+    legacy = steps / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for idx, line in enumerate(formatted_script):
+            compiled_step(line, instructions[idx], table, substitute)
+    compiled = steps / (time.perf_counter() - start)
+    return legacy, compiled
+
+
+def synthetic_script(count):
+    """
+    Build compiled script data that runs `count` lines without input, then exits
+    :param count: number of lines before exit
+    :return: compiled script tuple as saved in a .ncs file
+    """
+    lines = [{"line_number": 1, "command": "script", "text": f'Script: "{SCRIPT_NAME}"', "indent": 0, "data": {},
+              "parent_case_indents": []}]
+    for line in synthetic_lines(count):
+        if line["command"] in ("voice_input", "if", "sub_key"):
+            continue  # Keep every line executing in sequence without input or captured text
+        line["line_number"] = len(lines) + 1
+        lines.append(line)
+    lines.append({"line_number": len(lines) + 1, "command": "exit", "text": "Exit", "indent": 0, "data": {},
+                  "parent_case_indents": []})
+    return lines, {}, {"count": "1", "answer": ""}, {}, {}, -1, None, None, None, \
+        {"cversion": "1", "title": SCRIPT_NAME}
+
+
+def run_scripts(skill, bus, message_class, repeat):
+    """
+    Run the test script to its exit `repeat` times. Scripts that yield are resumed after the emitting call returns,
+    as they would be on a messagebus
+    :param skill: CustomConversations instance using `bus`, with the test script in its script directory
+    :param bus: bus the skill emits to, with a `deferred` list of queued resume messages
+    :param message_class: Message class to build inputs with
+    :param repeat: number of runs
+    :return: seconds spent running
+    """
+    context = {"username": "interpreter_test", "user": "interpreter_test"}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        skill.handle_start_script(message_class("neon.run_alert_script",
+                                                {"utterance": f"run {SCRIPT_NAME}", "file_to_run": SCRIPT_NAME},
+                                                context))
+        while bus.deferred:
+            skill._handle_resume_script(bus.deferred.pop(0))
+    return time.perf_counter() - start
+
+
+def measure_skill(count, repeat, module_name):
+    """
+    :param count: script lines per run
+    :param repeat: number of runs
+    :param module_name: name to import the skill package as
+    :return: steps per second over all runs
+    """
+    from startup import _import_skill_module
+    module = _import_skill_module(module_name)
+    from ovos_bus_client import Message
+    from ovos_utils.log import LOG
+    from ovos_utils.messagebus import FakeBus
+    LOG.set_level("ERROR")
+
+    class DeferredBus(FakeBus):
+        """
+        FakeBus that queues script resume messages instead of handling them within `emit`
+        """
+        def __init__(self, *args, **kwargs):
+            FakeBus.__init__(self, *args, **kwargs)
+            self.deferred = []
+
+        def emit(self, message):
+            if message.msg_type == "neon.script_resume":
+                self.deferred.append(message)
+            else:
+                FakeBus.emit(self, message)
+
+    bus = DeferredBus()
+    skill = module.CustomConversations(skill_id="skill-custom_conversation.neongeckocom", bus=bus)
+    if not getattr(skill, "runtime_execution", None):
+        skill.initialize()
+    location = tempfile.mkdtemp()
+    skill.__location__ = location
+    skill.text_location = os.path.join(location, "script_txt")
+    skill.transcript_location = os.path.join(location, "script_transcript")
+    os.makedirs(skill.text_location)
+    with open(os.path.join(skill.text_location, SCRIPT_NAME + skill.file_ext), "wb") as f:
+        pickle.dump(synthetic_script(count), f)
+
+    seconds = run_scripts(skill, bus, Message, repeat)
+    steps = skill._scheduler.get_metrics()["steps"]
+    skill.shutdown()
+    return steps / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", choices=("dispatch", "skill"), default="dispatch")
+    parser.add_argument("--lines", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--module", default="skill_custom_conversation")
+    args = parser.parse_args()
+
+    if args.mode == "dispatch":
+        legacy, compiled = measure_dispatch(synthetic_lines(args.lines), args.repeat)
+        print(f"{'dispatch':<10}{'steps/s':>14}")
+        print(f"{'legacy':<10}{legacy:>14,.0f}")
+        print(f"{'compiled':<10}{compiled:>14,.0f}  ({compiled / legacy:.1f}x)")
+    else:
+        print(f"skill steps/s: {measure_skill(args.lines, args.repeat, args.module):,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Per-step overhead of evaluating `Python:` lines in isolated worker processes: in-process evaluation vs. a call to a warm
+IsolatedPool worker vs. starting a new worker for every call.
+
+    python benchmarks/isolation.py [--calls 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_eval import compile_expression, evaluate_expression  # noqa: E402
+from utils_isolation import IsolatedPool  # noqa: E402
+
+LINE = ("x = sqrt(a) * sin(pi / b) + log(a)", {"a": "16", "b": "6"})
+
+
+def _noop():
+    return None
+
+
+def measure(func, calls):
+    """
+    :param func: callable to time
+    :param calls: number of calls
+    :return: mean microseconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    text, variables = LINE
+    expression = compile_expression(text)
+    pool = IsolatedPool(workers=1)
+    pool.call(_noop)  # Wait for the worker to start
+    cold_calls = max(args.calls // 100, 5)
+    try:
+        results = {"in process": measure(lambda: expression.evaluate(variables), args.calls),
+                   "warm worker": measure(lambda: pool.call(evaluate_expression, text, variables), args.calls),
+                   "warm no-op": measure(lambda: pool.call(_noop), args.calls)}
+    finally:
+        pool.shutdown()
+
+    def cold_call():
+        cold_pool = IsolatedPool(workers=1)
+        cold_pool.call(evaluate_expression, text, variables)
+        cold_pool.shutdown()
+    results["new worker"] = measure(cold_call, cold_calls)
+
+    print(f"{'evaluation':<14}{'us/step':>12}{'overhead us':>14}")
+    for name, micros in results.items():
+        print(f"{name:<14}{micros:>12.1f}{micros - results['in process']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
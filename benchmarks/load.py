@@ -0,0 +1,264 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Multi-user load against one skill instance, as in a klat server deployment. Each simulated user starts a script with
+`handle_start_script`, answers every question through `converse` after a random think time, and starts the script
+again when it exits. Messages are handled by a pool of worker threads on a stand-in bus; turn latency is measured from
+when a user's message arrives until the skill returns, so it includes time spent queued behind other users.
+Each user count runs in a fresh interpreter so memory is measured separately. Requires the skill's runtime
+dependencies.
+
+    python benchmarks/load.py [--users 10 100 1000 10000] [--duration 10] [--think 5] [--workers 8]
+"""
+import argparse
+import heapq
+import json
+import os
+import pickle
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SCRIPT_NAME = "load_test"
+ANSWERS = ("yes", "no", "maybe", "tell me more", "red", "blue")
+
+
+def synthetic_script(questions):
+    """
+    Build compiled script data asking a number of questions
+    :param questions: number of questions asked before the script exits
+    :return: compiled script tuple as saved in a .ncs file
+    """
+    lines = [{"line_number": 1, "command": "script", "text": f'Script: "{SCRIPT_NAME}"', "indent": 0, "data": {},
+              "parent_case_indents": []}]
+    for i in range(questions):
+        phrase = f"Question {i}, what do you think?"
+        lines.append({"line_number": len(lines) + 1, "command": "neon speak", "text": f'Neon speak: "{phrase}"',
+                      "indent": 0, "data": {"name": "Neon", "phrase": phrase}, "parent_case_indents": []})
+        lines.append({"line_number": len(lines) + 1, "command": "voice_input", "text": f"voice_input(answer_{i})",
+                      "indent": 0, "data": {"variable": f"answer_{i}"}, "parent_case_indents": []})
+        phrase = f"You said {{answer_{i}}}"
+        lines.append({"line_number": len(lines) + 1, "command": "neon speak", "text": f'Neon speak: "{phrase}"',
+                      "indent": 0, "data": {"name": "Neon", "phrase": phrase}, "parent_case_indents": []})
+    lines.append({"line_number": len(lines) + 1, "command": "exit", "text": "Exit", "indent": 0, "data": {},
+                  "parent_case_indents": []})
+    variables = {f"answer_{i}": [] for i in range(questions)}
+    return lines, {}, variables, {}, {}, -1, None, None, None, {"cversion": "1", "title": SCRIPT_NAME}
+
+
+def get_rss_mb():
+    """
+    :return: current resident set size in MiB, else the peak if current is unavailable
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values, pct):
+    """
+    :return: the pct percentile of values, or 0 if there are fewer than two
+    """
+    if len(values) < 2:
+        return values[0] if values else 0
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+class LoadGenerator:
+    """
+    Feeds messages from simulated users to a skill. Users are kept in a heap by the time their next message arrives;
+    worker threads handle whichever message is due first.
+    """
+    def __init__(self, skill, users, think, workers, message_class, seed=0):
+        """
+        :param skill: CustomConversations instance serving every user
+        :param users: number of simulated users
+        :param think: mean think time in seconds between the skill's response and a user's next message
+        :param workers: threads handling messages concurrently
+        :param message_class: Message class to build inputs with
+        :param seed: seed for think times and answers
+        """
+        self.skill = skill
+        self.users = [f"user{i}" for i in range(users)]
+        self.think = think
+        self.workers = workers
+        self.message_class = message_class
+        self._random = random.Random(seed)
+        self._lock = threading.Condition()
+        self._due = []  # Heap of (arrival time, user)
+        self._stop = None
+        self.latencies = []
+        self.starts = 0
+        self.errors = 0
+
+    def _think_time(self):
+        return self._random.expovariate(1 / self.think) if self.think > 0 else 0
+
+    def _handle(self, user):
+        """
+        Send a user's next message to the skill
+        :return: True if the message started a script
+        """
+        context = {"username": user, "user": user, "klat_data": {"cid": f"conversation_{user}"}}
+        if user not in self.skill.active_conversations:
+            message = self.message_class("neon.run_alert_script",
+                                         {"utterance": f"run {SCRIPT_NAME}", "file_to_run": SCRIPT_NAME}, context)
+            self.skill.handle_start_script(message)
+            return True
+        else:
+            answer = self._random.choice(ANSWERS)
+            message = self.message_class("recognizer_loop:utterance",
+                                         {"utterances": [answer], "utterance": answer}, context)
+            self.skill.converse(message)
+            return False
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now >= self._stop:
+                        return
+                    if self._due and self._due[0][0] <= now:
+                        arrival, user = heapq.heappop(self._due)
+                        break
+                    timeout = self._stop - now if not self._due else min(self._due[0][0], self._stop) - now
+                    self._lock.wait(timeout)
+            started, failed = False, False
+            try:
+                started = self._handle(user)
+            except Exception:
+                failed = True
+            done = time.monotonic()
+            with self._lock:
+                self.starts += started
+                self.errors += failed
+                self.latencies.append(done - arrival)
+                heapq.heappush(self._due, (done + self._think_time(), user))
+                self._lock.notify()
+
+    def run(self, duration):
+        """
+        Run load for a duration. Users' first messages are spread over one mean think time.
+        :param duration: seconds to generate load for
+        :return: dict of results
+        """
+        start = time.monotonic()
+        self._due = [(start + self._random.uniform(0, self.think), user) for user in self.users]
+        heapq.heapify(self._due)
+        self._stop = start + duration
+        threads = [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+        latencies_ms = sorted(latency * 1000 for latency in self.latencies)
+        return {"users": len(self.users),
+                "turns": len(latencies_ms),
+                "script_starts": self.starts,
+                "errors": self.errors,
+                "throughput": round(len(latencies_ms) / elapsed, 1),
+                "p50_ms": round(percentile(latencies_ms, 50), 2),
+                "p95_ms": round(percentile(latencies_ms, 95), 2),
+                "p99_ms": round(percentile(latencies_ms, 99), 2),
+                "active_sessions": len(self.skill.active_conversations)}
+
+
+def measure_level(module_name, users, duration, think, workers, questions):
+    """
+    Run one load level against a new skill instance in this interpreter
+    :return: dict of results including memory
+    """
+    from startup import _import_skill_module
+    module = _import_skill_module(module_name)
+    from ovos_bus_client import Message
+    from ovos_utils.log import LOG
+    from ovos_utils.messagebus import FakeBus
+    LOG.set_level("ERROR")
+    skill = module.CustomConversations(skill_id="skill-custom_conversation.neongeckocom", bus=FakeBus())
+    if not getattr(skill, "runtime_execution", None):
+        skill.initialize()
+
+    # Serve the synthetic script from a temporary script directory
+    location = tempfile.mkdtemp()
+    skill.__location__ = location
+    skill.text_location = os.path.join(location, "script_txt")
+    skill.transcript_location = os.path.join(location, "script_transcript")
+    os.makedirs(skill.text_location)
+    with open(os.path.join(skill.text_location, SCRIPT_NAME + skill.file_ext), "wb") as f:
+        pickle.dump(synthetic_script(questions), f)
+
+    rss_before = get_rss_mb()
+    result = LoadGenerator(skill, users, think, workers, Message).run(duration)
+    rss_after = get_rss_mb()
+    skill.shutdown()
+    result["rss_mb"] = round(rss_after, 1)
+    result["kb_per_user"] = round((rss_after - rss_before) * 1024 / users, 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per user count")
+    parser.add_argument("--think", type=float, default=5, help="mean seconds between a response and the next input")
+    parser.add_argument("--workers", type=int, default=8, help="threads handling messages")
+    parser.add_argument("--questions", type=int, default=5, help="questions per script run")
+    parser.add_argument("--module", default="skill_custom_conversation")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_level(args.module, args.child, args.duration, args.think, args.workers,
+                                       args.questions)))
+        return
+
+    print(f"{'users':>7} {'turns/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss MiB':>8} "
+          f"{'KiB/user':>9} {'errors':>7}")
+    for users in args.users:
+        output = subprocess.run([sys.executable, __file__, "--child", str(users), "--duration", str(args.duration),
+                                 "--think", str(args.think), "--workers", str(args.workers),
+                                 "--questions", str(args.questions), "--module", args.module],
+                                check=True, capture_output=True, text=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{r['users']:>7} {r['throughput']:>9.1f} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['rss_mb']:>8.1f} {r['kb_per_user']:>9.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Perspective change of captured input: the original chain of `str.replace` calls vs. a single-pass
+PerspectiveTranslator.
+
+    python benchmarks/perspective.py [--number 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_match import PerspectiveTranslator  # noqa: E402
+
+CHANGES = {"am": "are", "your": "my", "my": "your", "me": "you", "i": "you", "you": "i",
+           "myself": "yourself", "yourself": "myself"}
+INPUTS = {"short": "my dog",
+          "sentence": "i think you should tell me about your day and i will tell you about my day",
+          "long": "when i was young my father told me that you can be anything you want to be if you believe in "
+                  "yourself and i have always tried to remember that whenever i doubt myself or my choices"}
+
+
+def legacy_translate(value):
+    """
+    Mirrors the original `_run_sub_string` perspective change
+    """
+    value = f" {value} "
+    for perspective, replacement in CHANGES.items():
+        value = value.replace(perspective, replacement)
+    return value.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    translator = PerspectiveTranslator(CHANGES)
+    for name, text in INPUTS.items():
+        legacy = timeit.timeit(lambda: legacy_translate(text), number=args.number)
+        compiled = timeit.timeit(lambda: translator.translate(text), number=args.number)
+        print(f"{name:<9} legacy={args.number / legacy:12,.0f}/s  translator={args.number / compiled:12,.0f}/s")
+        print(f"          legacy:     {legacy_translate(text)}")
+        print(f"          translator: {translator.translate(text)}")
+
+
+if __name__ == "__main__":
+    main()
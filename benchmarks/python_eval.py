@@ -0,0 +1,78 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Per-evaluation cost of a `Python:` script line: legacy `eval` of raw text vs. a cached CompiledExpression.
+
+    python benchmarks/python_eval.py
+"""
+import os
+import re
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_eval import compile_expression  # noqa: E402
+
+LINES = {"simple": ("total = a + b", {"a": "3", "b": "4"}),
+         "math": ("x = sqrt(a) * sin(pi / b) + log(a)", {"a": "16", "b": "6"}),
+         "long": ("y = (a + b) * (a - b) / (a * b + 1) + a ** 2 - b ** 2 + abs(a - b)", {"a": "7", "b": "3"})}
+
+
+def legacy_evaluate(text, variables):
+    """
+    Mirrors the original `_run_python`: substitute values into text, re-import, rebuild locals, eval raw text
+    """
+    for name, value in variables.items():
+        text = re.sub(rf"\b{name}\b", value, text)
+    from math import sqrt, log, log10, sin, cos, tan, sinh, cosh, tanh, asin, acos, atan, e, pi
+    to_evaluate = text.split('=', 1)[1].strip()
+    return eval(to_evaluate, {}, {"sqrt": sqrt, "ln": log, "log": log10,
+                                  "sin": sin, "cos": cos, "tan": tan,
+                                  "sinh": sinh, "cosh": cosh, "tanh": tanh,
+                                  "asin": asin, "acos": acos, "atan": atan,
+                                  "sleep": time.sleep, "time": time, "e": e, "pi": pi})
+
+
+def main(number=20000):
+    cache = dict()
+    print(f"{'line':<8}{'legacy us':>12}{'compiled us':>14}{'speedup':>10}")
+    for name, (text, variables) in LINES.items():
+        def compiled_evaluate():
+            if text not in cache:
+                cache[text] = compile_expression(text)
+            return cache[text].evaluate(variables)
+        legacy = timeit.timeit(lambda: legacy_evaluate(text, variables), number=number) / number * 1e6
+        compiled = timeit.timeit(compiled_evaluate, number=number) / number * 1e6
+        print(f"{name:<8}{legacy:>12.2f}{compiled:>14.2f}{legacy / compiled:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
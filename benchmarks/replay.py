@@ -0,0 +1,162 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Replay recorded conversation sessions (see the "record_sessions" setting) against this skill on a fake bus and check
+that it says the same things, ignoring timing. Each replay is timed, so a directory of production logs doubles as a
+performance regression corpus. Requires the skill's runtime dependencies and the recorded scripts in `script_txt`.
+
+    python benchmarks/replay.py LOG_OR_DIR [LOG_OR_DIR ...] [--module skill_custom_conversation]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from ovos_utils.messagebus import FakeBus, Message
+from utils_replay import SESSION_LOG_EXT, SessionInputs, SessionRecorder, compare_outputs, get_outputs, \
+    load_session
+
+
+class ReplayBus(FakeBus):
+    """
+    FakeBus that answers the skill's requests from a recorded session instead of other skills
+    """
+    def __init__(self, *args, **kwargs):
+        FakeBus.__init__(self, *args, **kwargs)
+        self.inputs = SessionInputs([])
+
+    def emit(self, message):
+        FakeBus.emit(self, message)
+        cc_data = message.context.get("cc_data", {})
+        if message.msg_type == "recognizer_loop:utterance" and cc_data.get("execute_from_script"):
+            for record in self.inputs.speaks_for_request(cc_data.get("request")):
+                FakeBus.emit(self, _to_message(record))
+
+    def wait_for_response(self, message, reply_type=None, timeout=3.0):
+        self.emit(message)
+        record = self.inputs.next_skill_response()
+        return _to_message(record) if record and record.get("type") else None
+
+
+class ReplayRecorder(SessionRecorder):
+    """
+    Records the replayed session, starting it with the seed of the recorded one
+    """
+    def __init__(self, directory, seed=None):
+        SessionRecorder.__init__(self, directory)
+        self.seed = seed
+        self.path = None  # Path of the last closed log
+
+    def start_session(self, user, script, seed=None):
+        return SessionRecorder.start_session(self, user, script, self.seed)
+
+    def end_session(self, user):
+        path = SessionRecorder.end_session(self, user)
+        self.path = path or self.path
+        return path
+
+
+def _to_message(record):
+    return Message(record.get("type", ""), record.get("data", {}), record.get("context", {}))
+
+
+def replay_session(skill, bus, path, output_dir):
+    """
+    Feed a recorded session to a skill
+    :param skill: CustomConversations instance using `bus`
+    :param bus: ReplayBus
+    :param path: session log to replay
+    :param output_dir: directory to record the replayed session to
+    :return: dict of results
+    """
+    header, records = load_session(path)
+    bus.inputs = SessionInputs(records)
+    recorder = ReplayRecorder(output_dir, header["seed"])
+    skill._session_recorder = recorder
+    # Responses to executed requests are delivered synchronously, so never wait on one that wasn't recorded
+    skill.response_timeout = 0
+    handlers = {"start": skill.handle_start_script,
+                "utterance": skill.converse,
+                "timeout": skill._handle_timeout}
+    start = time.perf_counter()
+    for record in bus.inputs.driving:
+        handlers[record["k"]](_to_message(record))
+    elapsed = time.perf_counter() - start
+    # Close the log if the script is still waiting for input
+    recorder.end_session(header["user"])
+    outputs = get_outputs(load_session(recorder.path)[1]) if recorder.path else []
+    differences = compare_outputs(get_outputs(records), outputs)
+    return {"log": path,
+            "script": header["script"],
+            "inputs": len(bus.inputs.driving),
+            "replay_ms": round(elapsed * 1000, 2),
+            "matched": not differences,
+            "differences": differences,
+            "unused_responses": bus.inputs.remaining}
+
+
+def _find_logs(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(SESSION_LOG_EXT))
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+", help="session logs or directories of session logs")
+    parser.add_argument("--module", default="skill_custom_conversation")
+    args = parser.parse_args()
+
+    from startup import _import_skill_module
+    module = _import_skill_module(args.module)
+    bus = ReplayBus()
+    skill = module.CustomConversations(skill_id="skill-custom_conversation.neongeckocom", bus=bus)
+    if not getattr(skill, "runtime_execution", None):
+        skill.initialize()
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as output_dir:
+        for path in _find_logs(args.logs):
+            result = replay_session(skill, bus, path, output_dir)
+            failed += not result["matched"]
+            print(json.dumps(result))
+    skill.shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
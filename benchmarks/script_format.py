@@ -0,0 +1,101 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Cost of validating and starting a compiled script: loading the pickled .ncs file vs. its precompiled container (.ncb).
+Validation reads only the container header; after the first start, a container's script lines are already decoded.
+
+    python benchmarks/script_format.py [--lines 500] [--starts 200] [--script path/to/script.ncs]
+"""
+import argparse
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script_memory import synthetic_script  # noqa: E402
+from utils_script import CONTAINER_EXT, ScriptContainer, get_current_container, load_compiled_script, \
+    validate_compiled_script, write_container  # noqa: E402
+
+
+def measure(func, count):
+    """
+    :param func: callable to time
+    :param count: number of calls
+    :return: mean microseconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--starts", type=int, default=200)
+    parser.add_argument("--script", help="compiled script to measure instead of a synthetic one")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        source = os.path.join(directory, "test.ncs")
+        if args.script:
+            shutil.copy(args.script, source)
+        else:
+            with open(source, "wb") as f:
+                pickle.dump(synthetic_script(args.lines), f)
+        path = os.path.join(directory, "test" + CONTAINER_EXT)
+        write_container(path, load_compiled_script(source), source)
+
+        def container_validate():
+            container = ScriptContainer(path)
+            container.validate()
+            container.close()
+
+        results = {"validate .ncs": measure(lambda: validate_compiled_script(load_compiled_script(source)),
+                                            args.starts),
+                   "validate .ncb header": measure(container_validate, args.starts),
+                   "start .ncs": measure(lambda: load_compiled_script(source), args.starts),
+                   "first start .ncb": measure(lambda: ScriptContainer(path).to_cache(), args.starts),
+                   "next start .ncb": measure(lambda: get_current_container(directory, "test.ncs").to_cache(),
+                                              args.starts)}
+        print(f".ncs {os.path.getsize(source):,} bytes, .ncb {os.path.getsize(path):,} bytes")
+        for name, micros in results.items():
+            print(f"{name:<22}{micros:>12.1f} us")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
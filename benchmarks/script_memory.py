@@ -0,0 +1,116 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Memory held per additional concurrent session of the same script: a private unpickled copy of the script lines per
+session (and per `pending_scripts` snapshot) vs. lines shared through a ScriptIndex.
+
+    python benchmarks/script_memory.py [--lines 500] [--sessions 100] [--script path/to/script.ncs]
+"""
+import argparse
+import os
+import pickle
+import sys
+import tracemalloc
+
+from copy import deepcopy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_script import FORMATTED_SCRIPT, VARIABLES, LOOPS, GOTO_TAGS, ScriptIndex  # noqa: E402
+
+
+def synthetic_script(num_lines):
+    """
+    Build compiled script data with a realistic mix of lines
+    """
+    lines = []
+    for i in range(num_lines):
+        if i % 5 == 0:
+            lines.append({"line_number": i, "command": "voice_input", "text": f"voice_input(answer_{i % 20})",
+                          "indent": 1, "data": {"variable": f"answer_{i % 20}"}, "parent_case_indents": []})
+        else:
+            phrase = f"This is line {i % 40} of the demo script, say something to continue"
+            lines.append({"line_number": i, "command": "neon speak", "text": f'Neon speak: "{phrase}"', "indent": 1,
+                          "data": {"name": "Neon", "phrase": phrase}, "parent_case_indents": []})
+    variables = {f"answer_{i}": [] for i in range(20)}
+    return lines, {}, variables, {}, {}, 0, None, None, None, {"cversion": "1"}
+
+
+def measure(sessions, new_session):
+    """
+    Measure memory retained by a number of sessions
+    :return: bytes per session
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [new_session() for _ in range(sessions)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--script", help="compiled script to measure instead of a synthetic one")
+    args = parser.parse_args()
+
+    if args.script:
+        with open(args.script, "rb") as f:
+            blob = f.read()
+    else:
+        blob = pickle.dumps(synthetic_script(args.lines))
+    cache = pickle.loads(blob)
+    index = ScriptIndex(cache[FORMATTED_SCRIPT], cache[LOOPS], cache[GOTO_TAGS])
+
+    def private_session():
+        loaded = pickle.loads(blob)
+        session = {"formatted_script": loaded[FORMATTED_SCRIPT], "variables": loaded[VARIABLES],
+                   "loops_dict": loaded[LOOPS], "goto_tags": loaded[GOTO_TAGS]}
+        # A `pending_scripts` snapshot, as made when the script runs another script
+        return session, deepcopy(session)
+
+    def shared_session():
+        session = {"formatted_script": index.formatted_script, "variables": pickle.loads(blob)[VARIABLES],
+                   "loops_dict": index.loops_dict, "goto_tags": index.goto_tags, "script_index": index}
+        return session, deepcopy(session)
+
+    private = measure(args.sessions, private_session)
+    shared = measure(args.sessions, shared_session)
+    print(f"script lines: {len(cache[FORMATTED_SCRIPT])}, sessions: {args.sessions}")
+    print(f"private lines per session: {private:12,.0f} bytes")
+    print(f"shared lines per session:  {shared:12,.0f} bytes")
+    print(f"saved per session:         {private - shared:12,.0f} bytes ({(1 - shared / private) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Bus messages and time-to-last-word for blocks of static `Neon speak` lines, with and without `Speak mode: coalesce`.
+Time-to-last-word is the skill's time to emit the last speak message of a block plus a fixed round-trip and TTS
+startup cost per emission (`--tts-overhead-ms`); synthesis time for the text itself is the same either way and is not
+included. Requires the skill's runtime dependencies.
+
+    python benchmarks/speak_coalesce.py [--blocks 20] [--lines 4] [--tts-overhead-ms 200]
+"""
+import argparse
+import os
+import pickle
+import statistics
+import tempfile
+import time
+
+SCRIPT_NAME = "speak_test"
+
+
+def synthetic_script(blocks, lines_per_block, coalesce):
+    """
+    Build compiled script data with blocks of static speak lines, each followed by a question
+    :param blocks: number of speak blocks
+    :param lines_per_block: static speak lines per block
+    :param coalesce: True to declare `Speak mode: coalesce` in the header
+    :return: compiled script tuple as saved in a .ncs file
+    """
+    def add(command, text, indent=0, data=None):
+        lines.append({"line_number": len(lines) + 1, "command": command, "text": text, "indent": indent,
+                      "data": data or {}, "parent_case_indents": []})
+
+    lines = []
+    add("script", f'Script: "{SCRIPT_NAME}"')
+    if coalesce:
+        add("speak mode", "Speak mode: coalesce")
+    for block in range(blocks):
+        add("neon speak", "Neon speak:", data={"name": "Neon", "phrase": "Neon speak:"})
+        for i in range(lines_per_block):
+            phrase = f"This is sentence {i} of block {block}."
+            add("neon speak", phrase, 1, {"name": "Neon", "phrase": phrase})
+        add("voice_input", f"voice_input(answer_{block})", data={"variable": f"answer_{block}"})
+    add("exit", "Exit")
+    return lines, {}, {f"answer_{i}": [] for i in range(blocks)}, {}, {}, -1, None, None, None, \
+        {"cversion": "1", "title": SCRIPT_NAME}
+
+
+def run_script(skill, bus, message_class, blocks):
+    """
+    Run the test script, answering every question
+    :param skill: CustomConversations instance using `bus`, with the test script in its script directory
+    :param bus: FakeBus the skill emits to
+    :param message_class: Message class to build inputs with
+    :param blocks: number of speak blocks in the script
+    :return: list of speak messages emitted per block, list of seconds until the last speak of each block
+    """
+    emitted = []
+    bus.on("speak", lambda message: emitted.append(time.perf_counter()))
+    context = {"username": "speak_test", "user": "speak_test"}
+    messages, seconds = [], []
+    for block in range(blocks):
+        emitted.clear()
+        start = time.perf_counter()
+        if block == 0:
+            skill.handle_start_script(message_class("neon.run_alert_script",
+                                                    {"utterance": f"run {SCRIPT_NAME}",
+                                                     "file_to_run": SCRIPT_NAME}, context))
+        else:
+            skill.converse(message_class("recognizer_loop:utterance", {"utterances": ["yes"]}, context))
+        messages.append(len(emitted))
+        seconds.append(emitted[-1] - start if emitted else 0)
+    # Answer the last question so the script exits
+    skill.converse(message_class("recognizer_loop:utterance", {"utterances": ["yes"]}, context))
+    return messages, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=4, help="static speak lines per block")
+    parser.add_argument("--tts-overhead-ms", type=float, default=200,
+                        help="round-trip and TTS startup cost per speak message")
+    parser.add_argument("--module", default="skill_custom_conversation")
+    args = parser.parse_args()
+
+    from startup import _import_skill_module
+    module = _import_skill_module(args.module)
+    from ovos_bus_client import Message
+    from ovos_utils.log import LOG
+    from ovos_utils.messagebus import FakeBus
+    LOG.set_level("ERROR")
+
+    for coalesce in (False, True):
+        bus = FakeBus()
+        skill = module.CustomConversations(skill_id="skill-custom_conversation.neongeckocom", bus=bus)
+        if not getattr(skill, "runtime_execution", None):
+            skill.initialize()
+        location = tempfile.mkdtemp()
+        skill.__location__ = location
+        skill.text_location = os.path.join(location, "script_txt")
+        skill.transcript_location = os.path.join(location, "script_transcript")
+        os.makedirs(skill.text_location)
+        with open(os.path.join(skill.text_location, SCRIPT_NAME + skill.file_ext), "wb") as f:
+            pickle.dump(synthetic_script(args.blocks, args.lines, coalesce), f)
+
+        messages, seconds = run_script(skill, bus, Message, args.blocks)
+        skill.shutdown()
+        last_word_ms = [s * 1000 + n * args.tts_overhead_ms for n, s in zip(messages, seconds)]
+        print(f"{'coalesced' if coalesce else 'per line':<10} speak messages per block: "
+              f"{statistics.mean(messages):5.1f}  skill ms to last emission: {statistics.mean(seconds) * 1000:8.2f}  "
+              f"est. ms to last word: {statistics.mean(last_word_ms):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Skill startup time: module import plus construction/`initialize()` wall time, each measured in a fresh interpreter so
+import caching doesn't hide cold-start cost. Requires the skill's runtime dependencies.
+
+    python benchmarks/startup.py [--runs 5] [--module skill_custom_conversation]
+"""
+import argparse
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_skill_module(module_name):
+    """
+    Import the installed skill package, else this repository as a package
+    """
+    try:
+        return importlib.import_module(module_name)
+    except ImportError:
+        sys.path.insert(0, os.path.dirname(REPO_ROOT))
+        return importlib.import_module(os.path.basename(REPO_ROOT))
+
+
+def measure_once(module_name):
+    """
+    Measure a single cold start in this interpreter
+    :return: dict of import, initialize, and total time in ms plus heavy modules loaded
+    """
+    start = time.perf_counter()
+    module = _import_skill_module(module_name)
+    imported = time.perf_counter()
+    from ovos_utils.messagebus import FakeBus
+    bus = FakeBus()
+    constructed = time.perf_counter()
+    skill = module.CustomConversations(skill_id="skill-custom_conversation.neongeckocom", bus=bus)
+    if not getattr(skill, "runtime_execution", None):
+        skill.initialize()
+    initialized = time.perf_counter()
+    heavy = [m for m in ("git", "bs4", "nltk", "difflib") if m in sys.modules]
+    skill.shutdown()
+    return {"import_ms": (imported - start) * 1000,
+            "initialize_ms": (initialized - constructed) * 1000,
+            "total_ms": (initialized - start - (constructed - imported)) * 1000,
+            "heavy_modules_loaded": heavy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="skill_custom_conversation")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_once(args.module)))
+        return
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, __file__, "--child", "--module", args.module],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    for key in ("import_ms", "initialize_ms", "total_ms"):
+        values = [r[key] for r in results]
+        print(f"{key:<15} median={statistics.median(values):8.1f}  min={min(values):8.1f}  max={max(values):8.1f}")
+    print(f"heavy modules loaded at startup: {results[-1]['heavy_modules_loaded'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
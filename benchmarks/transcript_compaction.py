@@ -0,0 +1,93 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Compaction of a transcript directory into per-day or per-script archives: throughput, bytes and disk space saved,
+directory listing time before and after, and the time to read one archived transcript.
+
+    python benchmarks/transcript_compaction.py [--runs 5000] [--lines 20] [--scripts 50] [--group-by day]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcripts import write_transcripts  # noqa: E402
+from utils_transcript import ARCHIVE_GROUPS, TranscriptCompactor  # noqa: E402
+
+
+def list_directory(directory, count=20):
+    """
+    :return: mean milliseconds to list `directory`
+    """
+    start = time.perf_counter()
+    for _ in range(count):
+        os.listdir(directory)
+    return (time.perf_counter() - start) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--scripts", type=int, default=50)
+    parser.add_argument("--group-by", choices=ARCHIVE_GROUPS, default="day")
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        write_transcripts(directory, args.runs, args.lines, args.scripts)
+        filenames = os.listdir(directory)
+        listing = list_directory(directory)
+        compactor = TranscriptCompactor(directory, args.group_by, min_age=0)
+        compactor.compact()
+        metrics = compactor.get_metrics()
+        print(f"{metrics['transcripts']} transcripts archived at {metrics['throughput_mb_s']}MB/s "
+              f"({metrics['elapsed_ms']:.0f}ms): {metrics['bytes_in']:,}B -> {metrics['bytes_out']:,}B, "
+              f"{metrics['disk_bytes_in']:,}B on disk before")
+        print(f"saved {metrics['bytes_saved']:,}B ({metrics['disk_bytes_saved']:,}B on disk); "
+              f"{len(filenames)} files -> {len(os.listdir(os.path.join(directory, 'archive')))} archive files")
+        print(f"list directory: {listing:.2f}ms before, {list_directory(directory):.3f}ms after")
+
+        sample = random.sample(filenames, min(args.reads, len(filenames)))
+        start = time.perf_counter()
+        for filename in sample:
+            compactor.read(filename)
+        print(f"read one archived transcript: {(time.perf_counter() - start) / len(sample) * 1000:.3f}ms")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
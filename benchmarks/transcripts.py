@@ -0,0 +1,118 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Cost of finding transcript lines for one script in a time range: reading and parsing every transcript file vs. querying
+the transcript store, after ingesting the files in bulk.
+
+    python benchmarks/transcripts.py [--runs 2000] [--lines 20] [--scripts 50] [--queries 50]
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils_transcript import TRANSCRIPT_DB, TranscriptStore, parse_transcript, transcript_source  # noqa: E402
+
+
+def write_transcripts(directory, runs, num_lines, scripts):
+    """
+    Write transcript files for runs of `scripts` scripts, one minute apart
+    :return: epoch second of the first run
+    """
+    first = int(time.time()) - runs * 60
+    for run in range(runs):
+        script = f"script_{run % scripts}"
+        start_time = first + run * 60
+        with open(os.path.join(directory, transcript_source(script, start_time)), "w") as f:
+            f.write(f"RUNNING SCRIPT {script}\n")
+            for idx in range(num_lines):
+                said = datetime.datetime.fromtimestamp(start_time + idx).isoformat()
+                speaker = "local" if idx % 2 else "Neon"
+                f.write(f'{said}, {speaker} said: "line {idx} of run {run} {random.choice(("yes", "no"))}" \n')
+    return first
+
+
+def scan(directory, script, start, end):
+    lines = []
+    for filename in os.listdir(directory):
+        if filename.startswith(f"{script}_") and filename.endswith(".txt"):
+            with open(os.path.join(directory, filename)) as f:
+                lines.extend(line for line in parse_transcript(f.read()) if start <= line[0] <= end)
+    return sorted(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--scripts", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        first = write_transcripts(directory, args.runs, args.lines, args.scripts)
+        store = TranscriptStore(os.path.join(directory, TRANSCRIPT_DB))
+        result = store.ingest_directory(directory)
+        print(f"ingested {result['runs']} transcripts, {result['lines']} lines in {result['elapsed_ms']:.1f}ms")
+
+        span = args.runs * 60
+        windows = [(f"script_{random.randrange(args.scripts)}", first + random.randrange(span // 2))
+                   for _ in range(args.queries)]
+        windows = [(script, start, start + span // 4) for script, start in windows]
+        script, start, end = windows[0]
+        assert len(scan(directory, script, start, end)) == \
+            len(store.query(script=script, start=start, end=end, limit=args.runs * args.lines))
+
+        timed = time.perf_counter()
+        for script, start, end in windows[:max(args.queries // 10, 1)]:
+            scan(directory, script, start, end)
+        scanned = (time.perf_counter() - timed) / max(args.queries // 10, 1) * 1000
+        timed = time.perf_counter()
+        for script, start, end in windows:
+            store.query(script=script, start=start, end=end, limit=args.runs * args.lines)
+        queried = (time.perf_counter() - timed) / args.queries * 1000
+        timed = time.perf_counter()
+        for _ in range(args.queries):
+            store.query(text="yes AND run", limit=100)
+        text = (time.perf_counter() - timed) / args.queries * 1000
+        store.close()
+        print(f"script time range: scan files {scanned:.2f}ms, store {queried:.2f}ms; full-text query {text:.2f}ms")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -97,5 +97,7 @@ setup(
     packages=[SKILL_PKG],
     package_data={SKILL_PKG: find_resource_files()},
     include_package_data=True,
-    entry_points={"ovos.plugin.skill": PLUGIN_ENTRY_POINT}
+    entry_points={"ovos.plugin.skill": PLUGIN_ENTRY_POINT,
+                  "console_scripts": [f"neon-cc-precompile={SKILL_PKG}.utils_script:main",
+                                      f"neon-cc-transcripts={SKILL_PKG}.utils_transcript:main"]}
 )
@@ -173,6 +173,13 @@ class TestConversationManager(unittest.TestCase):
         self.assertIsNone(self.manager.lookup_variable_in_conversation("."))
         self.assertIsNone(self.manager.lookup_variable_in_conversation(""))
 
+    def test_rng(self):
+        other = ConversationManager()
+        self.assertIsNot(self.manager.rng, other.rng)
+        self.manager.rng.seed(42)
+        other.rng.seed(42)
+        self.assertEqual(self.manager.rng.sample(range(100), 5), other.rng.sample(range(100), 5))
+
 
 if __name__ == '__main__':
     unittest.main()
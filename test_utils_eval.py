@@ -0,0 +1,152 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import math
+import unittest
+
+from utils_eval import CompiledExpression, EvaluationBudget, ExpressionError, compile_expression, \
+    get_compiled_expression, EXPRESSION_CACHE_SIZE
+
+
+class TestCompiledExpression(unittest.TestCase):
+
+    def test_arithmetic(self):
+        self.assertEqual(compile_expression("2 * 3 + sqrt(16)").evaluate(), 10)
+        self.assertAlmostEqual(compile_expression("sin(pi / 2)").evaluate(), 1.0)
+        self.assertEqual(compile_expression("max(1, 5, 3) - abs(-2)").evaluate(), 3)
+
+    def test_assignment(self):
+        expression = compile_expression("total = a + b")
+        self.assertEqual(expression.target, "total")
+        self.assertEqual(expression.names, {"a", "b"})
+        self.assertEqual(expression.evaluate({"a": "3", "b": 4.5}), 7.5)
+
+    def test_comparison_is_not_assignment(self):
+        expression = compile_expression("a == 2")
+        self.assertIsNone(expression.target)
+        self.assertTrue(expression.evaluate({"a": "2"}))
+
+    def test_braced_variables(self):
+        expression = compile_expression("x = {count} ** 2")
+        self.assertEqual(expression.names, {"count"})
+        self.assertEqual(expression.evaluate({"count": "12"}), 144)
+
+    def test_braced_namespace_names(self):
+        # Braced names are always script variables, even where a built-in has the same name
+        expression = compile_expression("x = {time} + {e} + max(1, {max})")
+        self.assertEqual(expression.names, {"time", "e", "max"})
+        self.assertEqual(expression.evaluate({"time": "1", "e": "2", "max": "3"}), 6)
+        self.assertEqual(compile_expression("e").evaluate(), math.e)
+        with self.assertRaises(ExpressionError):
+            compile_expression("{pi} * 2").evaluate()
+
+    def test_braced_variables_in_strings(self):
+        expression = compile_expression("greeting = 'hello {name}, it is {time}' == 'hello Bob, it is 5'")
+        self.assertEqual(expression.names, {"name", "time"})
+        self.assertTrue(expression.evaluate({"name": "Bob", "time": "5"}))
+        self.assertEqual(compile_expression("'{ x }!'").evaluate({"x": "05"}), "05!")
+        self.assertEqual(compile_expression("'{not a variable}'").evaluate(), "{not a variable}")
+        with self.assertRaises(ExpressionError):
+            compile_expression("{_guard}").evaluate()
+
+    def test_reuse(self):
+        expression = compile_expression("n = n + 1")
+        value = 0
+        for _ in range(10):
+            value = expression.evaluate({"n": value})
+        self.assertEqual(value, 10)
+
+    def test_undeclared_variable(self):
+        with self.assertRaises(ExpressionError):
+            compile_expression("a + 1").evaluate()
+
+    def test_rejected_syntax(self):
+        for text in ("__import__('os')", "sleep(10)", "time.sleep(10)", "[x for x in range(10)]",
+                     "lambda: 1", "(1).__class__", "x = ", "round(1.234, ndigits=2)"):
+            with self.assertRaises(ExpressionError, msg=text):
+                compile_expression(text).evaluate({"x": 1})
+
+    def test_time_is_available(self):
+        self.assertIsInstance(compile_expression("time.time()").evaluate(), float)
+
+    def test_operation_budget(self):
+        with self.assertRaises(ExpressionError):
+            compile_expression(" + ".join(["1"] * 200))
+        self.assertEqual(CompiledExpression(" + ".join(["1"] * 200),
+                                            EvaluationBudget(max_nodes=1000)).evaluate(), 200)
+
+    def test_size_budget(self):
+        with self.assertRaises(ExpressionError):
+            compile_expression("9 ** 9 ** 9").evaluate()
+        with self.assertRaises(ExpressionError):
+            compile_expression("2 ** 1000 * 2 ** 1000 * 2 ** 1000 * 2 ** 1000 * 2 ** 1000 * 2 ** 1000 * "
+                               "2 ** 1000 * 2 ** 1000 * 2 ** 1000 * 2 ** 1000 * 2 ** 1000 * 2 ** 1000 * "
+                               "2 ** 1000 * 2 ** 1000 * 2 ** 1000").evaluate()
+        with self.assertRaises(ExpressionError):
+            compile_expression("s * 100000").evaluate({"s": "ab"})
+        # Repeated tuples are checked before they are allocated
+        with self.assertRaises(ExpressionError):
+            compile_expression("x = (0, 0, 0, 0, 0, 0, 0, 0, 0, 0) * 10 ** 8").evaluate()
+        with self.assertRaises(ExpressionError):
+            compile_expression("10000 * (1, 2, 3)").evaluate()
+
+    def test_power_size_estimated(self):
+        computed = []
+
+        class Base(int):
+            def __pow__(self, other):
+                computed.append(other)
+                return int(self) ** other
+
+        with self.assertRaises(ExpressionError):
+            compile_expression("(10 ** 1000) ** 1000").evaluate()
+        # Rejected before the power is computed
+        with self.assertRaises(ExpressionError):
+            compile_expression("x ** 1000").evaluate({"x": Base(10 ** 1000)})
+        self.assertEqual(computed, [])
+        self.assertEqual(compile_expression("(10 ** 10) ** 10").evaluate(), 10 ** 100)
+        self.assertEqual(compile_expression("0.5 ** 1000").evaluate(), 0.5 ** 1000)
+
+    def test_compiled_expression_cache(self):
+        self.assertIs(get_compiled_expression("1 + 2"), get_compiled_expression("1 + 2"))
+        for idx in range(EXPRESSION_CACHE_SIZE + 1):
+            get_compiled_expression(f"{idx} + 1")
+        self.assertLessEqual(get_compiled_expression.cache_info().currsize, EXPRESSION_CACHE_SIZE)
+
+    def test_time_budget(self):
+        expression = CompiledExpression("a * a", EvaluationBudget(max_seconds=-1))
+        with self.assertRaises(ExpressionError):
+            expression.evaluate({"a": 2})
+
+    def test_runtime_error(self):
+        with self.assertRaises(ExpressionError):
+            compile_expression("1 / 0").evaluate()
+
+
+if __name__ == '__main__':
+    unittest.main()
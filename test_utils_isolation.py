@@ -0,0 +1,118 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import time
+import unittest
+
+from utils_eval import ExpressionError, evaluate_expression
+from utils_isolation import IsolatedPool, IsolationError
+
+
+def _pid():
+    return os.getpid()
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _spin():
+    while True:
+        pass
+
+
+def _allocate(mb):
+    return len(bytearray(mb * 1024 * 1024))
+
+
+def _exit():
+    os._exit(3)
+
+
+class TestIsolatedPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = IsolatedPool(workers=1, timeout=2, max_memory_mb=64, max_cpu_seconds=1, preload=("utils_eval",))
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_call(self):
+        self.assertEqual(self.pool.call(evaluate_expression, "x = a * 2 + 1", {"a": "4"}), 9)
+        with self.assertRaises(ExpressionError):
+            self.pool.call(evaluate_expression, "a + b", {"a": 1})
+        # Workers are reused and run outside this process
+        pids = {self.pool.call(_pid), self.pool.call(_pid)}
+        self.assertNotIn(os.getpid(), pids)
+        self.assertEqual(len(pids), 1)
+
+    def test_recycle(self):
+        self.pool.max_calls = 3
+        pids = [self.pool.call(_pid) for _ in range(4)]
+        self.assertEqual(len(set(pids[:3])), 1)
+        self.assertNotEqual(pids[2], pids[3])
+        self.assertEqual(self.pool.get_metrics()["restarts"], 1)
+
+    def test_limits(self):
+        self.pool.timeout = 0.2
+        with self.assertRaises(IsolationError):
+            self.pool.call(_sleep, 5)
+        self.pool.timeout = 5
+        with self.assertRaises(IsolationError):
+            self.pool.call(_spin)
+        with self.assertRaises(IsolationError):
+            self.pool.call(_allocate, 128)
+        self.assertEqual(self.pool.call(_allocate, 8), 8 * 1024 * 1024)
+        with self.assertRaises(IsolationError):
+            self.pool.call(_exit)
+        # The pool recovers from every failure
+        self.assertEqual(self.pool.call(_sleep, 0), 0)
+        metrics = self.pool.get_metrics()
+        self.assertEqual((metrics["workers"], metrics["timeouts"]), (1, 1))
+        self.assertEqual(metrics["errors"], 3)
+
+    def test_startup(self):
+        # Workers are started from a clean process, and their startup isn't counted against a call's timeout
+        pool = IsolatedPool(workers=1, timeout=0.5, preload=("utils_eval", "not_a_module"))
+        try:
+            self.assertEqual(pool.call(_sleep, 0), 0)
+            self.assertEqual(pool._context.get_start_method(), "forkserver")
+        finally:
+            pool.shutdown()
+
+    def test_shutdown(self):
+        self.pool.shutdown()
+        self.assertEqual(self.pool.get_metrics()["workers"], 0)
+        with self.assertRaises(IsolationError):
+            self.pool.call(_pid)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import base64
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from utils_mail import EmailQueue, OutboundEmail, encode_attachment, send_each
+
+
+class _EmailEndpoint(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the email endpoint; records each batch of emails and fails the first `failures` requests
+    """
+    def do_POST(self):
+        server = self.server
+        emails = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests += 1
+        if server.requests <= server.failures:
+            self.send_response(503)
+        else:
+            server.batches.append(emails)
+            self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestEmailQueue(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _EmailEndpoint)
+        self.server.requests, self.server.failures, self.server.batches = 0, 0, []
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/email"
+        self.queue = EmailQueue(self._send, batch_delay=0.2, backoff=0.1)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.queue.stop(5)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def _send(self, emails):
+        request = Request(self.url, json.dumps(emails).encode(), {"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=5):
+                return [True] * len(emails)
+        except HTTPError:
+            return [False] * len(emails)
+
+    def test_batched_send(self):
+        sent = []
+        for idx in range(3):
+            self.queue.enqueue(OutboundEmail("test@neon.ai", f"subject {idx}", "body", callback=sent.append))
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(len(self.server.batches), 1)
+        self.assertEqual([email["subject"] for email in self.server.batches[0]],
+                         ["subject 0", "subject 1", "subject 2"])
+        self.assertEqual(sent, [True, True, True])
+        metrics = self.queue.get_metrics()
+        self.assertEqual((metrics["sent"], metrics["batches"], metrics["pending"]), (3, 1, 0))
+
+    def test_partial_batch_failure(self):
+        sent, attempts = [], []
+
+        def send_one(email):
+            attempts.append(email["recipient"])
+            if email["recipient"] == "b" and attempts.count("b") == 1:
+                raise ConnectionError("endpoint unavailable")
+            sent.append(email["recipient"])
+
+        self.queue.send = lambda emails: send_each(send_one, emails)
+        for recipient in ("a", "b", "c"):
+            self.queue.enqueue(OutboundEmail(recipient, "subject", "body"))
+        self.assertTrue(self.queue.flush(5))
+        # Only the email that failed is sent again
+        self.assertEqual(attempts, ["a", "b", "c", "b"])
+        self.assertEqual(sorted(sent), ["a", "b", "c"])
+        self.assertEqual(self.queue.get_metrics()["retries"], 1)
+
+    def test_retry_with_backoff(self):
+        self.server.failures = 2
+        start = time.monotonic()
+        self.queue.enqueue(OutboundEmail("test@neon.ai", "subject", "body"))
+        self.assertTrue(self.queue.flush(5))
+        # Retried after 0.1s, then 0.2s
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(self.server.requests, 3)
+        metrics = self.queue.get_metrics()
+        self.assertEqual((metrics["sent"], metrics["retries"], metrics["failed"]), (1, 2, 0))
+
+    def test_dropped(self):
+        self.server.failures = 10
+        self.queue.max_attempts = 2
+        sent = []
+        self.queue.enqueue(OutboundEmail("test@neon.ai", "subject", "body", callback=sent.append))
+        self.queue.enqueue(OutboundEmail("test@neon.ai", "subject", "body", {"missing.txt": "/missing/file"},
+                                         callback=sent.append))
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(sent, [False, False])
+        # Emails with missing attachments aren't retried
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.queue.get_metrics()["failed"], 2)
+
+    def test_attachments(self):
+        path = os.path.join(self.directory, "script.nct")
+        content = os.urandom(1000)
+        with open(path, "wb") as f:
+            f.write(content)
+        for chunk_size in (3, 10, 999, 4096):
+            self.assertEqual(encode_attachment(path, chunk_size), base64.b64encode(content).decode())
+        self.assertEqual(encode_attachment(b"abcd"), base64.b64encode(b"abcd").decode())
+
+        self.queue.enqueue(OutboundEmail("test@neon.ai", "subject", "body", {"script.nct": path}))
+        self.assertTrue(self.queue.flush(5))
+        attachment = self.server.batches[0][0]["attachments"]["script.nct"]
+        self.assertEqual(base64.b64decode(attachment), content)
+
+
+if __name__ == '__main__':
+    unittest.main()
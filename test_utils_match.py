@@ -0,0 +1,115 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import tempfile
+import unittest
+
+from utils_match import OptionMatcher, PerspectiveTranslator, get_option_matcher, build_phrase_index, \
+    normalize_phrase
+
+
+class TestOptionMatcher(unittest.TestCase):
+    def test_longest_match(self):
+        matcher = OptionMatcher(["red", "dark red", "blue", "new york", "york"])
+        self.assertEqual(matcher.match("i like dark red"), "dark red")
+        self.assertEqual(matcher.match("red"), "red")
+        self.assertEqual(matcher.match("take me to new york"), "new york")
+        self.assertEqual(matcher.match("york or blue"), "york")
+        self.assertIsNone(matcher.match("green"))
+        self.assertIsNone(matcher.match(""))
+
+    def test_word_boundaries(self):
+        matcher = OptionMatcher(["he", "she", "hers", "a", "c++"])
+        self.assertIsNone(matcher.match("ushers"))
+        self.assertIsNone(matcher.match("the cat"))
+        self.assertEqual(matcher.match("it was hers."), "hers")
+        self.assertEqual(matcher.match("she, then he"), "she")
+        self.assertEqual(matcher.match("I want a pony"), "a")
+        self.assertEqual(matcher.match("i write c++ code"), "c++")
+
+    def test_options_as_declared(self):
+        matcher = OptionMatcher(["Athens", "athens", " ", "", "Rome "])
+        self.assertEqual(matcher.match("a trip to ATHENS"), "Athens")
+        self.assertEqual(matcher.match("rome"), "Rome ")
+        self.assertIsNone(OptionMatcher([]).match("anything"))
+
+    def test_many_options(self):
+        options = [f"option {i}" for i in range(1000)]
+        matcher = OptionMatcher(options)
+        self.assertEqual(matcher.match("i pick option 999 please"), "option 999")
+        self.assertEqual(matcher.match("option 10"), "option 10")
+        self.assertIsNone(matcher.match("option 1000"))
+
+    def test_cached(self):
+        self.assertIs(get_option_matcher(("a", "b")), get_option_matcher(("a", "b")))
+        self.assertIsNot(get_option_matcher(("a", "b")), get_option_matcher(("a", "c")))
+
+
+class TestPerspectiveTranslator(unittest.TestCase):
+    changes = {"am": "are", "your": "my", "my": "your", "me": "you", "i": "you", "you": "i",
+               "myself": "yourself", "yourself": "myself"}
+
+    def test_swaps(self):
+        translator = PerspectiveTranslator(self.changes)
+        self.assertEqual(translator.translate("i am happy with my hat"), "you are happy with your hat")
+        self.assertEqual(translator.translate("you gave me your hat"), "i gave you my hat")
+        self.assertEqual(translator.translate("myself and yourself"), "yourself and myself")
+        self.assertEqual(translator.translate("I AM here"), "you are here")
+
+    def test_whole_words(self):
+        translator = PerspectiveTranslator(self.changes)
+        self.assertEqual(translator.translate("my name is sam"), "your name is sam")
+        self.assertEqual(translator.translate("i'm mine, yours"), "i'm mine, yours")
+        self.assertEqual(translator.translate("me, my, i."), "you, your, you.")
+        self.assertEqual(translator.translate(""), "")
+
+    def test_configured_map(self):
+        translator = PerspectiveTranslator({"yo": "tú", "tú": "yo", "mi casa": "tu casa", "mi": "tu", "": "x"})
+        self.assertEqual(translator.translate("yo y tú en mi casa con mi perro"), "tú y yo en tu casa con tu perro")
+        self.assertEqual(PerspectiveTranslator({}).translate("my hat"), "my hat")
+
+
+class TestPhraseIndex(unittest.TestCase):
+    def test_normalize_phrase(self):
+        self.assertEqual(normalize_phrase('"Are you ill?"'), "are you ill")
+        self.assertEqual(normalize_phrase("GO TO THE  EMERGENCY DEPARTMENT."), "go to the emergency department")
+        self.assertEqual(normalize_phrase("Don\u2019t worry, it's ok"), normalize_phrase("dont worry its OK"))
+
+    def test_build_phrase_index(self):
+        directory = tempfile.mkdtemp()
+        for file in ("Are you ill?.mp3", "Goodbye.WAV", "are you ill.wav", "notes.txt", "!.mp3"):
+            open(os.path.join(directory, file), "w").close()
+        index = build_phrase_index(directory)
+        self.assertEqual(index, {"are you ill": os.path.join(directory, "Are you ill?.mp3"),
+                                 "goodbye": os.path.join(directory, "Goodbye.WAV")})
+        self.assertEqual(build_phrase_index(os.path.join(directory, "missing")), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
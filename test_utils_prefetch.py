@@ -0,0 +1,91 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import unittest
+
+from threading import Event
+
+from utils_prefetch import Prefetcher
+
+
+class TestPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.prefetcher = Prefetcher()
+
+    def tearDown(self):
+        self.prefetcher.shutdown()
+
+    def test_hit_and_miss(self):
+        fetched = []
+        self.prefetcher.prefetch("a", {"page": lambda: fetched.append("prefetch") or "prefetched"})
+        self.assertEqual(self.prefetcher.get("a", "page", lambda: "fetched"), "prefetched")
+        # Results can be used again until the next wait point
+        self.assertEqual(self.prefetcher.get("a", "page", lambda: "fetched"), "prefetched")
+        self.assertEqual(self.prefetcher.get("b", "page", lambda: "fetched"), "fetched")
+        self.assertEqual(fetched, ["prefetch"])
+        metrics = self.prefetcher.get_metrics()
+        self.assertEqual((metrics["prefetched"], metrics["used"], metrics["hits"], metrics["misses"]), (1, 1, 2, 1))
+        self.assertAlmostEqual(metrics["hit_rate"], 2 / 3)
+
+    def test_replace_and_discard(self):
+        self.prefetcher.prefetch("a", {"one": lambda: 1, "two": lambda: 2})
+        self.prefetcher.get("a", "one", lambda: None)
+        # "one" was used and "two" wasn't; "three" is new
+        self.prefetcher.prefetch("a", {"three": lambda: 3})
+        metrics = self.prefetcher.get_metrics()
+        self.assertEqual((metrics["prefetched"], metrics["wasted"], metrics["pending"]), (3, 1, 1))
+        self.assertEqual(metrics["used_rate"], 0.5)
+        self.prefetcher.prefetch("a", {"three": lambda: 4})
+        self.assertEqual(self.prefetcher.get("a", "three", lambda: None), 3)
+        self.prefetcher.discard("a")
+        self.assertEqual(self.prefetcher.get_metrics()["pending"], 0)
+        self.assertIsNone(self.prefetcher.get("a", "three", lambda: None))
+
+    def test_error_falls_back(self):
+        def fail():
+            raise ConnectionError()
+        self.prefetcher.prefetch("a", {"page": fail})
+        self.assertEqual(self.prefetcher.get("a", "page", lambda: "fetched"), "fetched")
+        self.assertEqual(self.prefetcher.get_metrics()["errors"], 1)
+
+    def test_waits_for_running_prefetch(self):
+        started, release = Event(), Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "slow"
+        self.prefetcher.prefetch("a", {"page": slow})
+        started.wait(5)
+        release.set()
+        self.assertEqual(self.prefetcher.get("a", "page", lambda: "fetched"), "slow")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import os
+import tempfile
+import unittest
+
+from utils_replay import SessionInputs, SessionRecorder, compare_outputs, get_outputs, load_session
+
+
+class TestSessionRecorder(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.recorder = SessionRecorder(self.directory)
+
+    def tearDown(self):
+        self.recorder.close()
+
+    def test_session_lifecycle(self):
+        self.recorder.record("a", "utterance", data={"utterances": ["ignored"]})
+        self.assertEqual(os.listdir(self.directory), [])
+
+        header = self.recorder.start_session("a", "demo", seed=7)
+        self.assertEqual(header["seed"], 7)
+        self.assertIsNone(self.recorder.start_session("a", "other"))
+        self.assertTrue(self.recorder.is_recording("a"))
+        self.recorder.record("a", "start", "neon.run_alert_script", {"file_to_run": "demo"}, {"username": "a"})
+        self.recorder.record("a", "output", "speak", {"utterance": "Hello"})
+        self.recorder.record("a", "utterance", "recognizer_loop:utterance", {"utterances": ["hi"]})
+        self.recorder.record("a", "skill_response")
+        self.recorder.record("b", "utterance", data={"utterances": ["not recorded"]})
+
+        path = self.recorder.end_session("a")
+        self.assertFalse(self.recorder.is_recording("a"))
+        self.assertIsNone(self.recorder.end_session("a"))
+        self.recorder.record("a", "output", "speak", {"utterance": "After exit"})
+
+        header, records = load_session(path)
+        self.assertEqual((header["user"], header["script"], header["seed"]), ("a", "demo", 7))
+        self.assertEqual([r["k"] for r in records], ["start", "output", "utterance", "skill_response"])
+        self.assertEqual(records[0]["context"], {"username": "a"})
+        self.assertNotIn("type", records[3])
+        self.assertEqual(get_outputs(records), ["Hello"])
+
+    def test_unsafe_user(self):
+        self.recorder.start_session("../x y", "demo")
+        path = self.recorder.end_session("../x y")
+        self.assertEqual(os.path.dirname(path), self.directory)
+        self.assertTrue(os.path.basename(path).startswith("___x_y_demo_"))
+
+
+class TestReplay(unittest.TestCase):
+    def test_compare_outputs(self):
+        self.assertEqual(compare_outputs(["a", "b"], ["a", "b"]), [])
+        self.assertEqual(compare_outputs(["a", "b"], ["a", "c", "d"]), [(1, "b", "c"), (2, None, "d")])
+
+    def test_session_inputs(self):
+        def speak(request, utterance):
+            return {"k": "speak", "data": {"utterance": utterance}, "context": {"cc_data": {"request": request}}}
+        records = [{"k": "start"}, speak("time", "noon"), speak("time", "it is noon"), {"k": "utterance"},
+                   {"k": "skill_response", "type": "skills:execute.response"}, speak("weather", "sunny"),
+                   {"k": "output"}, {"k": "timeout"}]
+        inputs = SessionInputs(records)
+        self.assertEqual([r["k"] for r in inputs.driving], ["start", "utterance", "timeout"])
+        self.assertEqual(inputs.remaining, 4)
+        self.assertEqual(inputs.speaks_for_request("weather"), [])
+        self.assertEqual([r["data"]["utterance"] for r in inputs.speaks_for_request("time")], ["noon", "it is noon"])
+        self.assertEqual(inputs.next_skill_response()["type"], "skills:execute.response")
+        self.assertIsNone(inputs.next_skill_response())
+        self.assertEqual(len(inputs.speaks_for_request("weather")), 1)
+        self.assertEqual(inputs.remaining, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
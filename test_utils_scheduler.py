@@ -0,0 +1,148 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import time
+import unittest
+
+from utils_scheduler import ScriptScheduler
+
+
+class TestScriptScheduler(unittest.TestCase):
+    def test_step_budget(self):
+        scheduler = ScriptScheduler(max_steps=3, max_seconds=60)
+        scheduler.start_turn("a")
+        self.assertEqual([scheduler.step("a") for _ in range(4)], [True, True, True, False])
+        scheduler.end_turn("a")
+        scheduler.start_turn("a")
+        self.assertTrue(scheduler.step("a"))
+
+    def test_time_budget(self):
+        scheduler = ScriptScheduler(max_steps=1000, max_seconds=0.01)
+        scheduler.start_turn("a")
+        self.assertTrue(scheduler.step("a"))
+        time.sleep(0.02)
+        self.assertFalse(scheduler.step("a"))
+
+    def test_step_without_turn(self):
+        scheduler = ScriptScheduler(max_steps=1)
+        self.assertTrue(scheduler.step("a"))
+        self.assertTrue(scheduler.step("a"))
+        # Steps outside a turn don't start one or count towards metrics
+        scheduler.start_turn("a")
+        self.assertTrue(scheduler.step("a"))
+        scheduler.end_turn("a")
+        self.assertEqual(scheduler.get_metrics()["users"]["a"]["steps"], 1)
+
+    @staticmethod
+    def _exhaust(scheduler, user, new_input=False):
+        scheduler.start_turn(user, new_input)
+        while scheduler.step(user):
+            pass
+
+    def test_repeated_state(self):
+        scheduler = ScriptScheduler(max_steps=2, max_seconds=60, max_loop_steps=2)
+        self._exhaust(scheduler, "a")
+        self.assertTrue(scheduler.check_yield("a", ("script", 3, "{}")))
+        self.assertTrue(scheduler.check_yield("a", ("script", 5, "{}")))
+        self._exhaust(scheduler, "b")
+        self.assertTrue(scheduler.check_yield("b", ("script", 3, "{}")))
+        self._exhaust(scheduler, "a")
+        self.assertFalse(scheduler.check_yield("a", ("script", 3, "{}")))
+
+        # Input means the script can make progress again
+        self._exhaust(scheduler, "a", new_input=True)
+        self.assertTrue(scheduler.check_yield("a", ("script", 3, "{}")))
+        self._exhaust(scheduler, "a")
+        self.assertFalse(scheduler.check_yield("a", ("script", 3, "{}")))
+        scheduler.forget("a")
+        self._exhaust(scheduler, "a")
+        self.assertTrue(scheduler.check_yield("a", ("script", 3, "{}")))
+
+    def test_loop_steps(self):
+        # Repeated states are loops only after enough steps without input, however long the steps take
+        scheduler = ScriptScheduler(max_steps=100, max_seconds=0.01, max_loop_steps=5)
+        results = []
+        for _ in range(4):
+            scheduler.start_turn("a")
+            scheduler.step("a")
+            time.sleep(0.02)
+            self.assertFalse(scheduler.step("a"))
+            results.append(scheduler.check_yield("a", ("script", 3, "{}")))
+            scheduler.end_turn("a")
+        self.assertEqual(results, [True, True, False, False])
+
+    def test_resume(self):
+        scheduler = ScriptScheduler()
+        scheduler.start_turn("a")
+        first = scheduler.yield_turn("a")
+        scheduler.end_turn("a")
+        self.assertTrue(scheduler.start_turn("a", resume=first))
+        self.assertTrue(scheduler.in_turn("a"))
+        second = scheduler.yield_turn("a")
+        scheduler.end_turn("a")
+        self.assertFalse(scheduler.in_turn("a"))
+        # Resumes are used once, and only the latest one is current
+        self.assertFalse(scheduler.start_turn("a", resume=first))
+        # Input started another turn before the resume was handled
+        self.assertTrue(scheduler.start_turn("a", new_input=True))
+        scheduler.end_turn("a")
+        self.assertFalse(scheduler.start_turn("a", resume=second))
+        # The script exited
+        third = scheduler.yield_turn("a")
+        scheduler.forget("a")
+        self.assertFalse(scheduler.start_turn("a", resume=third))
+
+    def test_metrics(self):
+        scheduler = ScriptScheduler(max_steps=2, max_loop_steps=1)
+        self.assertEqual(scheduler.get_metrics()["fairness"], 1.0)
+        for user, duration in (("a", 0.01), ("a", 0.01), ("b", 0.01)):
+            scheduler.start_turn(user)
+            for _ in range(3):
+                scheduler.step(user)
+            if user == "a":
+                scheduler.check_yield(user, 1)
+            time.sleep(duration)
+            scheduler.end_turn(user)
+        metrics = scheduler.get_metrics()
+        self.assertEqual(metrics["users"]["a"]["turns"], 2)
+        self.assertEqual(metrics["users"]["a"]["steps"], 6)
+        self.assertEqual(metrics["users"]["a"]["yields"], 1)
+        self.assertEqual(metrics["users"]["a"]["aborts"], 1)
+        self.assertEqual(metrics["steps"], 9)
+        self.assertGreater(metrics["fairness"], 0.9)
+        self.assertGreaterEqual(metrics["max_turn_ms"], 10)
+
+        # One user taking much longer per turn is unfair
+        scheduler.start_turn("c")
+        time.sleep(0.2)
+        scheduler.end_turn("c")
+        self.assertLess(scheduler.get_metrics()["fairness"], 0.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
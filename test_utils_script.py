@@ -0,0 +1,607 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from copy import deepcopy
+
+from contextlib import redirect_stdout
+from importlib.util import find_spec
+
+from utils_script import validate_compiled_script, build_script_index, precompile_directory, load_manifest, \
+    get_manifest_entry, precompile_file, MANIFEST_FILENAME, FORMATTED_SCRIPT, VARIABLES, LOOPS, GOTO_TAGS, SCRIPT_META, LoopIntervals, ScriptIndex, FrozenDict, freeze, thaw, LineData, \
+    get_speak_mode, normalize_condition, write_container, read_container_header, load_container, \
+    get_current_container, ScriptContainer, ScriptCatalog, ScriptIndexCache, read_compiled_script, main, get_script_details, CONTAINER_EXT, OP_NOP, OP_RUNTIME, OP_RUNTIME_RAW, OP_VARIABLE, OP_INVALID
+
+
+def _line(line_number, command, text="", indent=0, data=None):
+    return {"line_number": line_number, "command": command, "text": text, "indent": indent, "data": data or {},
+            "parent_case_indents": []}
+
+
+def _script(lines, loops=None, tags=None, cversion="1.0"):
+    return (lines, {}, {}, loops or {}, tags or {}, 0, None, None, None, {"cversion": cversion})
+
+
+VALID_SCRIPT = _script([_line(1, "script", "test"),
+                        _line(3, "loop", "main START"),
+                        _line(4, "if", "{x} == 1"),
+                        _line(5, "neon speak", "one", 4),
+                        _line(6, "else"),
+                        _line(7, "goto", "end", 4, {"destination": "end"}),
+                        _line(8, "loop", "main END"),
+                        _line(9, "tag", "end"),
+                        _line(10, "exit")],
+                       loops={"main": {"start": 3, "end": 8}}, tags={"end": 9})
+
+
+class TestValidation(unittest.TestCase):
+    def test_valid_script(self):
+        errors, warnings = validate_compiled_script(VALID_SCRIPT)
+        self.assertEqual(errors, [])
+        self.assertEqual(warnings, [])
+
+    def test_invalid_scripts(self):
+        self.assertTrue(validate_compiled_script(None)[0])
+        self.assertTrue(validate_compiled_script(_script([]))[0])
+        self.assertIn("missing compiler version", validate_compiled_script(_script([_line(1, "exit")], cversion=None))[0])
+        self.assertTrue(validate_compiled_script(_script([{"command": "exit"}]))[0])
+
+        errors, _ = validate_compiled_script(_script([_line(1, "goto", "nowhere", data={"destination": "nowhere"}),
+                                                      _line(2, "exit")],
+                                                     loops={"main": {"start": 1, "end": 99}}, tags={"bad": 42}))
+        self.assertEqual(len(errors), 3)
+
+    def test_warnings(self):
+        _, warnings = validate_compiled_script(_script([_line(1, "if", "{x} == 1"), _line(2, "neon speak", "hi")]))
+        self.assertEqual(len(warnings), 2)
+
+    def test_index(self):
+        index = build_script_index(VALID_SCRIPT)
+        self.assertEqual(index["tags"], {"end": 7})
+        self.assertEqual(index["loops"], {"main": [1, 6]})
+        self.assertEqual(index["conditions"], [[2, "if", 4], [4, "else", 6]])
+
+
+class TestSharedScriptData(unittest.TestCase):
+    def test_freeze(self):
+        data = {"name": "Neon", "options": ["a", {"b": 1}]}
+        frozen = freeze(data)
+        self.assertIsInstance(frozen, FrozenDict)
+        self.assertEqual(frozen, {"name": "Neon", "options": ("a", {"b": 1})})
+        self.assertIsInstance(frozen["options"][1], FrozenDict)
+        self.assertIs(freeze(frozen), frozen)
+        for mutate in (lambda d: d.update(a=1), lambda d: d.pop("name"), lambda d: d.__setitem__("a", 1),
+                       lambda d: d.clear(), lambda d: d.setdefault("a", 1)):
+            with self.assertRaises(TypeError):
+                mutate(frozen)
+
+        thawed = thaw(frozen)
+        self.assertEqual(thawed, data)
+        thawed["options"][1]["b"] = 2
+        self.assertEqual(frozen["options"][1]["b"], 1)
+
+    def test_line_data(self):
+        frozen = freeze({"name": "Neon", "phrase": "hi {name}"})
+        data = LineData(frozen, {"phrase": "hi Ann"})
+        self.assertEqual(data["phrase"], "hi Ann")
+        self.assertEqual(data.get("name"), "Neon")
+        self.assertIsNone(data.get("gender"))
+        self.assertEqual(dict(data), {"name": "Neon", "phrase": "hi Ann"})
+        self.assertEqual(frozen["phrase"], "hi {name}")
+        with self.assertRaises(TypeError):
+            data["phrase"] = "bye"
+        self.assertFalse(LineData(FrozenDict()))
+
+    def test_interned(self):
+        first = freeze({"command": "".join(["neon ", "speak"])})
+        second = freeze({"command": "".join(["neon ", "speak"])})
+        self.assertIs(first["command"], second["command"])
+
+    def test_copies_shared(self):
+        index = ScriptIndex(VALID_SCRIPT[FORMATTED_SCRIPT], VALID_SCRIPT[LOOPS], VALID_SCRIPT[GOTO_TAGS])
+        conversation = {"formatted_script": index.formatted_script, "script_index": index, "variables": {"x": [1]}}
+        copied = deepcopy(conversation)
+        self.assertIs(copied["formatted_script"], index.formatted_script)
+        self.assertIs(copied["script_index"], index)
+        self.assertIsNot(copied["variables"], conversation["variables"])
+        self.assertEqual(pickle.loads(pickle.dumps(index.formatted_script)), index.formatted_script)
+        self.assertEqual(index.goto_tags, {"end": 9})
+
+
+class TestLoopIndex(unittest.TestCase):
+    def test_innermost_nested(self):
+        depth = 50
+        # loop i spans indexes i..(2 * depth + 1 - i)
+        intervals = LoopIntervals({f"loop{i}": (i, 2 * depth + 1 - i) for i in range(depth)})
+        self.assertIsNone(intervals.innermost(0))
+        self.assertIsNone(intervals.innermost(2 * depth + 1))
+        for i in range(depth):
+            self.assertEqual(intervals.innermost(i + 1)[0], f"loop{i}")
+            self.assertEqual(intervals.innermost(2 * depth - i)[0], f"loop{i}")
+        # Loop start and end lines belong to the enclosing loop
+        self.assertEqual(intervals.innermost(10)[0], "loop9")
+        self.assertEqual(intervals.innermost(depth)[0], f"loop{depth - 1}")
+
+    def test_sibling_loops(self):
+        intervals = LoopIntervals({"outer": (0, 20), "a": (2, 6), "b": (6, 10), "c": (12, 15), "bad": (None, 3)})
+        self.assertEqual([intervals.innermost(i)[0] for i in (1, 2, 3, 5, 6, 7, 9, 10, 11, 13, 15, 19)],
+                         ["outer", "outer", "a", "a", "outer", "b", "b", "outer", "outer", "c", "outer", "outer"])
+        self.assertEqual(intervals.innermost(4), ("a", 2, 6))
+        self.assertIsNone(intervals.innermost(20))
+
+    def test_script_loop_exit(self):
+        lines = [_line(1, "script", "test"),
+                 _line(2, "loop", "outer START"),
+                 _line(3, "loop", "inner START", 4),
+                 _line(4, "voice_input", "x", 8),
+                 _line(5, "loop", "inner END", 4),
+                 _line(6, "voice_input", "y", 4),
+                 _line(7, "loop", "outer END"),
+                 _line(8, "exit")]
+        index = ScriptIndex(lines, {"outer": {"start": 2, "end": 7}, "inner": {"start": "3", "end": "5"}})
+        self.assertEqual(index.loop_exit(3), (5, 4))
+        self.assertEqual(index.loop_exit(5), (7, 0))
+        self.assertIsNone(index.loop_exit(7))
+        self.assertEqual(index.get_index(6), 5)
+        self.assertIsNone(index.get_index("tag"))
+
+
+class TestCaseTables(unittest.TestCase):
+    lines = [_line(1, "script", "test"),
+             _line(2, "case", "case {city}:", 0, {"variable": "{city}"}),
+             _line(3, "", '"A or Athens"', 1),
+             _line(4, "neon speak", "greece", 2),
+             _line(5, "", '"New York or NY"', 1),
+             _line(6, "case", "case {borough}:", 2, {"variable": "{borough}"}),
+             _line(7, "", '"queens"', 3),
+             _line(8, "neon speak", "queens", 4),
+             _line(9, "neon speak", "new york", 2),
+             _line(10, "", '"athens"', 1),
+             _line(11, "neon speak", "duplicate", 2),
+             _line(12, "exit")]
+
+    def test_case_tables(self):
+        index = ScriptIndex(self.lines, {})
+        self.assertEqual(set(index.case_tables), {1, 5})
+        table, end = index.case_tables[1]
+        self.assertEqual(end, 11)
+        self.assertEqual(table, {"a": 3, "athens": 3, "new york": 5, "ny": 5})
+        self.assertEqual(index.case_tables[5], ({"queens": 7}, 8))
+
+    def test_case_branch(self):
+        index = ScriptIndex(self.lines, {})
+        self.assertEqual(index.case_branch(1, "athens"), 3)
+        self.assertEqual(index.case_branch(1, "new york"), 5)
+        self.assertEqual(index.case_branch(5, "queens"), 7)
+        self.assertIsNone(index.case_branch(1, "queens"))
+        self.assertIsNone(index.case_branch(1, "Athens"))
+
+
+class TestBlockPointers(unittest.TestCase):
+    def test_block_end_and_if(self):
+        index = ScriptIndex(VALID_SCRIPT[0], VALID_SCRIPT[3])
+        self.assertEqual(index.block_end, [1, 2, 4, 4, 6, 6, 7, 8, 9])
+        self.assertEqual(index.if_false_index, {2: 5})
+
+    def test_if_without_else(self):
+        lines = [_line(1, "if", "{x} == 1"),
+                 _line(2, "neon speak", "one", 1),
+                 _line(3, "", "# comment"),
+                 _line(4, "neon speak", "two", 1),
+                 _line(5, "exit")]
+        index = ScriptIndex(lines, {})
+        self.assertEqual(index.if_false_index, {0: 4})
+        self.assertEqual(ScriptIndex(lines[:2], {}).if_false_index, {0: 2})
+
+    def test_case_exits(self):
+        index = ScriptIndex(TestCaseTables.lines, {})
+        self.assertEqual(index.case_exits, {})
+        lines = [dict(line, parent_case_indents=[0] if line["indent"] > 0 else []) for line in TestCaseTables.lines]
+        for line in lines[5:9]:
+            line["parent_case_indents"] = [0, 2] if line["indent"] > 2 else [0]
+        index = ScriptIndex(lines, {})
+        # Option lines end the enclosing case; lines deeper in an option are executed
+        self.assertEqual(index.case_exits, {2: 11, 4: 11, 6: 8, 9: 11})
+
+
+class TestSpeakRuns(unittest.TestCase):
+    @staticmethod
+    def _speak(line_number, phrase, indent=0, name="Neon"):
+        return _line(line_number, "neon speak", f'Neon speak: "{phrase}"', indent, {"name": name, "phrase": phrase})
+
+    lines = [_line(1, "script", 'Script: "test"'),
+             _line(2, "speak mode", "Speak mode: coalesce"),
+             _line(3, "neon speak", "Neon speak:", 0, {"name": "Neon", "phrase": "Neon speak:"}),
+             _speak(4, "One.", 1),
+             _speak(5, "Two.", 1),
+             _speak(6, "Three.", 1),
+             _speak(7, "Hello {name}", 1),
+             _speak(8, "Four.", 1),
+             _speak(9, "Five.", 1),
+             _speak(10, "Other voice.", 1, "Alice"),
+             _speak(11, "Six.", 0),
+             _speak(12, "Nested.", 1),
+             _line(13, "voice_input", "voice_input(x)"),
+             _line(14, "exit", "Exit")]
+
+    def test_speak_mode(self):
+        self.assertEqual(get_speak_mode(self.lines), "coalesce")
+        self.assertEqual(get_speak_mode(self.lines[2:]), "")
+        self.assertEqual(get_speak_mode([], {"speak_mode": "Coalesce"}), "coalesce")
+        self.assertEqual(get_speak_mode([], "invalid meta"), "")
+
+    def test_speak_runs(self):
+        index = ScriptIndex(self.lines, {})
+        self.assertTrue(index.coalesce_speak)
+        # Runs end at variables, other speakers, and indent changes; a run can be entered part way through
+        self.assertEqual(index.speak_runs, {3: 6, 4: 6, 7: 9})
+
+    def test_speak_runs_opt_in(self):
+        index = ScriptIndex(self.lines[2:], {})
+        self.assertFalse(index.coalesce_speak)
+        self.assertEqual(index.speak_runs, {})
+
+
+class TestLookahead(unittest.TestCase):
+    def test_lookahead(self):
+        lines = [_line(1, "voice_input", "voice_input(x)"),
+                 _line(2, "if", "{x} == 1"),
+                 _line(3, "run", "child", 1),
+                 _line(4, "else"),
+                 _line(5, "goto", "end", 1, {"destination": "end"}),
+                 _line(6, "variable", "y = voice_input(y)"),
+                 _line(7, "loop", "main START"),
+                 _line(8, "variable", "page = table_scrape(https://example.com)", 1),
+                 _line(9, "loop", "main END"),
+                 _line(10, "tag", "end"),
+                 _line(11, "exit", "Exit"),
+                 _line(12, "neon speak", "unreachable")]
+        index = ScriptIndex(lines, {"main": {"start": 7, "end": 9}}, {"end": 10})
+        self.assertEqual(index.successors(1), [2, 4])
+        self.assertEqual(index.successors(3), [5])
+        self.assertEqual(index.successors(4), [9])
+        self.assertEqual(index.successors(8), [9, 6])
+        self.assertEqual(index.successors(10), [])
+        # Both branches of the if, stopping at the next voice_input
+        self.assertEqual(index.lookahead(1), (1, 2, 4, 3, 9, 10))
+        self.assertEqual(index.lookahead(6), (6, 7, 8, 9, 10))
+        self.assertEqual(index.lookahead(0), ())
+        self.assertEqual(index.lookahead(1, limit=2), (1, 2))
+        self.assertIs(index.lookahead(6), index.lookahead(6))
+
+
+class TestInstructions(unittest.TestCase):
+    def test_normalize_condition(self):
+        comparators = ("IN", "CONTAINS")
+        self.assertEqual(normalize_condition("{a} in {b}", comparators), "{a} IN {b[*]}")
+        self.assertEqual(normalize_condition("{a} !contains {b[0]}", comparators), "{a} !CONTAINS {b[0]}")
+        self.assertEqual(normalize_condition("{a} == 1", comparators), "{a} == 1")
+        with self.assertRaises(ValueError):
+            normalize_condition("in {b}", comparators)
+
+    def test_compile_instructions(self):
+        lines = [_line(1, "script", "test"),
+                 _line(2, "neon speak", "hi {name}", data={"name": "Neon", "phrase": "hi {name}"}),
+                 _line(3, "if", "{a} in {b}"),
+                 _line(4, "sub_key", "{x} *", 1),
+                 _line(5, "voice_input", "voice_input(answer)"),
+                 _line(6, "voice_input", "voice_input"),
+                 _line(7, "variable", "v = {x}", data={"variable_value": "{x}"}),
+                 _line(8, "if", "in {b}"),
+                 _line(9, "tag", "end")]
+        index = ScriptIndex(lines, {})
+        instructions = index.compile_instructions(("neon speak", "if", "sub_key", "variable"), ("voice_input",),
+                                                  ("sub_key",), ("IN",))
+        self.assertIs(instructions, index.instructions)
+        self.assertEqual(instructions[0], (OP_NOP, -1, "test", ()))
+        self.assertEqual(instructions[1], (OP_RUNTIME, 0, "hi {name}", ("phrase",)))
+        self.assertEqual(instructions[2], (OP_RUNTIME, 1, "{a} IN {b[*]}", ()))
+        self.assertEqual(instructions[3], (OP_RUNTIME_RAW, 2, "{x} *", ()))
+        self.assertEqual(instructions[4], (OP_VARIABLE, 4, "answer", False))
+        self.assertEqual(instructions[5], (OP_VARIABLE, 4, None, False))
+        self.assertEqual(instructions[6], (OP_RUNTIME, 3, "v = {x}", ()))
+        self.assertEqual(instructions[7][0], OP_INVALID)
+        self.assertIsInstance(instructions[7][2], ValueError)
+        self.assertEqual(instructions[8][0], OP_NOP)
+
+
+class TestContainer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "test.ncs")
+        self.path = os.path.join(self.directory, "test" + CONTAINER_EXT)
+        self.cache = deepcopy(VALID_SCRIPT)
+        self.cache[SCRIPT_META]["raw_file"] = "Script: test\n"
+        self.cache[VARIABLES]["x"] = ["1"]
+        with open(self.source, "wb") as f:
+            pickle.dump(self.cache, f)
+        write_container(self.path, self.cache, self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        meta = read_container_header(self.path)
+        self.assertEqual((meta["cversion"], meta["lines"], meta["source"]["file"]), ("1.0", 9, "test.ncs"))
+        self.assertNotIn("raw_file", meta)
+
+        container = ScriptContainer(self.path)
+        self.assertEqual(container.validate(), [])
+        self.assertEqual(container.to_cache(), self.cache)
+        container.close()
+
+    def test_decode_once(self):
+        container = load_container(self.path)
+        self.assertIs(load_container(self.path), container)
+        first, second = container.to_cache(), container.to_cache()
+        # Script lines are shared; data conversations modify is not
+        self.assertIs(first[FORMATTED_SCRIPT], second[FORMATTED_SCRIPT])
+        self.assertIsNot(first[VARIABLES], second[VARIABLES])
+        first[VARIABLES]["x"].append("2")
+        self.assertEqual(container.to_cache()[VARIABLES]["x"], ["1"])
+
+    def test_outdated_and_invalid(self):
+        self.assertIsNotNone(get_current_container(self.directory, "test.ncs"))
+        with open(self.source, "ab") as f:
+            f.write(b"\n")
+        self.assertIsNone(get_current_container(self.directory, "test.ncs"))
+
+        with open(self.path, "r+b") as f:
+            f.write(b"XXXX")
+        with self.assertRaises(ValueError):
+            read_container_header(self.path)
+
+        write_container(self.path, self.cache, self.source)
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 4)
+        self.assertTrue(ScriptContainer(self.path).validate())
+
+    def test_removed_source(self):
+        container = get_current_container(self.directory, "test.ncs")
+        self.assertIsNotNone(container)
+        os.remove(self.source)
+        self.assertIsNone(get_current_container(self.directory, "test.ncs"))
+        self.assertFalse(container.is_current(self.source))
+        # The stale container is closed and forgotten
+        self.assertTrue(container._map.closed)
+
+    def test_replaced_container_closed(self):
+        container = load_container(self.path)
+        self.cache[VARIABLES]["x"] = ["2"]
+        write_container(self.path, self.cache, self.source)
+        replacement = load_container(self.path)
+        self.assertIsNot(replacement, container)
+        self.assertTrue(container._map.closed)
+        self.assertEqual(replacement.to_cache()[VARIABLES]["x"], ["2"])
+
+
+class TestScriptIndexCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.ncs")
+        self.built = []
+        self.indexes = ScriptIndexCache(self._build)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _build(self, cache):
+        self.built.append(cache)
+        return ScriptIndex(cache[FORMATTED_SCRIPT], cache[LOOPS], cache[GOTO_TAGS], cache[SCRIPT_META])
+
+    def _write(self, cache):
+        # Scripts are replaced the way uploads and syncs write them
+        with open(self.path + ".tmp", "wb") as f:
+            pickle.dump(cache, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def test_rebuilt_when_script_changes(self):
+        self._write(VALID_SCRIPT)
+        first = self.indexes.get("test", *read_compiled_script(self.path))
+        self.assertIs(self.indexes.get("test", *read_compiled_script(self.path)), first)
+        self.assertEqual(len(self.built), 1)
+
+        changed = _script(VALID_SCRIPT[FORMATTED_SCRIPT][:1] + [_line(2, "neon speak", "changed"), _line(3, "exit")])
+        self._write(changed)
+        second = self.indexes.get("test", *read_compiled_script(self.path))
+        self.assertEqual(second.formatted_script[1]["text"], "changed")
+        self.assertEqual(second.loops_dict, {})
+        self.assertIsNone(second.loop_exit(1))
+
+        self.indexes.discard("test")
+        self.assertIsNot(self.indexes.get("test", *read_compiled_script(self.path)), second)
+        self.assertEqual(len(self.built), 3)
+
+    def test_rebuilt_when_lines_differ(self):
+        self._write(VALID_SCRIPT)
+        cache, key = read_compiled_script(self.path)
+        first = self.indexes.get("test", cache, key)
+        # A read with the same key returns the same index only for the same lines
+        self.assertIs(self.indexes.get("test", deepcopy(cache), key), first)
+        changed = _script(VALID_SCRIPT[FORMATTED_SCRIPT][:2])
+        self.assertEqual(len(self.indexes.get("test", changed, key).formatted_script), 2)
+        self.assertEqual(len(self.built), 2)
+
+    def test_missing_script(self):
+        self.assertEqual(read_compiled_script(self.path), ({}, None))
+        # Data without a key is never cached
+        self.indexes.get("test", VALID_SCRIPT, None)
+        self.indexes.get("test", VALID_SCRIPT, None)
+        self.assertEqual(len(self.built), 2)
+
+
+class TestCatalog(unittest.TestCase):
+    lines = [_line(1, "script", 'Script: "Weather Time Population"'),
+             _line(2, "description", 'Description: "Offers the weather"'),
+             _line(3, "synonym", 'Synonym: "WTP", "T P W 2"'),
+             _line(4, "claps", 'Claps: 2, "what time is it"'),
+             _line(5, "exit", "Exit")]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self._write("wtp", _script(self.lines))
+        self._write("other", _script([_line(1, "synonym", "Synonym: weather"), _line(2, "exit", "Exit")]))
+        self.catalog = ScriptCatalog(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, data):
+        with open(os.path.join(self.directory, f"{name}.ncs"), "wb") as f:
+            pickle.dump(data, f)
+
+    def test_script_details(self):
+        details = get_script_details(self.lines, {"title": "Weather Time Population", "author": "Neongecko"})
+        self.assertEqual(details, {"title": "Weather Time Population", "description": "Offers the weather",
+                                   "author": "Neongecko", "synonyms": ["WTP", "T P W 2"],
+                                   "claps": ['2, "what time is it"']})
+
+    def test_catalog(self):
+        self.assertTrue(self.catalog.refresh())
+        self.assertFalse(self.catalog.refresh())
+        self.assertEqual(self.catalog.names, ["other", "wtp"])
+        self.assertEqual(self.catalog.get_details("wtp")["description"], "Offers the weather")
+        self.assertEqual(self.catalog.synonyms, {"wtp": "wtp", "t p w 2": "wtp", "weather": "other"})
+
+        self._write("new", _script([_line(1, "synonym", 'Synonym: "new one"')]))
+        os.remove(os.path.join(self.directory, "other.ncs"))
+        self.assertTrue(self.catalog.refresh())
+        self.assertEqual([entry["name"] for entry in self.catalog.get_entries()], ["new", "wtp"])
+        self.assertIsNone(self.catalog.match_synonym("weather"))
+
+    def test_edited_in_place(self):
+        self.catalog.refresh()
+        path = os.path.join(self.directory, "other.ncs")
+        stat = os.stat(path)
+        self._write("other", _script([_line(1, "synonym", "Synonym: forecast"), _line(2, "exit", "Exit")]))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertTrue(self.catalog.refresh())
+        self.assertEqual(self.catalog.match_synonym("forecast"), "other")
+        self.assertIsNone(self.catalog.match_synonym("weather"))
+
+    def test_invalidate(self):
+        self.catalog.refresh()
+        path = os.path.join(self.directory, "other.ncs")
+        stat = os.stat(path)
+        self._write("other", _script([_line(1, "synonym", "Synonym: showers"), _line(2, "exit", "Exit")]))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertFalse(self.catalog.refresh())
+        self.catalog.invalidate()
+        self.assertTrue(self.catalog.refresh())
+        self.assertEqual(self.catalog.match_synonym("showers"), "other")
+
+    def test_details_from_precompile(self):
+        precompile_directory(self.directory, workers=1)
+        # Details are read from the manifest without decoding scripts
+        with open(os.path.join(self.directory, "wtp.ncs"), "r+b") as f:
+            stat = os.fstat(f.fileno())
+            f.write(b"\0")
+        os.utime(os.path.join(self.directory, "wtp.ncs"), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.catalog.refresh()
+        self.assertEqual(self.catalog.get_details("wtp")["synonyms"], ["WTP", "T P W 2"])
+
+    def test_match_synonym(self):
+        self.catalog.refresh()
+        self.assertEqual(self.catalog.match_synonym("T.P.W. 2"), "wtp")
+        self.assertEqual(self.catalog.match_synonym("please start wtp now"), "wtp")
+        self.assertEqual(self.catalog.match_synonym("what is the weather"), "other")
+        self.assertIsNone(self.catalog.match_synonym("t p w"))
+
+
+class TestPrecompileDirectory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name, data in (("good", VALID_SCRIPT), ("bad", _script([_line(1, "exit")], cversion=None))):
+            with open(os.path.join(self.directory, f"{name}.ncs"), "wb") as f:
+                pickle.dump(data, f)
+        with open(os.path.join(self.directory, "corrupt.ncs"), "wb") as f:
+            f.write(b"not a pickle")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_precompile_directory(self):
+        manifest = precompile_directory(self.directory, workers=2)
+        self.assertEqual(set(manifest["scripts"]), {"good", "bad", "corrupt"})
+        self.assertEqual(manifest["errors"], 2)
+        good = manifest["scripts"]["good"]
+        self.assertEqual(good["errors"], [])
+        self.assertEqual(good["lines"], 9)
+        self.assertEqual(good["index"]["tags"], {"end": 7})
+        self.assertGreater(good["size"], 0)
+        self.assertIn("validate_ms", good)
+        self.assertTrue(manifest["scripts"]["corrupt"]["errors"][0].startswith("load failed"))
+        # Containers are written for valid scripts only
+        self.assertEqual(good["container"], "good" + CONTAINER_EXT)
+        self.assertIsNotNone(get_current_container(self.directory, "good.ncs"))
+        self.assertIsNone(get_current_container(self.directory, "bad.ncs"))
+
+        loaded = load_manifest(self.directory)
+        self.assertEqual(loaded["scripts"].keys(), manifest["scripts"].keys())
+        self.assertEqual(get_manifest_entry(loaded, self.directory, "good.ncs")["errors"], [])
+        self.assertTrue(get_manifest_entry(loaded, self.directory, "bad.ncs")["errors"])
+        self.assertIsNone(get_manifest_entry(loaded, self.directory, "missing.ncs"))
+
+        # A changed script is no longer described by the manifest
+        with open(os.path.join(self.directory, "good.ncs"), "ab") as f:
+            f.write(b"\n")
+        self.assertIsNone(get_manifest_entry(loaded, self.directory, "good.ncs"))
+
+    def test_load_manifest_invalid(self):
+        self.assertEqual(load_manifest(self.directory), dict())
+        with open(os.path.join(self.directory, MANIFEST_FILENAME), "w") as f:
+            f.write("{")
+        self.assertEqual(load_manifest(self.directory), dict())
+
+    @unittest.skipIf(find_spec("script_parser"), "script parser is installed")
+    def test_text_script_without_parser(self):
+        path = os.path.join(self.directory, "text.nct")
+        with open(path, "w") as f:
+            f.write("Script: text\nExit\n")
+        entry = precompile_file(path)
+        self.assertTrue(entry["errors"])
+        self.assertIn("validate_ms", entry)
+
+    def test_main_unparseable_text_script(self):
+        with open(os.path.join(self.directory, "text.nct"), "w") as f:
+            f.write("Script: text\nIf: {\n")
+        output = io.StringIO()
+        with redirect_stdout(output):
+            self.assertEqual(main([self.directory, "--workers", "1"]), 1)
+        row = [line for line in output.getvalue().splitlines() if "text" in line]
+        self.assertTrue(row[0].startswith("ERROR"))
+
+
+if __name__ == '__main__':
+    unittest.main()
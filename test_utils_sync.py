@@ -0,0 +1,133 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from threading import Event
+
+import git
+
+from utils_sync import ScriptSyncWorker
+
+
+class TestScriptSyncWorker(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.test_dir = tempfile.mkdtemp()
+        self.remote = os.path.join(self.test_dir, "remote.git")
+        git.Repo.init(self.remote, bare=True, initial_branch="master")
+        self.upstream = git.Repo.clone_from(self.remote, os.path.join(self.test_dir, "upstream"))
+        with self.upstream.config_writer() as config:
+            config.set_value("user", "name", "test")
+            config.set_value("user", "email", "test@neon.ai")
+        self._commit({"alpha.ncs": "alpha", "beta.nct": "beta", "README.md": "readme"})
+        self.scripts = os.path.join(self.test_dir, "script_txt")
+        self.notified = []
+        self.worker = ScriptSyncWorker(self.scripts, on_change=self.notified.append)
+
+    def tearDown(self) -> None:
+        self.worker.stop(5)
+        shutil.rmtree(self.test_dir)
+
+    def _commit(self, files, remove=()):
+        for name, content in files.items():
+            with open(os.path.join(self.upstream.working_dir, name), "w") as f:
+                f.write(content)
+        self.upstream.index.add(list(files.keys()))
+        if remove:
+            self.upstream.index.remove(list(remove), working_tree=True)
+        self.upstream.index.commit("update")
+        self.upstream.remote("origin").push("HEAD:master")
+
+    def _read(self, name):
+        with open(os.path.join(self.scripts, name)) as f:
+            return f.read()
+
+    def test_initial_clone(self):
+        os.makedirs(self.scripts)
+        with open(os.path.join(self.scripts, "local.ncs"), "w") as f:
+            f.write("local")
+        changed = self.worker.sync(self.remote, "master")
+        self.assertEqual(changed, {"alpha", "beta"})
+        self.assertEqual(self.notified, [{"alpha", "beta"}])
+        self.assertEqual(self._read("alpha.ncs"), "alpha")
+        self.assertTrue(os.path.isfile(os.path.join(self.scripts, "backup", "old", "local.ncs")))
+
+    def test_incremental_changes(self):
+        self.worker.sync(self.remote, "master")
+        self.assertEqual(self.worker.sync(self.remote, "master"), set())
+
+        self._commit({"alpha.ncs": "alpha 2", "gamma.nct": "gamma", "README.md": "updated"}, remove=["beta.nct"])
+        changed = self.worker.sync(self.remote, "master")
+        self.assertEqual(changed, {"alpha", "beta", "gamma"})
+        self.assertEqual(self._read("alpha.ncs"), "alpha 2")
+        self.assertFalse(os.path.exists(os.path.join(self.scripts, "beta.nct")))
+        self.assertEqual(self.notified[-1], {"alpha", "beta", "gamma"})
+
+    def test_local_modification_reverted(self):
+        self.worker.sync(self.remote, "master")
+        with open(os.path.join(self.scripts, "alpha.ncs"), "w") as f:
+            f.write("modified")
+        self.assertEqual(self.worker.sync(self.remote, "master"), {"alpha"})
+        self.assertEqual(self._read("alpha.ncs"), "alpha")
+
+    def test_remote_changed(self):
+        self.worker.sync(self.remote, "master")
+        other = os.path.join(self.test_dir, "other.git")
+        shutil.copytree(self.remote, other)
+        self._commit({"delta.ncs": "delta"})
+        self.assertEqual(self.worker.sync(other, "master"), set())
+        self.assertEqual(self.worker.sync(self.remote, "master"), {"delta"})
+        self.assertEqual(git.Repo(self.scripts).remote("origin").url, self.remote)
+
+    def test_background_sync(self):
+        done = Event()
+        results = []
+
+        def callback(success, changed):
+            results.append((success, changed))
+            done.set()
+
+        self.worker.request_sync(self.remote, "master", callback)
+        self.assertTrue(done.wait(30))
+        self.assertEqual(results, [(True, {"alpha", "beta"})])
+
+        done.clear()
+        self.worker.request_sync(os.path.join(self.test_dir, "missing.git"), "master", callback)
+        self.assertTrue(done.wait(30))
+        self.assertEqual(results[-1], (False, set()))
+        self.assertTrue(self.worker.running)
+        self.worker.stop(5)
+        self.assertFalse(self.worker.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+import datetime
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+from utils_transcript import TranscriptStore, TranscriptArchive, TranscriptCompactor, TRANSCRIPT_DB, ARCHIVE_DIR, \
+    parse_transcript, transcript_source, archive_name
+
+
+def _said(timestamp, speaker, text):
+    return f'{datetime.datetime.fromtimestamp(timestamp).isoformat()}, {speaker} said: "{text}" \n'
+
+
+class TestTranscriptStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = TranscriptStore(os.path.join(self.directory, TRANSCRIPT_DB))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def _write(self, script, start_time, lines):
+        with open(os.path.join(self.directory, transcript_source(script, start_time)), "w") as f:
+            f.write(f"RUNNING SCRIPT {script}\n")
+            for line in lines:
+                f.write(_said(*line))
+
+    def test_parse_transcript(self):
+        text = "RUNNING SCRIPT test\n" + _said(1000, "local", "hi") + _said(1001, "Neon", 'Say "cheese"')
+        self.assertEqual(parse_transcript(text), [(1000, "local", "hi"), (1001, "Neon", 'Say "cheese"')])
+
+    def test_append_and_query(self):
+        self.assertEqual(self.store.append("my_script", 1000, "RUNNING SCRIPT my_script\n", "alice"), 0)
+        self.store.append("my_script", 1000, _said(1001, "alice", "what is the weather") +
+                          _said(1002, "Neon", "It is sunny"), "alice")
+        self.store.append("other", 2000, _said(2001, "Neon", "Hello"), "bob")
+
+        lines = self.store.query(script="my_script")
+        self.assertEqual([line["text"] for line in lines], ["what is the weather", "It is sunny"])
+        self.assertEqual(lines[1], {"script": "my_script", "user": "alice", "start_time": 1000, "speaker": "Neon",
+                                    "time": 1002, "text": "It is sunny"})
+        self.assertEqual(len(self.store.query(start=1002, end=2001)), 2)
+        self.assertEqual(len(self.store.query(user="bob")), 1)
+        self.assertEqual(self.store.query(speaker="Neon", text="sunny")[0]["script"], "my_script")
+        self.assertEqual(self.store.query(text="rain"), [])
+        self.assertEqual(len(self.store.query(limit=1)), 1)
+        self.assertEqual([(run["script"], run["lines"]) for run in self.store.get_runs()],
+                         [("other", 1), ("my_script", 2)])
+
+    def test_ingest_directory(self):
+        self._write("my_script", 1000, [(1001, "local", "hello"), (1002, "Neon", "hi there")])
+        self._write("other_script", 2000, [(2001, "Neon", "goodbye")])
+        with open(os.path.join(self.directory, "notes.txt"), "w") as f:
+            f.write("not a transcript")
+        self.assertEqual(self.store.ingest_directory(self.directory)["lines"], 3)
+        # Files are ingested once
+        self.assertEqual(self.store.ingest_directory(self.directory)["runs"], 0)
+        self.assertEqual(self.store.query(script="other_script", start=2000, end=3000)[0]["text"], "goodbye")
+        # Lines appended to an ingested run are added to it
+        self.store.append("my_script", 1000, _said(1003, "Neon", "bye"))
+        self.assertEqual(len(self.store.query(script="my_script")), 3)
+
+    def test_ingest_archived(self):
+        self._write("archived", 1000, [(1001, "Neon", "from the archive")])
+        self._write("partly_archived", 2000, [(2001, "Neon", "first")])
+        compactor = TranscriptCompactor(self.directory, min_age=0)
+        compactor.compact()
+        with open(os.path.join(self.directory, transcript_source("partly_archived", 2000)), "a") as f:
+            f.write(_said(2002, "Neon", "second"))
+        self._write("current", 3000, [(3001, "Neon", "not archived")])
+        result = self.store.ingest_directory(self.directory)
+        self.assertEqual((result["runs"], result["lines"]), (3, 4))
+        self.assertEqual(self.store.query(text="archive")[0]["script"], "archived")
+        self.assertEqual([line["text"] for line in self.store.query(script="partly_archived")], ["first", "second"])
+        self.assertEqual(self.store.ingest_directory(self.directory)["runs"], 0)
+
+    def test_run_cache_bounded(self):
+        with mock.patch("utils_transcript.RUN_CACHE_SIZE", 2):
+            for start_time in range(1000, 1005):
+                self.store.append("many", start_time, _said(start_time + 1, "Neon", "hi"))
+            self.assertEqual(len(self.store._runs), 2)
+            # Runs evicted from the cache are found in the database
+            self.store.append("many", 1000, _said(1002, "Neon", "again"))
+        self.assertEqual([(run["start_time"], run["lines"]) for run in self.store.get_runs(script="many")
+                          if run["start_time"] == 1000], [(1000, 2)])
+        self.assertEqual(len(self.store.get_runs(script="many")), 5)
+
+    def test_ingest_directory_batches(self):
+        for i in range(5):
+            self._write("batched", 1000 + i, [(1001 + i, "Neon", f"line {i}")])
+        acquired = []
+        lock = self.store._lock
+
+        class _Lock:
+            def __enter__(self):
+                acquired.append(True)
+                return lock.__enter__()
+
+            def __exit__(self, *args):
+                return lock.__exit__(*args)
+
+        self.store._lock = _Lock()
+        self.assertEqual(self.store.ingest_directory(self.directory, batch_size=2)["runs"], 5)
+        self.store._lock = lock
+        # One lock for the known sources, then one per batch of files
+        self.assertEqual(len(acquired), 4)
+        self.assertEqual(len(self.store.query(script="batched")), 5)
+
+    def test_indexed_queries(self):
+        for filters in ({"script": "x", "start": 1, "end": 2}, {"user": "x"}, {"speaker": "x"},
+                        {"start": 1, "end": 2}, {"text": "hello"}):
+            plan = " ".join(self.store.explain(**filters))
+            # Full-text matches are looked up in the FTS index (`SCAN lines_text VIRTUAL TABLE INDEX`)
+            self.assertIsNone(re.search(r"SCAN (lines|runs)\b", plan), plan)
+
+
+class TestTranscriptCompactor(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.day = int(datetime.datetime(2024, 5, 1, 12).timestamp())
+        self.transcripts = dict()
+        for idx, (script, start_time) in enumerate((("alpha", self.day), ("beta", self.day + 60),
+                                                    ("alpha", self.day + 86400))):
+            filename = transcript_source(script, start_time)
+            text = f"RUNNING SCRIPT {script}\n" + "".join(_said(start_time + i, "Neon", f"line {i} of run {idx}")
+                                                        for i in range(50))
+            with open(os.path.join(self.directory, filename), "w") as f:
+                f.write(text)
+            self.transcripts[filename] = text
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _files(self):
+        return sorted(f for f in os.listdir(self.directory) if f.endswith(".txt"))
+
+    def test_archive_name(self):
+        self.assertEqual(archive_name("my_script_1714579200.txt", "script"), "script_my_script")
+        self.assertEqual(archive_name(f"my_script_{self.day}.txt"), "day_2024-05-01")
+        self.assertIsNone(archive_name("notes.txt"))
+
+    def test_compact_by_day(self):
+        compactor = TranscriptCompactor(self.directory)
+        # Recently modified transcripts may still be written to
+        self.assertEqual(compactor.compact()["transcripts"], 0)
+        compactor.min_age = 0
+        result = compactor.compact()
+        self.assertEqual(result["transcripts"], 3)
+        self.assertEqual(self._files(), [])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, ARCHIVE_DIR))),
+                         ["day_2024-05-01-0.ntz", "day_2024-05-01.ntx", "day_2024-05-02-0.ntz", "day_2024-05-02.ntx"])
+        for filename, text in self.transcripts.items():
+            self.assertEqual(compactor.read(filename), text)
+        metrics = compactor.get_metrics()
+        self.assertGreater(metrics["bytes_saved"], 0)
+        self.assertGreater(metrics["throughput_mb_s"], 0)
+
+    def test_append_after_compaction(self):
+        compactor = TranscriptCompactor(self.directory, "script", min_age=0)
+        filename = transcript_source("alpha", self.day)
+        compactor.compact([filename])
+        with open(os.path.join(self.directory, filename), "a") as f:
+            f.write(_said(self.day + 100, "Neon", "later"))
+        self.assertTrue(compactor.read(filename).endswith('"later" \n'))
+        compactor.compact([filename])
+        self.assertEqual(compactor.read(filename), self.transcripts[filename] + _said(self.day + 100, "Neon", "later"))
+        with self.assertRaises(FileNotFoundError):
+            compactor.read(transcript_source("missing", self.day))
+
+    def test_retention(self):
+        compactor = TranscriptCompactor(self.directory, "script", retention_days=1, min_age=0)
+        compactor.compact()
+        # One day after the second day's run started, only that run is kept
+        self.assertEqual(compactor.apply_retention(now=self.day + 86400 + 3600), 2)
+        archive = TranscriptArchive(os.path.join(self.directory, ARCHIVE_DIR), "script_alpha")
+        self.assertEqual(list(archive.entries), [transcript_source("alpha", self.day + 86400)])
+        self.assertEqual(archive.data_file, "script_alpha-1.ntz")
+        self.assertEqual(compactor.read(transcript_source("alpha", self.day + 86400)),
+                         self.transcripts[transcript_source("alpha", self.day + 86400)])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, ARCHIVE_DIR))),
+                         ["script_alpha-1.ntz", "script_alpha.ntx"])
+
+    def test_interrupted_append(self):
+        archive = TranscriptArchive(os.path.join(self.directory, ARCHIVE_DIR), "test")
+        archive.add({"a_1.txt": (b"first", 1)})
+        with open(archive.data_path, "ab") as f:
+            f.write(b"partial write")
+        archive = TranscriptArchive(os.path.join(self.directory, ARCHIVE_DIR), "test")
+        archive.add({"b_2.txt": (b"second", 2)})
+        self.assertEqual((archive.read("a_1.txt"), archive.read("b_2.txt")), ("first", "second"))
+        self.assertEqual(os.path.getsize(archive.data_path), archive.size)
+
+    def test_background_compaction(self):
+        compactor = TranscriptCompactor(self.directory, min_age=0)
+        compactor.request_compaction([transcript_source("beta", self.day + 60)])
+        compactor.request_compaction()
+        compactor.stop(10)
+        self.assertFalse(compactor.running)
+        self.assertEqual(self._files(), [])
+        self.assertEqual(compactor.get_metrics()["transcripts"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
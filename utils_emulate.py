@@ -1,3 +1,4 @@
+import random
 import time
 
 from mycroft.util.log import LOG
@@ -20,6 +21,7 @@ class Conversation:
         self.loops_dict = {}            # Dict of loop names and associated dict of values
         self.formatted_script = []      # List of script line dictionaries (excludes empty and comment lines)
         self.goto_tags = {}             # Dict of script tags and associated indexes
+        self.script_index = None        # ScriptIndex of formatted_script, shared by conversations running the script
 
         # Initialize time variables
         self.line = ''                              # Current formatted_file Line being loaded (includes empty and comment lines)
@@ -111,6 +113,7 @@ class Conversation:
         self.loops_dict = {}            # Dict of loop names and associated dict of values
         self.formatted_script = []      # List of script line dictionaries (excludes empty and comment lines)
         self.goto_tags = {}             # Dict of script tags and associated indexes
+        self.script_index = None        # ScriptIndex of formatted_script, shared by conversations running the script
 
         # reset time variables
         self.line = ''                  # Current formatted_file Line being loaded (includes empty and comment lines)
@@ -137,6 +140,7 @@ class ConversationManager:
         self._conversation_stack = []       # A list with all pending and active Conversations ordered from first to last
         self._user = user                   # A user associated with this manager
         self.user_scope_variables = {}      # Dict of declared variables and values from all scripts
+        self.rng = random.Random()          # Random choices made by this user's scripts; seeded for recorded sessions
 
     def __len__(self):
         return len(self._conversation_stack)
@@ -0,0 +1,283 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import ast
+import math
+import re
+import time
+
+from functools import lru_cache
+from types import SimpleNamespace
+
+
+class ExpressionError(ValueError):
+    """
+    Raised when a `Python:` line is rejected at compile time or exceeds its budget at evaluation
+    """
+
+
+class EvaluationBudget:
+    def __init__(self, max_nodes=256, max_exponent=1024, max_digits=4096, max_seconds=0.05):
+        self.max_nodes = max_nodes          # Maximum parsed AST nodes (static operation budget)
+        self.max_exponent = max_exponent    # Largest allowed exponent for `**`
+        self.max_digits = max_digits        # Largest allowed result of `*`/`**` in decimal digits (or characters)
+        self.max_seconds = max_seconds      # Wall-clock budget for a single evaluation
+
+
+# Names available to script expressions; `sleep` and the `time` module are intentionally not exposed
+EXPRESSION_NAMESPACE = {"sqrt": math.sqrt, "ln": math.log, "log": math.log10,
+                        "sin": math.sin, "cos": math.cos, "tan": math.tan,
+                        "sinh": math.sinh, "cosh": math.cosh, "tanh": math.tanh,
+                        "asin": math.asin, "acos": math.acos, "atan": math.atan,
+                        "abs": abs, "round": round, "min": min, "max": max, "int": int, "float": float,
+                        "time": SimpleNamespace(time=time.time), "e": math.e, "pi": math.pi}
+
+_ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call,
+                  ast.Name, ast.Load, ast.Constant, ast.Attribute, ast.Tuple,
+                  ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+                  ast.Not, ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+_ASSIGNMENT = re.compile(r"^\s*([A-Za-z_]\w*)\s*=(?!=)(.*)$", re.DOTALL)
+_BRACED_VARIABLE = re.compile(r"{\s*([A-Za-z_]\w*)\s*}")
+# Braced variables are bound under these prefixes so they only resolve to script variables, never namespace names
+_VARIABLE_PREFIX = "__var_"
+_TEXT_PREFIX = "__text_"  # Braced variables in string literals, bound to their text
+EXPRESSION_CACHE_SIZE = 1024
+
+
+class _Guard:
+    """
+    Per-evaluation guard called from compiled code for every operation that can grow without bound
+    """
+    __slots__ = ("budget", "deadline")
+
+    def __init__(self, budget: EvaluationBudget):
+        self.budget = budget
+        self.deadline = time.monotonic() + budget.max_seconds
+
+    def _check(self, result):
+        if time.monotonic() > self.deadline:
+            raise ExpressionError("time budget exceeded")
+        if isinstance(result, int) and result.bit_length() > self.budget.max_digits * 3.33:
+            raise ExpressionError("result too large")
+        if isinstance(result, (str, tuple, list)) and len(result) > self.budget.max_digits:
+            raise ExpressionError("result too large")
+        return result
+
+    def pow(self, left, right):
+        if isinstance(right, (int, float)) and abs(right) > self.budget.max_exponent:
+            raise ExpressionError(f"exponent {right} exceeds budget")
+        # Estimate the result size before it is computed
+        if isinstance(left, (int, float)) and isinstance(right, (int, float)) and right > 0 and abs(left) > 1 and \
+                right * math.log10(abs(left)) > self.budget.max_digits:
+            raise ExpressionError("result too large")
+        return self._check(left ** right)
+
+    def mul(self, left, right):
+        # Check repeated sequences before they are allocated
+        sequence, count = (left, right) if isinstance(left, (str, tuple, list)) else (right, left)
+        if isinstance(sequence, (str, tuple, list)) and isinstance(count, int) and \
+                len(sequence) * count > self.budget.max_digits:
+            raise ExpressionError("result too large")
+        return self._check(left * right)
+
+    def call(self, func, *args):
+        return self._check(func(*args))
+
+    def fill(self, *parts):
+        return self._check("".join(str(part) for part in parts))
+
+
+class _BracedVariableTransformer(ast.NodeTransformer):
+    """
+    Rewrites braced variables (parsed as one-element sets) to prefixed names, and string literals containing braced
+    variables to `_guard.fill` calls that substitute the variables' text
+    """
+    def __init__(self):
+        self.variables = set()  # Names of braced variables
+        self.text = set()       # Names of braced variables in string literals
+
+    def visit_Set(self, node):
+        if len(node.elts) == 1 and isinstance(node.elts[0], ast.Name):
+            self.variables.add(node.elts[0].id)
+            return ast.copy_location(ast.Name(id=_VARIABLE_PREFIX + node.elts[0].id, ctx=ast.Load()), node)
+        return self.generic_visit(node)
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, str) or not _BRACED_VARIABLE.search(node.value):
+            return node
+        # Split into alternating literal text and variable names
+        args = []
+        for idx, part in enumerate(_BRACED_VARIABLE.split(node.value)):
+            if idx % 2:
+                self.text.add(part)
+                args.append(ast.Name(id=_TEXT_PREFIX + part, ctx=ast.Load()))
+            elif part:
+                args.append(ast.Constant(value=part))
+        return ast.copy_location(ast.Call(func=ast.Attribute(value=ast.Name(id="_guard", ctx=ast.Load()),
+                                                             attr="fill", ctx=ast.Load()),
+                                          args=args, keywords=[]), node)
+
+
+class _GuardTransformer(ast.NodeTransformer):
+    """
+    Rewrites `**`, `*` and function calls into calls on the per-evaluation `_guard`
+    """
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, (ast.Pow, ast.Mult)):
+            method = "pow" if isinstance(node.op, ast.Pow) else "mul"
+            return ast.copy_location(ast.Call(func=ast.Attribute(value=ast.Name(id="_guard", ctx=ast.Load()),
+                                                                 attr=method, ctx=ast.Load()),
+                                              args=[node.left, node.right], keywords=[]), node)
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        return ast.copy_location(ast.Call(func=ast.Attribute(value=ast.Name(id="_guard", ctx=ast.Load()),
+                                                             attr="call", ctx=ast.Load()),
+                                          args=[node.func, *node.args], keywords=[]), node)
+
+
+def _to_number(value):
+    """
+    Converts a script variable value to the number it represents, else returns it unchanged
+    :param value: variable value (usually a string)
+    :return: int, float, or the passed value
+    """
+    if isinstance(value, str):
+        value = value.strip().strip('"')
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    return value
+
+
+class CompiledExpression:
+    """
+    A `Python:` line validated against a whitelist of arithmetic operations and compiled once to a code object.
+    Names that are not built-in functions or constants, and braced variables (`{name}`, also inside string literals),
+    are bound to script variables at evaluation.
+    """
+    def __init__(self, text: str, budget: EvaluationBudget = None):
+        self.text = text
+        self.budget = budget or EvaluationBudget()
+        match = _ASSIGNMENT.match(text)
+        if match:
+            self.target, expression = match.group(1), match.group(2)
+        else:
+            self.target, expression = None, text
+        expression = expression.strip()
+        try:
+            tree = ast.parse(expression, mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError(f"invalid syntax: {expression}") from e
+        # Underscored names are reserved for braced variables and the guard
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and node.id.startswith("_"):
+                raise ExpressionError(f"{node.id} is not a valid variable name")
+        braced = _BracedVariableTransformer()
+        tree = braced.visit(tree)
+
+        names = set()
+        node_count = 0
+        for node in ast.walk(tree):
+            node_count += 1
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ExpressionError(f"{type(node).__name__} is not allowed in {expression}")
+            if isinstance(node, ast.Attribute) and not (isinstance(node.value, ast.Name) and
+                                                        (node.value.id, node.attr) in (("time", "time"),
+                                                                                       ("_guard", "fill"))):
+                raise ExpressionError(f"attribute access is not allowed in {expression}")
+            if isinstance(node, ast.Name) and node.id not in EXPRESSION_NAMESPACE and not node.id.startswith("_"):
+                names.add(node.id)
+        if node_count > self.budget.max_nodes:
+            raise ExpressionError(f"expression exceeds {self.budget.max_nodes} operations")
+
+        tree = ast.fix_missing_locations(_GuardTransformer().visit(tree))
+        self.names = frozenset(names | braced.variables | braced.text)
+        # (local name, variable name, True to bind the variable's text instead of its number)
+        self._bindings = tuple([(name, name, False) for name in names] +
+                               [(_VARIABLE_PREFIX + name, name, False) for name in braced.variables] +
+                               [(_TEXT_PREFIX + name, name, True) for name in braced.text])
+        self.code = compile(tree, "<script>", "eval")
+
+    def evaluate(self, variables: dict = None):
+        """
+        Evaluate this expression
+        :param variables: dict of variable names referenced by this expression to their values
+        :return: result of the expression
+        """
+        variables = variables or {}
+        missing = self.names.difference(variables)
+        if missing:
+            raise ExpressionError(f"undeclared variable(s): {', '.join(sorted(missing))}")
+        local_vars = {local: variables[name] if text else _to_number(variables[name])
+                      for local, name, text in self._bindings}
+        local_vars["_guard"] = _Guard(self.budget)
+        try:
+            return eval(self.code, {"__builtins__": {}, **EXPRESSION_NAMESPACE}, local_vars)
+        except ExpressionError:
+            raise
+        except Exception as e:
+            raise ExpressionError(f"{type(e).__name__}: {e}") from e
+
+
+def compile_expression(text: str, budget: EvaluationBudget = None) -> CompiledExpression:
+    """
+    Compile a `Python:` script line
+    :param text: line text, optionally in the form `variable = expression`
+    :param budget: EvaluationBudget to enforce (default budget if None)
+    :return: CompiledExpression ready for repeated evaluation
+    """
+    return CompiledExpression(text, budget)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def get_compiled_expression(text: str) -> CompiledExpression:
+    """
+    Get the compiled expression for a `Python:` script line, compiling it on first use in this process. Only the
+    most recently used expressions are kept.
+    :param text: line text, optionally in the form `variable = expression`
+    :return: CompiledExpression with the default budget
+    """
+    return compile_expression(text)
+
+
+def evaluate_expression(text: str, variables: dict = None):
+    """
+    Evaluate a `Python:` script line, compiling it on first use in this process. Used where compiled expressions
+    can't be passed, i.e. in worker processes
+    :param text: line text, optionally in the form `variable = expression`
+    :param variables: dict of variable names referenced by the line to their values
+    :return: result of the expression
+    """
+    return get_compiled_expression(text).evaluate(variables)
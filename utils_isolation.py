@@ -0,0 +1,302 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Pool of warm worker processes that evaluate untrusted script content outside the skill process, so a pathological
+script can't stall or crash the sessions of other users
+"""
+import multiprocessing
+import os
+
+from importlib import import_module
+
+from itertools import count
+from queue import Queue
+from threading import Lock
+
+
+class IsolationError(RuntimeError):
+    """
+    Raised when an isolated call exceeds its limits or its worker process exits
+    """
+
+
+def _get_virtual_memory() -> int:
+    """
+    Get the address space size of this process
+    :return: size in bytes, else 0 if it can't be determined
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _limit_cpu(max_cpu_seconds: int):
+    """
+    Limit the CPU time of this process to `max_cpu_seconds` more than it has used so far; the process is killed
+    (SIGXCPU) if it exceeds the limit
+    :param max_cpu_seconds: CPU seconds allowed from now
+    """
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + max_cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, max_memory_mb: int, max_cpu_seconds: int, preload=()):
+    """
+    Worker process loop. Once `preload` is imported the worker sends None to signal it is ready. Requests are
+    (call_id, func, args); responses are (call_id, True, result) or (call_id, False, exception). A None request stops
+    the worker.
+    :param conn: Connection to the skill process
+    :param max_memory_mb: MiB the worker's address space may grow by after preloading, else None for no limit
+    :param max_cpu_seconds: CPU seconds allowed per call, else None for no limit
+    :param preload: names of modules to import before handling calls
+    """
+    for name in preload:
+        try:
+            import_module(name)
+        except Exception:
+            # Calls needing the module report the error
+            pass
+    try:
+        import resource
+    except ImportError:  # Not available on this platform
+        resource = None
+    if resource and max_memory_mb:
+        base = _get_virtual_memory()
+        if base:
+            limit = base + max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        conn.send(None)
+    except (OSError, ValueError):
+        return
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        if request is None:
+            break
+        call_id, func, args = request
+        if resource and max_cpu_seconds:
+            _limit_cpu(max_cpu_seconds)
+        try:
+            response = (call_id, True, func(*args))
+        except MemoryError:
+            response = (call_id, False, IsolationError("memory limit exceeded"))
+        except Exception as e:
+            response = (call_id, False, e)
+        try:
+            conn.send(response)
+        except Exception as e:
+            # Result or exception can't be pickled
+            conn.send((call_id, False, IsolationError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    __slots__ = ("process", "conn", "calls", "ready")
+
+    def __init__(self, context, max_memory_mb, max_cpu_seconds, preload):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, max_memory_mb, max_cpu_seconds, preload),
+                                       name="cc_isolated", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+        self.ready = False
+
+    def stop(self, timeout: float = 1.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout)
+        self.conn.close()
+
+
+class IsolatedPool:
+    """
+    Runs calls in a fixed number of worker processes that are started once and reused. Each call is limited in wall
+    time, CPU time, and memory; a worker that exceeds a limit or exits is replaced and the call raises IsolationError.
+    Callables and their arguments and results must be picklable; callables are passed by reference, so workers import
+    their modules (listed in `preload` to import them when the worker starts instead of during the first call).
+    """
+    def __init__(self, workers: int = 2, timeout: float = 2.0, max_memory_mb: int = 256, max_cpu_seconds: int = 2,
+                 max_calls: int = 1000, start_method: str = None, preload=(), startup_timeout: float = 30.0):
+        """
+        :param workers: number of worker processes
+        :param timeout: wall seconds to wait for a call's result, once the worker has started
+        :param max_memory_mb: MiB each worker's address space may grow by after it starts, else None for no limit
+        :param max_cpu_seconds: CPU seconds allowed per call, else None for no limit
+        :param max_calls: calls handled by a worker before it is replaced
+        :param start_method: multiprocessing start method (default "forkserver" where available, else "spawn").
+            Workers are never forked from the calling process directly: it is multithreaded, and a forked child can
+            deadlock on a lock another thread held at the time of the fork.
+        :param preload: names of modules each worker imports when it starts, i.e. the modules of called functions
+        :param startup_timeout: wall seconds to wait for a worker to start and import `preload`
+        """
+        if not start_method:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self.max_cpu_seconds = max_cpu_seconds
+        self.max_calls = max_calls
+        self.preload = tuple(preload)
+        self.startup_timeout = startup_timeout
+        self._call_ids = count()
+        self._lock = Lock()
+        self._workers = set()
+        self._idle = Queue()
+        self._closed = False
+        self._calls = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._restarts = 0
+        for _ in range(workers):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self) -> _Worker:
+        worker = _Worker(self._context, self.max_memory_mb, self.max_cpu_seconds, self.preload)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _replace_worker(self, worker: _Worker) -> _Worker:
+        """
+        Stop a worker and start another in its place
+        :param worker: worker to stop
+        :return: new worker
+        """
+        with self._lock:
+            self._workers.discard(worker)
+            self._restarts += 1
+        worker.stop(0)
+        return self._start_worker()
+
+    def _wait_ready(self, worker: _Worker) -> bool:
+        """
+        Wait for a worker to finish starting, so its startup isn't counted against the timeout of a call
+        :param worker: worker to wait for
+        :return: True if the worker is ready for calls
+        """
+        if not worker.ready:
+            try:
+                worker.ready = worker.conn.poll(self.startup_timeout) and worker.conn.recv() is None
+            except (EOFError, OSError):
+                pass
+        return worker.ready
+
+    def call(self, func, *args):
+        """
+        Call a function in a worker process, waiting for a free worker if all are busy
+        :param func: module-level function to call
+        :param args: positional arguments for `func`
+        :return: return value of `func`
+        """
+        if self._closed:
+            raise IsolationError("pool is shut down")
+        worker = self._idle.get()
+        try:
+            call_id = next(self._call_ids)
+            try:
+                if not self._wait_ready(worker):
+                    raise OSError("worker did not start")
+                worker.conn.send((call_id, func, args))
+            except (OSError, ValueError):
+                # Worker exited since its last call; the request was not handled
+                worker = self._replace_worker(worker)
+                if not self._wait_ready(worker):
+                    with self._lock:
+                        self._errors += 1
+                    worker = self._replace_worker(worker)
+                    raise IsolationError("worker did not start")
+                worker.conn.send((call_id, func, args))
+            with self._lock:
+                self._calls += 1
+            if not worker.conn.poll(self.timeout):
+                with self._lock:
+                    self._timeouts += 1
+                worker = self._replace_worker(worker)
+                raise IsolationError(f"call exceeded {self.timeout}s")
+            try:
+                _, ok, value = worker.conn.recv()
+            except (EOFError, OSError):
+                with self._lock:
+                    self._errors += 1
+                exitcode = worker.process.exitcode
+                worker = self._replace_worker(worker)
+                raise IsolationError(f"worker exited (exit code {exitcode})")
+            worker.calls += 1
+            if worker.calls >= self.max_calls:
+                worker = self._replace_worker(worker)
+            if not ok:
+                with self._lock:
+                    self._errors += 1
+                raise value
+            return value
+        finally:
+            if self._closed:
+                worker.stop(0)
+            else:
+                self._idle.put(worker)
+
+    def get_metrics(self) -> dict:
+        """
+        Get counts of calls, failed calls, timeouts, and worker restarts
+        :return: dict of metrics
+        """
+        with self._lock:
+            return {"workers": len(self._workers),
+                    "calls": self._calls,
+                    "errors": self._errors,
+                    "timeouts": self._timeouts,
+                    "restarts": self._restarts}
+
+    def shutdown(self):
+        """
+        Stop all idle workers; busy workers are stopped when their call returns
+        """
+        self._closed = True
+        while not self._idle.empty():
+            worker = self._idle.get()
+            with self._lock:
+                self._workers.discard(worker)
+            worker.stop()
@@ -0,0 +1,279 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Outbound email queue. Emails are sent from a background thread in batches, failed sends are retried with exponential
+backoff, and attachments are read and base64 encoded in chunks when sent rather than when queued.
+"""
+import base64
+import heapq
+import itertools
+import time
+
+from threading import Condition, Thread
+from ovos_utils.log import LOG
+
+# Attachment bytes read per chunk; a multiple of 3 so chunks encode to base64 without padding
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def encode_attachment(attachment, chunk_size: int = ENCODE_CHUNK_SIZE) -> str:
+    """
+    Base64 encode an attachment, reading a file in chunks so the whole file is never held in memory with its encoding
+    :param attachment: path to a file, or bytes
+    :param chunk_size: bytes to read per chunk (rounded down to a multiple of 3)
+    :return: base64 encoded attachment
+    """
+    if isinstance(attachment, (bytes, bytearray)):
+        return base64.b64encode(attachment).decode("utf-8")
+    chunk_size = max(chunk_size - chunk_size % 3, 3)
+    encoded = []
+    with open(attachment, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            encoded.append(base64.b64encode(chunk).decode("utf-8"))
+    return "".join(encoded)
+
+
+def send_each(send_one, emails) -> list:
+    """
+    Send a batch of emails one at a time, so an email that fails doesn't fail the emails already sent
+    :param send_one: callable with one email request dict, returning False if the email wasn't sent
+    :param emails: list of email request dicts
+    :return: list of True/False per email sent
+    """
+    results = []
+    for email in emails:
+        try:
+            results.append(send_one(email) is not False)
+        except Exception as e:
+            LOG.error(f"Failed to send email to {email.get('recipient')}: {e}")
+            results.append(False)
+    return results
+
+
+class OutboundEmail:
+    """
+    One queued email and its delivery state
+    """
+    __slots__ = ("recipient", "subject", "body", "attachments", "callback", "attempts")
+
+    def __init__(self, recipient: str, subject: str, body: str, attachments: dict = None, callback=None):
+        """
+        :param recipient: email address to send to
+        :param subject: email subject
+        :param body: email body
+        :param attachments: dict of attachment filenames to file paths or bytes
+        :param callback: optional callback with True when sent, or False when the email is dropped
+        """
+        self.recipient = recipient
+        self.subject = subject
+        self.body = body
+        self.attachments = attachments or dict()
+        self.callback = callback
+        self.attempts = 0
+
+    def to_request(self) -> dict:
+        """
+        Build the email request data, encoding attachments
+        :return: dict of recipient, subject, body, and attachments (dict of filenames to base64 encoded files)
+        """
+        return {"recipient": self.recipient,
+                "subject": self.subject,
+                "body": self.body,
+                "attachments": {name: encode_attachment(attachment)
+                                for name, attachment in self.attachments.items()} or None}
+
+
+class EmailQueue:
+    """
+    Sends queued emails from a background thread. Emails queued close together are sent as one batch, and emails
+    that fail to send are queued again with exponential backoff until `max_attempts` is reached.
+    """
+    def __init__(self, send, batch_size: int = 10, batch_delay: float = 0.5, max_attempts: int = 5,
+                 backoff: float = 2.0, max_backoff: float = 300.0):
+        """
+        :param send: callable with a list of email request dicts (see `OutboundEmail.to_request`), returning an
+                     iterable of True/False per email sent; if it raises, every email in the batch is retried, so
+                     senders that can partly succeed should report per email (see `send_each`)
+        :param batch_size: maximum emails sent per call to `send`
+        :param batch_delay: seconds to wait for more emails after one is ready to send
+        :param max_attempts: sends attempted per email before it is dropped
+        :param backoff: seconds before the first retry; doubled for each retry after that
+        :param max_backoff: maximum seconds between retries
+        """
+        self.send = send
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._pending = []  # Heap of (monotonic time ready to send, sequence, OutboundEmail)
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._stopping = False
+        self._condition = Condition()
+        self._thread = None
+        self._metrics = {"queued": 0, "sent": 0, "failed": 0, "retries": 0, "batches": 0}
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        """
+        Start the background worker if it isn't already running
+        """
+        if not self.running:
+            self._stopping = False
+            self._thread = Thread(target=self._run, name="EmailQueue", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the background worker after sending emails that are ready; emails waiting to be retried are dropped
+        :param timeout: seconds to wait for the worker to exit
+        """
+        if self.running:
+            with self._condition:
+                self._stopping = True
+                self._condition.notify_all()
+            self._thread.join(timeout)
+        if self._pending and not self.running:
+            LOG.warning(f"Dropping {len(self._pending)} unsent emails")
+            with self._condition:
+                dropped, self._pending = self._pending, []
+            for _, _, email in dropped:
+                self._finish(email, False)
+
+    def enqueue(self, email: OutboundEmail):
+        """
+        Queue an email to be sent in the background
+        :param email: email to send
+        """
+        self.start()
+        with self._condition:
+            heapq.heappush(self._pending, (time.monotonic(), next(self._sequence), email))
+            self._metrics["queued"] += 1
+            self._condition.notify_all()
+
+    def flush(self, timeout=None) -> bool:
+        """
+        Wait until every queued email is sent or dropped
+        :param timeout: maximum seconds to wait
+        :return: True if the queue is empty
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def get_metrics(self) -> dict:
+        """
+        Get counts of queued, sent, failed (dropped), and retried emails, batches sent, and emails pending
+        """
+        with self._condition:
+            return {**self._metrics, "pending": len(self._pending) + self._in_flight}
+
+    def _take_batch(self):
+        """
+        Wait for emails ready to send
+        :return: list of emails to send, else None if the worker is stopping
+        """
+        batch = []
+        deadline = None
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._pending and self._pending[0][0] <= now and len(batch) < self.batch_size:
+                    batch.append(heapq.heappop(self._pending)[2])
+                self._in_flight = len(batch)
+                if batch:
+                    deadline = deadline or now + self.batch_delay
+                    if len(batch) >= self.batch_size or now >= deadline or self._stopping:
+                        return batch
+                    timeout = deadline - now
+                elif self._stopping:
+                    return None
+                else:
+                    timeout = None
+                next_ready = self._pending[0][0] - now if self._pending else None
+                if timeout is None or (next_ready is not None and next_ready < timeout):
+                    timeout = next_ready
+                self._condition.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                break
+            requests, to_send = [], []
+            for email in batch:
+                try:
+                    requests.append(email.to_request())
+                    to_send.append(email)
+                except OSError as e:
+                    # Missing attachments won't be fixed by retrying
+                    LOG.error(f"Dropping email to {email.recipient}: {e}")
+                    self._finish(email, False)
+            results = []
+            if requests:
+                try:
+                    results = list(self.send(requests))
+                except Exception as e:
+                    LOG.error(e)
+            with self._condition:
+                self._metrics["batches"] += 1
+            for idx, email in enumerate(to_send):
+                email.attempts += 1
+                if idx < len(results) and results[idx]:
+                    self._finish(email, True)
+                elif email.attempts >= self.max_attempts:
+                    LOG.error(f"Dropping email to {email.recipient} after {email.attempts} attempts")
+                    self._finish(email, False)
+                else:
+                    delay = min(self.backoff * 2 ** (email.attempts - 1), self.max_backoff)
+                    with self._condition:
+                        heapq.heappush(self._pending, (time.monotonic() + delay, next(self._sequence), email))
+                        self._metrics["retries"] += 1
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+
+    def _finish(self, email: OutboundEmail, sent: bool):
+        with self._condition:
+            self._metrics["sent" if sent else "failed"] += 1
+        if email.callback:
+            try:
+                email.callback(sent)
+            except Exception as e:
+                LOG.error(e)
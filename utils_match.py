@@ -0,0 +1,191 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Utilities for matching user utterances against script-defined text
+"""
+import os
+import re
+
+from collections import deque
+from functools import lru_cache
+
+
+# Extensions of prerecorded phrase files in a script's audio directory
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac")
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class OptionMatcher:
+    """
+    Aho-Corasick automaton over a list of options; finds the longest option that appears in an utterance as whole
+    words in a single pass over the utterance. Matching is case-insensitive.
+    """
+    def __init__(self, options):
+        """
+        :param options: iterable of option strings; the first of any duplicate options is returned on a match
+        """
+        self.options = tuple(options)
+        self._goto = [dict()]       # Node transitions by character
+        self._fail = [0]            # Longest proper suffix of this node that is also a node
+        self._output = [None]       # Index of the option ending at this node
+        self._length = [0]          # Depth of this node
+        self._output_link = [0]     # Nearest node in the fail chain with an output (0 if none)
+
+        for option_idx, option in enumerate(self.options):
+            key = str(option).lower().strip()
+            if not key:
+                continue
+            node = 0
+            for char in key:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append(dict())
+                    self._fail.append(0)
+                    self._output.append(None)
+                    self._length.append(self._length[node] + 1)
+                    self._output_link.append(0)
+                node = next_node
+            if self._output[node] is None:
+                self._output[node] = option_idx
+
+        # Breadth-first so every node's fail target is built before the node itself; depth 1 nodes fail to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._output[fail] is not None else self._output_link[fail]
+                queue.append(child)
+
+    def match(self, utterance: str):
+        """
+        Find the longest option in an utterance, bounded by non-word characters or the ends of the utterance
+        :param utterance: string to search
+        :return: matched option as declared, else None if no option matches
+        """
+        text = str(utterance).lower()
+        best_idx, best_length = None, 0
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            candidate = node if self._output[node] is not None else self._output_link[node]
+            while candidate:
+                length = self._length[candidate]
+                if length > best_length:
+                    start = position - length + 1
+                    if (start == 0 or not (_is_word_char(text[start - 1]) and _is_word_char(text[start]))) and \
+                            (position == len(text) - 1 or
+                             not (_is_word_char(text[position + 1]) and _is_word_char(char))):
+                        best_idx, best_length = self._output[candidate], length
+                candidate = self._output_link[candidate]
+        return None if best_idx is None else self.options[best_idx]
+
+
+@lru_cache(maxsize=256)
+def get_option_matcher(options: tuple) -> OptionMatcher:
+    """
+    Get a cached OptionMatcher for a set of options
+    :param options: tuple of option strings
+    :return: OptionMatcher for `options`
+    """
+    return OptionMatcher(options)
+
+
+class PerspectiveTranslator:
+    """
+    Swaps first and second person words (i.e. "my" <-> "your") in a single pass over a string. Only whole words are
+    replaced, so words containing a mapped word and words with apostrophes ("i'm") are left as they are.
+    """
+    def __init__(self, changes: dict):
+        """
+        :param changes: dict of words to their replacements; words are matched case-insensitively
+        """
+        self.changes = {str(word).lower(): replacement for word, replacement in changes.items() if word}
+        # Longest first so multi-word entries take precedence over the words they contain
+        words = sorted(self.changes, key=len, reverse=True)
+        pattern = r"(?<![\w'])(?:" + "|".join(re.escape(word) for word in words) + r")(?![\w'])"
+        # Input is usually lowercase already; a case-sensitive pattern with a plain lookup is faster for it
+        self._pattern = re.compile(pattern) if words else None
+        self._pattern_ignore_case = re.compile(pattern, re.IGNORECASE) if words else None
+        self._lookup = self.changes.__getitem__
+
+    def _replace(self, match) -> str:
+        return self._lookup(match[0])
+
+    def _replace_ignore_case(self, match) -> str:
+        return self._lookup(match[0].lower())
+
+    def translate(self, text: str) -> str:
+        """
+        Change the perspective of a string
+        :param text: string to translate
+        :return: translated string
+        """
+        if not self._pattern:
+            return text
+        if text.islower():
+            return self._pattern.sub(self._replace, text)
+        return self._pattern_ignore_case.sub(self._replace_ignore_case, text)
+
+
+def normalize_phrase(text: str) -> str:
+    """
+    Normalize a phrase for lookup of a recording; case, punctuation, and spacing are ignored
+    :param text: phrase to normalize
+    :return: lowercase words of text separated by single spaces
+    """
+    text = str(text).lower().replace("\u2019", "").replace("'", "")
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def build_phrase_index(directory: str) -> dict:
+    """
+    Index the audio files in a directory by the phrase each is named after, i.e. "Are you ill?.mp3"
+    :param directory: directory of recordings
+    :return: dict of normalized phrase to audio file path (empty if the directory doesn't exist)
+    """
+    index = dict()
+    if os.path.isdir(directory):
+        for file in sorted(os.listdir(directory)):
+            phrase, ext = os.path.splitext(file)
+            key = normalize_phrase(phrase)
+            if key and ext.lower() in AUDIO_EXTENSIONS:
+                index.setdefault(key, os.path.join(directory, file))
+    return index
@@ -0,0 +1,149 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Background prefetch of expensive, input-independent script dependencies while a conversation waits for user input
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+
+class Prefetcher:
+    """
+    Runs fetches for a user ahead of when their script needs them. Each user has one set of prefetches, which is
+    replaced at every wait point; results may be used any number of times until then. Prefetches that were never used
+    are counted as wasted when they are replaced.
+    """
+    def __init__(self, max_workers: int = 2):
+        """
+        :param max_workers: threads running prefetches
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cc_prefetch")
+        self._lock = Lock()
+        self._pending = dict()  # Dict of users to dict of keys to [Future, used]
+        self._prefetched = 0
+        self._hits = 0
+        self._used = 0
+        self._misses = 0
+        self._wasted = 0
+        self._errors = 0
+
+    def prefetch(self, user: str, fetches: dict):
+        """
+        Replace a user's pending prefetches. Pending keys that are prefetched again are kept as they are.
+        :param user: user whose script will need the results
+        :param fetches: dict of hashable keys to callables returning the result for that key
+        """
+        with self._lock:
+            pending = self._pending.get(user, dict())
+            for key in [key for key in pending if key not in fetches]:
+                self._discard(pending.pop(key))
+            for key, fetch in fetches.items():
+                if key not in pending:
+                    pending[key] = [self._executor.submit(fetch), False]
+                    self._prefetched += 1
+            if pending:
+                self._pending[user] = pending
+            else:
+                self._pending.pop(user, None)
+
+    def get(self, user: str, key, fetch):
+        """
+        Get the result for a key, from a prefetch if there is one, else by fetching it now
+        :param user: user whose script needs the result
+        :param key: key the result may have been prefetched under
+        :param fetch: callable returning the result if it wasn't prefetched
+        :return: result of the prefetch or fetch
+        """
+        with self._lock:
+            entry = self._pending.get(user, dict()).get(key)
+            if entry is None:
+                self._misses += 1
+                future = None
+            else:
+                self._hits += 1
+                self._used += not entry[1]
+                future = entry[0]
+                entry[1] = True
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                # Let the caller see and handle any error from the fetch itself
+                with self._lock:
+                    self._errors += 1
+        return fetch()
+
+    def discard(self, user: str):
+        """
+        Discard all of a user's pending prefetches
+        :param user: user whose script no longer needs them
+        """
+        with self._lock:
+            for entry in self._pending.pop(user, dict()).values():
+                self._discard(entry)
+
+    def clear(self):
+        """
+        Discard every pending prefetch, i.e. when the data they were fetched from changed
+        """
+        for user in list(self._pending):
+            self.discard(user)
+
+    def _discard(self, entry):
+        future, used = entry
+        if not used:
+            future.cancel()
+            self._wasted += 1
+
+    def get_metrics(self) -> dict:
+        """
+        Get prefetch counts and rates
+        :return: dict of counts; `hit_rate` is the share of lookups served by a prefetch and `used_rate` the share of
+            prefetches that were used, of those used or discarded so far
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            finished = self._used + self._wasted
+            return {"prefetched": self._prefetched,
+                    "used": self._used,
+                    "hits": self._hits,
+                    "misses": self._misses,
+                    "wasted": self._wasted,
+                    "errors": self._errors,
+                    "pending": sum(len(pending) for pending in self._pending.values()),
+                    "hit_rate": self._hits / lookups if lookups else 0.0,
+                    "used_rate": self._used / finished if finished else 0.0}
+
+    def shutdown(self):
+        """
+        Stop prefetching; pending prefetches are cancelled
+        """
+        self.clear()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,222 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Recording of the external inputs a conversation session receives, and the data needed to replay them. A session log
+is a file of compact JSON lines: a header followed by one record per input or output in the order it was seen.
+"""
+import json
+import os
+import random
+import time
+
+from collections import deque
+from threading import Lock
+
+SESSION_LOG_VERSION = 1
+SESSION_LOG_EXT = ".ccr"
+
+# Record kinds that are fed to the skill on replay; everything else is supplied on request or compared
+DRIVING_INPUTS = ("start", "utterance", "timeout")
+
+
+class _Session:
+    __slots__ = ("file", "path", "start")
+
+    def __init__(self, file, path, start):
+        self.file = file
+        self.path = path
+        self.start = start
+
+
+class SessionRecorder:
+    """
+    Writes one log per session. A session starts when a user with no running script starts one and ends when that
+    user's script stack is empty.
+    """
+    def __init__(self, directory: str):
+        """
+        :param directory: directory to write session logs to
+        """
+        self.directory = directory
+        self._lock = Lock()
+        self._sessions = dict()  # Dict of users to _Session
+
+    def is_recording(self, user: str) -> bool:
+        """
+        :param user: user to check
+        :return: True if a session is being recorded for user
+        """
+        return user in self._sessions
+
+    def start_session(self, user: str, script: str, seed: int = None) -> dict:
+        """
+        Start a session log for a user, if one is not already open. The header includes a seed for `random` that the
+        caller should apply so replay makes the same choices.
+        :param user: user starting a script
+        :param script: script filename being started
+        :param seed: seed to record (default random)
+        :return: session header, or None if a session was already being recorded
+        """
+        with self._lock:
+            if user in self._sessions:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            started = time.time()
+            safe_user = "".join(c if c.isalnum() or c in "-_" else "_" for c in user)
+            path = os.path.join(self.directory, f"{safe_user}_{script}_{int(started * 1000)}{SESSION_LOG_EXT}")
+            header = {"version": SESSION_LOG_VERSION, "user": user, "script": script, "started": started,
+                      "seed": random.randrange(2 ** 32) if seed is None else seed}
+            log_file = open(path, "a")
+            log_file.write(json.dumps(header, separators=(",", ":")) + "\n")
+            log_file.flush()
+            self._sessions[user] = _Session(log_file, path, time.monotonic())
+            return header
+
+    def record(self, user: str, kind: str, msg_type: str = None, data: dict = None, context: dict = None):
+        """
+        Append a record to a user's session log. Does nothing if the user has no open session.
+        :param user: user the record belongs to
+        :param kind: record kind ("start", "utterance", "speak", "skill_response", "timeout", or "output")
+        :param msg_type: type of the Message received
+        :param data: Message data
+        :param context: Message context
+        """
+        session = self._sessions.get(user)
+        if not session:
+            return
+        record = {"t": round(time.monotonic() - session.start, 4), "k": kind}
+        if msg_type:
+            record["type"] = msg_type
+        if data:
+            record["data"] = data
+        if context:
+            record["context"] = context
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            if not session.file.closed:
+                session.file.write(line)
+                session.file.flush()
+
+    def end_session(self, user: str) -> str:
+        """
+        Close a user's session log
+        :param user: user whose session ended
+        :return: path to the closed log, or None if there was no open session
+        """
+        with self._lock:
+            session = self._sessions.pop(user, None)
+            if not session:
+                return None
+            session.file.close()
+            return session.path
+
+    def close(self):
+        """
+        Close all open session logs
+        """
+        for user in list(self._sessions):
+            self.end_session(user)
+
+
+def load_session(path: str) -> (dict, list):
+    """
+    Read a session log
+    :param path: path to a session log
+    :return: header dict, list of record dicts
+    """
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get("version") != SESSION_LOG_VERSION:
+            raise ValueError(f"Unsupported session log version: {header.get('version')}")
+        records = [json.loads(line) for line in f if line.strip()]
+    return header, records
+
+
+def get_outputs(records: list) -> list:
+    """
+    Get the text spoken to the user in a session, ignoring timing
+    :param records: records from `load_session`
+    :return: list of spoken utterances
+    """
+    return [r.get("data", {}).get("utterance") for r in records if r["k"] == "output"]
+
+
+def compare_outputs(expected: list, actual: list) -> list:
+    """
+    Compare the outputs of a recorded session with those of its replay
+    :param expected: outputs of the recorded session
+    :param actual: outputs of the replayed session
+    :return: list of (index, expected, actual) for each difference; None where one side has no output
+    """
+    differences = []
+    for i in range(max(len(expected), len(actual))):
+        exp = expected[i] if i < len(expected) else None
+        act = actual[i] if i < len(actual) else None
+        if exp != act:
+            differences.append((i, exp, act))
+    return differences
+
+
+class SessionInputs:
+    """
+    Inputs of a recorded session, queued for replay. Driving inputs are fed in order; skill responses and speak
+    events are handed out when the replayed skill asks for them.
+    """
+    def __init__(self, records: list):
+        """
+        :param records: records from `load_session`
+        """
+        self.driving = [r for r in records if r["k"] in DRIVING_INPUTS]
+        self._skill_responses = deque(r for r in records if r["k"] == "skill_response")
+        self._speaks = deque(r for r in records if r["k"] == "speak")
+
+    def next_skill_response(self) -> dict:
+        """
+        :return: the next recorded `skills:execute.response` record, or None if there are no more
+        """
+        return self._skill_responses.popleft() if self._skill_responses else None
+
+    def speaks_for_request(self, request: str) -> list:
+        """
+        Get the recorded speak events that answered an executed request
+        :param request: request text from the emitted message's `cc_data`
+        :return: list of speak records; empty if the next recorded speak answers a different request
+        """
+        speaks = []
+        while self._speaks and self._speaks[0].get("context", {}).get("cc_data", {}).get("request") == request:
+            speaks.append(self._speaks.popleft())
+        return speaks
+
+    @property
+    def remaining(self) -> int:
+        """
+        :return: number of recorded skill responses and speak events that were not requested during replay
+        """
+        return len(self._skill_responses) + len(self._speaks)
@@ -0,0 +1,198 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Cooperative scheduling of script execution: bounds the work done for one user per turn and detects scripts that loop
+without making progress
+"""
+import time
+
+from threading import Lock
+
+
+class _UserMetrics:
+    __slots__ = ("turns", "steps", "yields", "aborts", "busy_seconds", "max_turn_seconds")
+
+    def __init__(self):
+        self.turns = 0
+        self.steps = 0
+        self.yields = 0
+        self.aborts = 0
+        self.busy_seconds = 0.0
+        self.max_turn_seconds = 0.0
+
+
+class ScriptScheduler:
+    """
+    Tracks per-user turns of script execution. A turn is a run of script steps from one entry point (script start,
+    user input, or resume). When a turn exceeds its step or wall-clock budget, the script should yield and resume in a
+    later turn so other users are served in between. Each yield is given a resume sequence number; only the latest
+    resume of a user can start a turn, and any other turn cancels a pending resume.
+    """
+    def __init__(self, max_steps: int = 100, max_seconds: float = 0.25, max_loop_steps: int = None):
+        """
+        :param max_steps: script lines executed per turn before yielding
+        :param max_seconds: wall-clock seconds per turn before yielding
+        :param max_loop_steps: script lines executed without input before a repeated state is treated as a loop
+            (default 10 turns of `max_steps`)
+        """
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_loop_steps = max_loop_steps or max_steps * 10
+        self._lock = Lock()
+        self._turns = dict()        # Dict of users to [turn start time, steps this turn]
+        self._resumes = dict()      # Dict of users to the sequence number of their pending resume
+        self._resume_seq = 0
+        self._yield_states = dict()  # Dict of users to set of script states seen at yields since the last input
+        self._input_steps = dict()  # Dict of users to steps in ended turns since the last input
+        self._metrics = dict()      # Dict of users to _UserMetrics
+
+    def start_turn(self, user: str, new_input: bool = False, resume: int = None) -> bool:
+        """
+        Start a turn of execution for a user
+        :param user: user whose script is executing
+        :param new_input: True if the turn is handling new user input (or a new script), which resets loop detection
+        :param resume: sequence number from `yield_turn` if the turn resumes a yielded script
+        :return: False if `resume` is stale (the script exited or continued in another turn) and no turn was started
+        """
+        with self._lock:
+            if resume is not None and self._resumes.get(user) != resume:
+                return False
+            self._resumes.pop(user, None)
+            self._turns[user] = [time.monotonic(), 0]
+            if new_input:
+                self._yield_states.pop(user, None)
+                self._input_steps.pop(user, None)
+            return True
+
+    def in_turn(self, user: str) -> bool:
+        """
+        Check if a turn is running for a user
+        :param user: user whose script is executing
+        :return: True if `start_turn` was called and the turn hasn't ended
+        """
+        return user in self._turns
+
+    def yield_turn(self, user: str) -> int:
+        """
+        Get a sequence number for resuming a user's script after a yield, replacing any pending resume
+        :param user: user whose script is yielding
+        :return: sequence number to pass to `start_turn`
+        """
+        with self._lock:
+            self._resume_seq += 1
+            self._resumes[user] = self._resume_seq
+            return self._resume_seq
+
+    def step(self, user: str) -> bool:
+        """
+        Count a script step for a user. Steps outside a turn started with `start_turn` aren't counted or bounded, since
+        nothing would end the turn and record it.
+        :param user: user whose script is executing
+        :return: True if the step is within the turn budget (or outside a turn), False if the script should yield
+        """
+        turn = self._turns.get(user)
+        if turn is None:
+            return True
+        turn[1] += 1
+        return turn[1] <= self.max_steps and time.monotonic() - turn[0] <= self.max_seconds
+
+    def end_turn(self, user: str):
+        """
+        End a turn of execution and record its metrics
+        :param user: user whose script was executing
+        """
+        with self._lock:
+            turn = self._turns.pop(user, None)
+            if turn is None:
+                return
+            duration = time.monotonic() - turn[0]
+            self._input_steps[user] = self._input_steps.get(user, 0) + turn[1]
+            metrics = self._metrics.setdefault(user, _UserMetrics())
+            metrics.turns += 1
+            metrics.steps += turn[1]
+            metrics.busy_seconds += duration
+            metrics.max_turn_seconds = max(metrics.max_turn_seconds, duration)
+
+    def check_yield(self, user: str, state) -> bool:
+        """
+        Record a yield and check if the script has yielded in this state before without receiving input. Scripts that
+        return to an identical state can never finish. A repeated state is only treated as a loop once the script has
+        executed `max_loop_steps` lines since the last input, so scripts whose steps are slow (i.e. polling another
+        skill) aren't stopped after a few turns.
+        :param user: user whose script is yielding
+        :param state: hashable snapshot of the script position and variables
+        :return: True if the script should continue in a new turn, False if it is repeating itself
+        """
+        with self._lock:
+            metrics = self._metrics.setdefault(user, _UserMetrics())
+            turn = self._turns.get(user)
+            steps = self._input_steps.get(user, 0) + (turn[1] if turn else 0)
+            seen = self._yield_states.setdefault(user, set())
+            if state in seen and steps >= self.max_loop_steps:
+                metrics.aborts += 1
+                return False
+            seen.add(state)
+            metrics.yields += 1
+            return True
+
+    def forget(self, user: str):
+        """
+        Clear turn and loop detection state for a user whose scripts have all exited
+        :param user: user to clear
+        """
+        with self._lock:
+            self._turns.pop(user, None)
+            self._resumes.pop(user, None)
+            self._yield_states.pop(user, None)
+            self._input_steps.pop(user, None)
+
+    def get_metrics(self) -> dict:
+        """
+        Get per-user execution metrics and Jain's fairness index of busy time per turn across users
+        (1.0 when every user's turns take equally long, approaching 1/n when one user dominates)
+        :return: dict of users to metrics, fairness, and totals
+        """
+        with self._lock:
+            users = {user: {"turns": m.turns,
+                            "steps": m.steps,
+                            "yields": m.yields,
+                            "aborts": m.aborts,
+                            "busy_ms": round(m.busy_seconds * 1000, 3),
+                            "mean_turn_ms": round(m.busy_seconds * 1000 / m.turns, 3) if m.turns else 0.0,
+                            "max_turn_ms": round(m.max_turn_seconds * 1000, 3)}
+                     for user, m in self._metrics.items()}
+        turn_times = [u["mean_turn_ms"] for u in users.values() if u["turns"]]
+        squares = sum(t * t for t in turn_times)
+        fairness = (sum(turn_times) ** 2) / (len(turn_times) * squares) if squares else 1.0
+        return {"users": users,
+                "fairness": round(fairness, 4),
+                "max_turn_ms": max((u["max_turn_ms"] for u in users.values()), default=0.0),
+                "steps": sum(u["steps"] for u in users.values()),
+                "yields": sum(u["yields"] for u in users.values()),
+                "aborts": sum(u["aborts"] for u in users.values())}
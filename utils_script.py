@@ -0,0 +1,1225 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Utilities for compiled (.ncs) script data, including a batch precompiler and validator for a scripts directory, which
+also writes each valid script to a container (.ncb) that can be validated from its header and decoded lazily. The
+precompiler is installed with the skill as the `neon-cc-precompile` command:
+
+    neon-cc-precompile script_txt --workers 4
+"""
+import argparse
+import json
+import mmap
+import os
+import pickle
+import re
+import struct
+import sys
+import time
+
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+MANIFEST_FILENAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+# Positional slots of a compiled script tuple
+FORMATTED_SCRIPT, SPEAKER_DATA, VARIABLES, LOOPS, GOTO_TAGS, TIMEOUT, TIMEOUT_ACTION = range(7)
+SCRIPT_META = 9
+
+# Precompiled script container: header, section table, JSON metadata, then independently pickled sections
+CONTAINER_EXT = ".ncb"
+CONTAINER_MAGIC = b"NCSB"
+CONTAINER_VERSION = 1
+_CONTAINER_HEADER = struct.Struct("<4sHHI")  # magic, format version, section count, metadata length
+_CONTAINER_SECTION = struct.Struct("<16sQQ")  # section name, offset, length
+# Container sections by compiled script slot; `source` holds the script text kept in the metadata slot
+CONTAINER_SECTIONS = ("lines", "speaker", "variables", "loops", "tags", "timeout", "timeout_action", "slot_7",
+                      "slot_8")
+# Sections decoded again for every conversation because conversations modify them
+_PER_CONVERSATION_SECTIONS = ("speaker", "variables")
+
+# Commands that open an indented block
+BLOCK_COMMANDS = ("if", "else", "case", "loop")
+
+# Kinds of compiled instructions: skipped lines, runtime commands with and without variable substitution, variable
+# function lines, and lines that failed to compile (raised when executed)
+OP_NOP, OP_RUNTIME, OP_RUNTIME_RAW, OP_VARIABLE, OP_INVALID = range(5)
+
+# `Speak mode:` header value that merges consecutive static speak lines into one emission
+SPEAK_MODE_COALESCE = "coalesce"
+
+# Header commands describing a script, collected into its catalog details
+DETAIL_HEADERS = ("description", "author", "claps", "synonym")
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict for compiled script data shared between conversations. Copies return the same object; use `thaw`
+    to get a mutable copy.
+    """
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("compiled script data is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+def freeze(value):
+    """
+    Convert compiled script data to shared, read-only structures with interned strings
+    :param value: dict, list, or scalar from a compiled script
+    :return: FrozenDict, tuple, or interned/unchanged scalar
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    elif isinstance(value, dict):
+        return value if isinstance(value, FrozenDict) else \
+            FrozenDict((freeze(key), freeze(val)) for key, val in value.items())
+    elif isinstance(value, (list, tuple)):
+        return tuple(freeze(val) for val in value)
+    return value
+
+
+def thaw(value):
+    """
+    Get a mutable copy of frozen compiled script data
+    :param value: FrozenDict, tuple, or scalar
+    :return: dict, list, or unchanged scalar
+    """
+    if isinstance(value, dict):
+        return {key: thaw(val) for key, val in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [thaw(val) for val in value]
+    return value
+
+
+class LineData(Mapping):
+    """
+    Read-only parser data of a script line for one execution step. Values with variables substituted for the step are
+    held in an overlay in front of the shared line data, which is never copied or modified.
+    """
+    __slots__ = ("data", "overlay")
+
+    def __init__(self, data: Mapping, overlay: dict = None):
+        """
+        :param data: line parser data (FrozenDict)
+        :param overlay: dict of keys to values replacing those in `data` for this step
+        """
+        self.data = data
+        self.overlay = overlay or {}
+
+    def __getitem__(self, key):
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.data[key]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f"LineData({dict(self)})"
+
+
+def load_compiled_script(path: str):
+    """
+    Load a compiled script file
+    :param path: path to .ncs file
+    :return: compiled script tuple
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def read_compiled_script(path: str) -> (tuple, tuple):
+    """
+    Load a compiled script file along with a key identifying the version of the file that was read
+    :param path: path to .ncs file
+    :return: compiled script tuple (empty dict if the file doesn't exist), (path, size, mtime_ns) key (else None)
+    """
+    try:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            return pickle.load(f), (path, stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        return dict(), None
+
+
+def write_container(path: str, cache, source_path: str = None):
+    """
+    Write compiled script data to a container file
+    :param path: container path to write
+    :param cache: compiled script tuple
+    :param source_path: compiled script file the data was loaded from, used to detect when the container is outdated
+    """
+    meta = dict(cache[SCRIPT_META] or {})
+    sections = [pickle.dumps(cache[slot], protocol=pickle.HIGHEST_PROTOCOL) for slot in range(len(CONTAINER_SECTIONS))]
+    sections.append(pickle.dumps(meta.pop("raw_file", None), protocol=pickle.HIGHEST_PROTOCOL))
+    names = CONTAINER_SECTIONS + ("source",)
+    meta["lines"] = len(cache[FORMATTED_SCRIPT] or [])
+    meta["details"] = get_script_details(cache[FORMATTED_SCRIPT], cache[SCRIPT_META])
+    if source_path:
+        stat = os.stat(source_path)
+        meta["source"] = {"file": os.path.basename(source_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    meta = json.dumps(meta, default=str).encode()
+
+    offset = _CONTAINER_HEADER.size + _CONTAINER_SECTION.size * len(sections) + len(meta)
+    table = []
+    for name, data in zip(names, sections):
+        table.append(_CONTAINER_SECTION.pack(name.encode(), offset, len(data)))
+        offset += len(data)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, len(sections), len(meta)))
+        f.write(b"".join(table))
+        f.write(meta)
+        for data in sections:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _parse_container_header(read) -> (dict, dict):
+    """
+    Parse the header, section table, and metadata of a container
+    :param read: function reading the next n bytes
+    :return: metadata dict, dict of section names to (offset, length)
+    """
+    header = read(_CONTAINER_HEADER.size)
+    if len(header) < _CONTAINER_HEADER.size:
+        raise ValueError("container header is truncated")
+    magic, version, count, meta_length = _CONTAINER_HEADER.unpack(header)
+    if magic != CONTAINER_MAGIC:
+        raise ValueError("not a compiled script container")
+    if version != CONTAINER_VERSION:
+        raise ValueError(f"unsupported container version {version}")
+    table = read(_CONTAINER_SECTION.size * count)
+    meta = read(meta_length)
+    if len(table) < _CONTAINER_SECTION.size * count or len(meta) < meta_length:
+        raise ValueError("container header is truncated")
+    sections = dict()
+    for idx in range(count):
+        name, offset, length = _CONTAINER_SECTION.unpack_from(table, idx * _CONTAINER_SECTION.size)
+        sections[name.rstrip(b"\0").decode()] = (offset, length)
+    return json.loads(meta), sections
+
+
+def read_container_header(path: str) -> dict:
+    """
+    Read the metadata of a container without reading any sections
+    :param path: container path
+    :return: script metadata (compiler version, title, author, description, line count, details, source file)
+    """
+    with open(path, "rb") as f:
+        meta, _ = _parse_container_header(f.read)
+    return meta
+
+
+class ScriptContainer:
+    """
+    Memory-mapped container of one compiled script. Only the header is read when opened; sections are decoded on
+    first use and shared, except those conversations modify, which are decoded for each conversation.
+    """
+    def __init__(self, path: str):
+        """
+        :param path: container path
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.key = (stat.st_size, stat.st_mtime_ns)  # Version of the file that was mapped
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.meta, self.sections = _parse_container_header(self._map.read)
+        self._decoded = dict()
+        self._lock = Lock()
+
+    def validate(self) -> list:
+        """
+        Check the container header describes an executable script, without decoding any sections
+        :return: list of errors
+        """
+        errors = []
+        if not self.meta.get("cversion"):
+            errors.append("missing compiler version")
+        if not self.meta.get("lines"):
+            errors.append("script has no lines")
+        for name in CONTAINER_SECTIONS:
+            if name not in self.sections:
+                errors.append(f"missing {name} section")
+        for name, (offset, length) in self.sections.items():
+            if offset + length > len(self._map):
+                errors.append(f"{name} section is truncated")
+        return errors
+
+    def _decode(self, name: str):
+        offset, length = self.sections[name]
+        return pickle.loads(self._map[offset:offset + length])
+
+    def section(self, name: str):
+        """
+        Get a decoded section, decoding it on first use
+        :param name: section name
+        :return: section data
+        """
+        if name in _PER_CONVERSATION_SECTIONS:
+            return self._decode(name)
+        if name not in self._decoded:
+            with self._lock:
+                if name not in self._decoded:
+                    self._decoded[name] = self._decode(name)
+        return self._decoded[name]
+
+    def is_current(self, source_path: str) -> bool:
+        """
+        Check the container was written from the compiled script file currently on disk
+        :param source_path: compiled script path
+        :return: True if the file matches the container, False if it changed or was removed
+        """
+        source = self.meta.get("source") or {}
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return False
+        return stat.st_size == source.get("size") and stat.st_mtime_ns == source.get("mtime_ns")
+
+    def to_cache(self) -> tuple:
+        """
+        Get the compiled script tuple stored in this container
+        :return: compiled script tuple, as loaded from a compiled script file
+        """
+        meta = {key: val for key, val in self.meta.items() if key not in ("lines", "details", "source")}
+        if "source" in self.sections:
+            meta["raw_file"] = self.section("source")
+        return tuple(self.section(name) for name in CONTAINER_SECTIONS) + (meta,)
+
+    def close(self):
+        self._map.close()
+
+
+_containers = dict()  # Dict of container paths to ((size, mtime_ns), ScriptContainer), per process
+_containers_lock = Lock()
+
+
+def load_container(path: str) -> ScriptContainer:
+    """
+    Get the container at a path, opening it again only if the file changed since it was last opened in this process.
+    A replaced container is closed, so callers must not use a container after the file may have changed.
+    :param path: container path
+    :return: ScriptContainer
+    """
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    with _containers_lock:
+        cached = _containers.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        container = ScriptContainer(path)
+        _containers[path] = (container.key, container)
+    if cached:
+        cached[1].close()
+    return container
+
+
+def evict_container(path: str):
+    """
+    Close and forget the container at a path, i.e. when its compiled script was removed
+    :param path: container path
+    """
+    with _containers_lock:
+        cached = _containers.pop(path, None)
+    if cached:
+        cached[1].close()
+
+
+def get_current_container(directory: str, filename: str):
+    """
+    Get the container for a compiled script if it is up to date
+    :param directory: scripts directory
+    :param filename: compiled script filename
+    :return: ScriptContainer, else None if there is no valid container for the file on disk
+    """
+    path = os.path.join(directory, os.path.splitext(filename)[0] + CONTAINER_EXT)
+    source_path = os.path.join(directory, filename)
+    if not os.path.isfile(source_path):
+        # A container left behind by a removed script is never served
+        evict_container(path)
+        return None
+    try:
+        container = load_container(path)
+    except (OSError, ValueError):
+        return None
+    return container if container.is_current(source_path) else None
+
+
+def validate_compiled_script(cache) -> (list, list):
+    """
+    Check that compiled script data can be executed
+    :param cache: compiled script tuple
+    :return: list of errors, list of warnings
+    """
+    errors, warnings = [], []
+    if not isinstance(cache, (tuple, list)) or len(cache) <= SCRIPT_META:
+        return ["compiled data is not a script tuple"], warnings
+    meta = cache[SCRIPT_META]
+    if not isinstance(meta, dict) or not meta.get("cversion"):
+        errors.append("missing compiler version")
+    for slot, name in ((SPEAKER_DATA, "speaker data"), (VARIABLES, "variables"),
+                       (LOOPS, "loops"), (GOTO_TAGS, "tags")):
+        if not isinstance(cache[slot] or {}, dict):
+            errors.append(f"{name} is not a dict")
+    lines = cache[FORMATTED_SCRIPT]
+    if not isinstance(lines, (list, tuple)) or not lines:
+        errors.append("script has no lines")
+        return errors, warnings
+    for idx, line in enumerate(lines):
+        if not isinstance(line, dict) or any(key not in line for key in ("command", "text", "indent", "line_number")):
+            errors.append(f"malformed line at index {idx}")
+    if errors:
+        return errors, warnings
+
+    line_numbers = {int(line["line_number"]) for line in lines}
+    for name, loop in (cache[LOOPS] or {}).items():
+        for key in ("start", "end"):
+            if not str(loop.get(key)).isnumeric() or int(loop[key]) not in line_numbers:
+                errors.append(f"loop {name} has no valid {key} line")
+    for tag, line_number in (cache[GOTO_TAGS] or {}).items():
+        if not str(line_number).isnumeric() or int(line_number) not in line_numbers:
+            errors.append(f"tag {tag} points to missing line {line_number}")
+    for idx, line in enumerate(lines):
+        command = line["command"]
+        if command == "goto":
+            destination = (line.get("data") or {}).get("destination") or str(line["text"]).strip()
+            if destination not in (cache[GOTO_TAGS] or {}) and \
+                    not (str(destination).isnumeric() and int(destination) in line_numbers):
+                errors.append(f"line {line['line_number']}: goto destination {destination} not found")
+        elif command in ("if", "else", "case"):
+            if idx + 1 >= len(lines) or lines[idx + 1]["indent"] <= line["indent"]:
+                warnings.append(f"line {line['line_number']}: {command} block is empty")
+    if lines[-1]["command"] != "exit":
+        warnings.append("script does not end with Exit")
+    return errors, warnings
+
+
+def build_script_index(cache) -> dict:
+    """
+    Build JSON-serializable indexes of formatted_script positions for a compiled script
+    :param cache: compiled script tuple
+    :return: dict of tags, loops, and conditional blocks keyed by formatted_script index
+    """
+    lines = cache[FORMATTED_SCRIPT]
+    index_of_line = {int(line["line_number"]): idx for idx, line in enumerate(lines)}
+    tags = {tag: index_of_line.get(int(line_number)) for tag, line_number in (cache[GOTO_TAGS] or {}).items()}
+    loops = {name: [index_of_line.get(int(loop["start"])), index_of_line.get(int(loop["end"]))]
+             for name, loop in (cache[LOOPS] or {}).items()}
+    conditions = []
+    for idx, line in enumerate(lines):
+        if line["command"] in BLOCK_COMMANDS and line["command"] != "loop":
+            end = idx + 1
+            while end < len(lines) and lines[end]["indent"] > line["indent"]:
+                end += 1
+            conditions.append([idx, line["command"], end])
+    return {"tags": tags, "loops": loops, "conditions": conditions}
+
+
+class LoopIntervals:
+    """
+    Interval index of loop ranges over formatted_script indexes. Loops are properly nested, so the innermost loop
+    containing an index is constant between loop boundaries and each lookup is a binary search over those boundaries.
+    """
+    def __init__(self, loops: dict):
+        """
+        :param loops: dict of loop name to (start index, end index)
+        """
+        self.loops = dict()
+        events = []
+        for name, (start, end) in loops.items():
+            if start is None or end is None or end <= start:
+                continue
+            self.loops[name] = (start, end)
+            # A loop contains the indexes strictly between its start and end lines
+            events.append((start + 1, 1, name))
+            events.append((end, 0, name))
+        # Close loops before opening any that start at the same index
+        events.sort()
+
+        self._bounds = []
+        self._owners = []
+        stack = []
+        for position, is_open, name in events:
+            if is_open:
+                stack.append(name)
+            elif name in stack:
+                stack.remove(name)
+            owner = stack[-1] if stack else None
+            if self._bounds and self._bounds[-1] == position:
+                self._owners[-1] = owner
+            else:
+                self._bounds.append(position)
+                self._owners.append(owner)
+
+    def innermost(self, index: int):
+        """
+        Get the innermost loop containing a formatted_script index
+        :param index: formatted_script index
+        :return: (loop name, start index, end index), else None if index is not in a loop
+        """
+        position = bisect_right(self._bounds, index) - 1
+        if position < 0 or self._owners[position] is None:
+            return None
+        name = self._owners[position]
+        return (name, *self.loops[name])
+
+
+class ScriptIndex:
+    """
+    Read-only script data and derived indexes for one compiled script, built once at load and shared (never copied)
+    by every conversation running that script
+    """
+    def __init__(self, formatted_script: list, loops_dict: dict, goto_tags: dict = None, script_meta: dict = None):
+        """
+        :param formatted_script: list of script line dicts
+        :param loops_dict: dict of loop names to loop data with start and end line numbers
+        :param goto_tags: dict of tag names to line numbers
+        :param script_meta: parser metadata for the script
+        """
+        formatted_script = self.formatted_script = freeze(formatted_script)
+        self.loops_dict = freeze(loops_dict or {})
+        self.goto_tags = freeze(goto_tags or {})
+        self.index_of_line = {int(line["line_number"]): idx for idx, line in enumerate(formatted_script)}
+        self.loops = LoopIntervals({name: (self.get_index(loop.get("start")), self.get_index(loop.get("end")))
+                                    for name, loop in (loops_dict or {}).items()})
+        self.case_tables = {idx: self._build_case_table(idx) for idx, line in enumerate(formatted_script)
+                            if line["command"] == "case"}
+
+        # Index of the first line after each line's indented block
+        self.block_end = [len(formatted_script)] * len(formatted_script)
+        stack = []
+        for idx, line in enumerate(formatted_script):
+            while stack and formatted_script[stack[-1]]["indent"] >= line["indent"]:
+                self.block_end[stack.pop()] = idx
+            stack.append(idx)
+        # Index to continue from when an if condition is false
+        self.if_false_index = {idx: self._find_if_false_index(idx) for idx, line in enumerate(formatted_script)
+                               if line["command"] == "if"}
+        # Index to continue from when a case option line is reached from inside the previous option
+        self.case_exits = dict()
+        for idx, line in enumerate(formatted_script):
+            case_exit = self._find_case_exit(idx)
+            if case_exit is not None:
+                self.case_exits[idx] = case_exit
+        # Index after the last line that can be spoken together with each static speak line (runs of 2+ lines only)
+        self.coalesce_speak = get_speak_mode(formatted_script, script_meta) == SPEAK_MODE_COALESCE
+        self.speak_runs = self._find_speak_runs() if self.coalesce_speak else dict()
+        # Index of each loop's start line by the index of its end line
+        self._loop_starts = {end: start for start, end in self.loops.loops.values()}
+        self._lookahead = dict()  # Dict of (index, limit) to lines reachable before a wait, built as requested
+        self.instructions = ()  # Instruction per line, set by `compile_instructions`
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def get_index(self, line_number):
+        """
+        Get the formatted_script index of a script line number
+        :param line_number: line number in the script file
+        :return: formatted_script index, else None if there is no such line
+        """
+        if not str(line_number).isnumeric():
+            return None
+        return self.index_of_line.get(int(line_number))
+
+    @staticmethod
+    def case_options(text) -> list:
+        """
+        Parse the options matched by a case option line
+        :param text: case option line text, i.e. `"A or Athens"`
+        :return: list of option strings
+        """
+        return str(text).lower().rstrip('\n').strip('"').split(" or ")
+
+    def _build_case_table(self, case_index: int) -> (dict, int):
+        """
+        Build the dispatch table for a case statement. Options are the lines indented one level under the case; each
+        maps to the first line of its branch (the first option listed wins)
+        :param case_index: formatted_script index of the case line
+        :return: dict of option string to branch start index, index of the first line after the case block
+        """
+        case_indent = self.formatted_script[case_index]["indent"]
+        table = dict()
+        idx = case_index + 1
+        while idx < len(self.formatted_script) and self.formatted_script[idx]["indent"] > case_indent:
+            line = self.formatted_script[idx]
+            if line["indent"] == case_indent + 1:
+                for option in self.case_options(line["text"]):
+                    table.setdefault(option, idx + 1)
+            idx += 1
+        return table, idx
+
+    def _find_if_false_index(self, if_index: int) -> int:
+        """
+        Find where execution continues when an if condition is false: the line after an else at the same indent,
+        else the next line at or outside the if indent that isn't a comment
+        :param if_index: formatted_script index of the if line
+        :return: formatted_script index (length of formatted_script if there is no such line)
+        """
+        if_indent = self.formatted_script[if_index]["indent"]
+        for idx in range(if_index + 1, len(self.formatted_script)):
+            line = self.formatted_script[idx]
+            if line["command"] == "else" and line["indent"] == if_indent:
+                return idx + 1
+            elif line["indent"] <= if_indent and line["command"]:
+                return idx
+        return len(self.formatted_script)
+
+    def _find_case_exit(self, index: int):
+        """
+        Find where execution continues if a line is reached by outdenting from a case option, which ends that option
+        :param index: formatted_script index of a line
+        :return: index of the first line after the enclosing case block, else None if the line should be executed
+        """
+        line = self.formatted_script[index]
+        for parent_indent in reversed(line.get("parent_case_indents") or []):
+            if line["indent"] == parent_indent + 1:
+                end = self.block_end[index]
+                while end < len(self.formatted_script) and self.formatted_script[end]["indent"] > parent_indent:
+                    end = self.block_end[end]
+                return end
+            elif line["indent"] > parent_indent + 1:
+                return None
+        return None
+
+    @staticmethod
+    def is_static_speak(line) -> bool:
+        """
+        Check if a line is spoken by Neon with text known at compile time
+        :param line: script line dict
+        :return: True if the line is a `Neon speak` phrase without variables
+        """
+        if line["command"] not in ("neon speak", "speak"):
+            return False
+        data = line.get("data") or {}
+        phrase = data.get("phrase")
+        return data.get("name") == "Neon" and isinstance(phrase, str) and "{" not in phrase and \
+            bool(phrase.strip().strip('"')) and not phrase.lower().endswith("speak:")
+
+    def _find_speak_runs(self) -> dict:
+        """
+        Find runs of consecutive static speak lines at the same indent, which can be spoken as one emission
+        :return: dict of formatted_script index to the index after the end of its run
+        """
+        runs = dict()
+        idx = 0
+        while idx < len(self.formatted_script):
+            end = idx
+            while end < len(self.formatted_script) and self.is_static_speak(self.formatted_script[end]) and \
+                    self.formatted_script[end]["indent"] == self.formatted_script[idx]["indent"]:
+                end += 1
+            for start in range(idx, end - 1):
+                runs[start] = end
+            idx = max(end, idx + 1)
+        return runs
+
+    @staticmethod
+    def is_wait_point(line) -> bool:
+        """
+        Check if execution stops at a line to wait for user input
+        :param line: script line dict
+        :return: True if the line requests voice input
+        """
+        return line["command"] == "voice_input" or "voice_input(" in str(line["text"])
+
+    def successors(self, index: int) -> list:
+        """
+        Get the lines execution may continue at after a line, regardless of variable values
+        :param index: formatted_script index
+        :return: list of formatted_script indexes (the length of formatted_script for the end of the script)
+        """
+        line = self.formatted_script[index]
+        command = line["command"]
+        if command == "exit":
+            return []
+        elif command == "goto":
+            destination = (line.get("data") or {}).get("destination") or line["text"]
+            target = self.get_index(self.goto_tags.get(destination, destination))
+            return [target] if target is not None else []
+        elif command == "if":
+            return [index + 1, self.if_false_index[index]]
+        elif command == "else":
+            return [self.block_end[index]]
+        elif command == "case":
+            table, end = self.case_tables[index]
+            return sorted(set(table.values())) + [end]
+        elif index in self._loop_starts:
+            return [index + 1, self._loop_starts[index]]
+        return [self.case_exits.get(index + 1, index + 1)]
+
+    def lookahead(self, index: int, limit: int = 64) -> tuple:
+        """
+        Find the lines that may execute from an index before the script next waits for input, in any branch
+        :param index: formatted_script index execution continues from
+        :param limit: maximum number of lines to return
+        :return: tuple of formatted_script indexes in breadth-first order, excluding wait points
+        """
+        if (index, limit) not in self._lookahead:
+            found = []
+            seen = {index}
+            queue = deque([index])
+            while queue and len(found) < limit:
+                idx = queue.popleft()
+                if idx >= len(self.formatted_script) or self.is_wait_point(self.formatted_script[idx]):
+                    continue
+                found.append(idx)
+                for successor in self.successors(idx):
+                    if successor not in seen:
+                        seen.add(successor)
+                        queue.append(successor)
+            self._lookahead[(index, limit)] = tuple(found)
+        return self._lookahead[(index, limit)]
+
+    def compile_instructions(self, runtime_commands, variable_commands, raw_commands=(), string_comparators=()):
+        """
+        Compile every line to an instruction so execution dispatches on integers instead of command strings.
+        Instructions are tuples of (kind, opcode, operand, extra):
+            OP_RUNTIME/OP_RUNTIME_RAW: opcode of the command, line text (normalized for if lines), tuple of parser data
+                keys with variables to substitute (OP_RUNTIME only)
+            OP_VARIABLE: opcode of the variable function, variable key (None if missing), True if the key used braces
+            OP_INVALID: -1, exception raised compiling the line, ()
+            OP_NOP: lines that are skipped
+        :param runtime_commands: runtime commands in opcode order, starting at 0
+        :param variable_commands: variable function commands in opcode order, following `runtime_commands`
+        :param raw_commands: runtime commands executed without substituting variables in their text
+        :param string_comparators: if line comparators that are normalized to upper case
+        :return: tuple of instructions by formatted_script index
+        """
+        opcodes = {command: op for op, command in enumerate(list(runtime_commands) + list(variable_commands))}
+        instructions = []
+        for line in self.formatted_script:
+            command, text = line["command"], line["text"]
+            if command in runtime_commands:
+                if command in raw_commands:
+                    instructions.append((OP_RUNTIME_RAW, opcodes[command], text, ()))
+                    continue
+                if command == "if":
+                    try:
+                        text = normalize_condition(text, string_comparators)
+                    except ValueError as e:
+                        instructions.append((OP_INVALID, -1, e, ()))
+                        continue
+                data = line.get("data") or {}
+                keys = () if command == "variable" else \
+                    tuple(key for key, val in data.items() if val and isinstance(val, str) and "{" in val and "}" in val)
+                instructions.append((OP_RUNTIME, opcodes[command], text, keys))
+            elif command in variable_commands:
+                if '{' in text and '}' in text:
+                    instructions.append((OP_VARIABLE, opcodes[command], str(text).split('{')[1].split('}')[0], True))
+                elif '(' in text and ')' in text:
+                    instructions.append((OP_VARIABLE, opcodes[command], str(text).split('(')[1].split(')')[0], False))
+                else:
+                    instructions.append((OP_VARIABLE, opcodes[command], None, False))
+            else:
+                instructions.append((OP_NOP, -1, text, ()))
+        self.instructions = tuple(instructions)
+        return self.instructions
+
+    def case_branch(self, case_index: int, value):
+        """
+        Get the branch of a case statement matching a value
+        :param case_index: formatted_script index of the case line
+        :param value: value of the case variable
+        :return: formatted_script index of the first line of the matched branch, else None if no option matches
+        """
+        table, _ = self.case_tables[case_index]
+        return table.get(value)
+
+    def loop_exit(self, index: int):
+        """
+        Get where execution continues when exiting the innermost loop containing an index
+        :param index: formatted_script index
+        :return: (index after the loop end, indent of the loop end), else None if index is not in a loop
+        """
+        loop = self.loops.innermost(index)
+        if not loop:
+            return None
+        end = loop[2]
+        return end + 1, self.formatted_script[end]["indent"]
+
+
+class ScriptIndexCache:
+    """
+    Shared ScriptIndex per script, rebuilt when the compiled script file it was built from changes. An index is only
+    returned for the script lines it was built from, so line numbers and loop and tag indexes always match.
+    """
+    def __init__(self, build):
+        """
+        :param build: function building a ScriptIndex from compiled script data
+        """
+        self._build = build
+        self._indexes = dict()  # Dict of script filenames to (key of the compiled data read, script lines, ScriptIndex)
+        self._lock = Lock()
+
+    def get(self, name: str, cache, key) -> ScriptIndex:
+        """
+        Get the index for compiled script data, building it if the cached index was built from another read
+        :param name: script filename (without extension)
+        :param cache: compiled script data
+        :param key: key identifying the file version `cache` was read from, else None to build an uncached index
+        :return: ScriptIndex built from `cache`
+        """
+        with self._lock:
+            cached = self._indexes.get(name)
+        # Files rewritten within the same mtime tick keep their key, so the lines are compared too (by identity for
+        # lines shared by a container, else by value)
+        if key is not None and cached and cached[0] == key and \
+                (cached[1] is cache[FORMATTED_SCRIPT] or cached[1] == cache[FORMATTED_SCRIPT]):
+            return cached[2]
+        script_index = self._build(cache)
+        if key is not None:
+            with self._lock:
+                self._indexes[name] = (key, cache[FORMATTED_SCRIPT], script_index)
+        return script_index
+
+    def discard(self, name: str):
+        """
+        Drop the index for a script that changed
+        :param name: script filename (without extension)
+        """
+        with self._lock:
+            self._indexes.pop(name, None)
+
+
+def normalize_condition(text: str, string_comparators=()) -> str:
+    """
+    Capitalize the string comparator in an if line and make sure the right value of the comparison is a list,
+    i.e. `{a} in {b}` becomes `{a} IN {b[*]}`
+    :param text: if line text
+    :param string_comparators: upper case string comparators, i.e. ("IN", "CONTAINS")
+    :return: normalized if line text
+    """
+    left, right, comparison = None, None, ""
+    for comparator in string_comparators:
+        if comparator.lower() in text.lower().split():
+            comparison = comparator
+            text = re.sub(f" {comparator.lower()} ", f" {comparator} ", text)
+            left, right = text.split(f" {comparator} ", 1)
+            break  # Only one comparator should be in a line
+        elif f"!{comparator.lower()}" in text.lower().split():
+            comparison = f"!{comparator}"
+            text = re.sub(f" !{comparator.lower()} ", f" !{comparator} ", text)
+            left, right = text.split(f" !{comparator} ", 1)
+            break  # Only one comparator should be in a line
+
+    # Make sure right value is a list for IN/!IN
+    if left and right and "[" not in right:
+        right = re.sub("}", "[*]}", right)
+        text = f" {comparison} ".join([left, right])
+    return text
+
+
+def get_speak_mode(formatted_script, script_meta: dict = None) -> str:
+    """
+    Get the speak mode declared in a script header, i.e. `Speak mode: coalesce`
+    :param formatted_script: list of script line dicts
+    :param script_meta: parser metadata for the script
+    :return: lowercase speak mode, else empty string if not declared
+    """
+    mode = script_meta.get("speak_mode") if isinstance(script_meta, dict) else None
+    if not mode:
+        for line in formatted_script:
+            text = str(line.get("text", "")).strip()
+            if line["indent"] == 0 and text.lower().startswith("speak mode:"):
+                mode = text.split(":", 1)[1]
+                break
+    return str(mode or "").strip().strip('"').lower()
+
+
+def get_script_details(formatted_script, script_meta: dict = None) -> dict:
+    """
+    Get the details a script declares about itself in its header and parser metadata
+    :param formatted_script: list of script line dicts
+    :param script_meta: parser metadata for the script
+    :return: dict of title, description, author, synonyms (list of phrases), and claps (list of declarations)
+    """
+    script_meta = script_meta if isinstance(script_meta, dict) else {}
+    details = {"title": script_meta.get("title"), "description": script_meta.get("description") or "",
+               "author": script_meta.get("author"), "synonyms": [], "claps": []}
+    for line in formatted_script or ():
+        command = line.get("command")
+        if command not in DETAIL_HEADERS or line.get("indent"):
+            continue
+        value = str(line.get("text", ""))
+        if ":" in value:
+            value = value.split(":", 1)[1]
+        value = value.strip()
+        if command == "synonym":
+            phrases = re.findall(r'"([^"]+)"', value) or value.split(",")
+            details["synonyms"].extend(p.strip() for p in phrases if p.strip())
+        elif command == "claps":
+            details["claps"].append(value)
+        elif not details[command]:
+            details[command] = value.strip('"')
+    return details
+
+
+def normalize_synonym(phrase: str) -> str:
+    """
+    Normalize a spoken phrase for synonym lookup; unlike recording lookup, apostrophes separate words
+    :param phrase: phrase or utterance
+    :return: lowercase words separated by single spaces
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", str(phrase).lower()).split())
+
+
+def _get_script_parser():
+    """
+    Get the optional script parser used to compile .nct text scripts
+    :return: ScriptParser instance, else None if the parser isn't installed
+    """
+    try:
+        from script_parser import ScriptParser
+        return ScriptParser()
+    except ImportError:
+        return None
+
+
+def precompile_file(path: str) -> dict:
+    """
+    Compile (if a text script) and validate a single script file
+    :param path: path to .nct or .ncs script
+    :return: manifest entry for the compiled script
+    """
+    entry = {"source": os.path.basename(path), "errors": [], "warnings": [], "compile_ms": 0.0, "validate_ms": 0.0}
+    start = time.perf_counter()
+    compiled_path = path
+    if path.endswith(".nct"):
+        parser = _get_script_parser()
+        try:
+            if not parser:
+                entry["errors"].append("script parser is not installed")
+                return entry
+            compiled_path = parser.parse_script_to_file(path)
+        except Exception as e:
+            entry["errors"].append(f"parse failed: {e}")
+            return entry
+        finally:
+            entry["compile_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    start = time.perf_counter()
+    try:
+        cache = load_compiled_script(compiled_path)
+        entry["errors"], entry["warnings"] = validate_compiled_script(cache)
+        if not entry["errors"]:
+            entry["index"] = build_script_index(cache)
+            entry["lines"] = len(cache[FORMATTED_SCRIPT])
+            entry["details"] = get_script_details(cache[FORMATTED_SCRIPT], cache[SCRIPT_META])
+            container_path = os.path.splitext(compiled_path)[0] + CONTAINER_EXT
+            try:
+                write_container(container_path, cache, compiled_path)
+                entry["container"] = os.path.basename(container_path)
+            except Exception as e:
+                entry["warnings"].append(f"container not written: {e}")
+    except Exception as e:
+        entry["errors"].append(f"load failed: {e}")
+    entry["validate_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    if os.path.isfile(compiled_path):
+        stat = os.stat(compiled_path)
+        entry.update({"file": os.path.basename(compiled_path), "size": stat.st_size, "mtime": stat.st_mtime})
+    return entry
+
+
+def find_script_files(directory: str) -> list:
+    """
+    Find scripts to precompile; text scripts are skipped when an up-to-date compiled script exists
+    :param directory: scripts directory
+    :return: list of script paths
+    """
+    files = [f for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
+    to_compile = []
+    for f in sorted(files):
+        name, ext = os.path.splitext(f)
+        path = os.path.join(directory, f)
+        if ext == ".ncs":
+            to_compile.append(path)
+        elif ext == ".nct":
+            compiled = os.path.join(directory, f"{name}.ncs")
+            if not os.path.isfile(compiled) or os.path.getmtime(compiled) < os.path.getmtime(path):
+                to_compile.append(path)
+    # A text script is compiled to `.ncs`, so drop the stale compiled file from the same run
+    return [p for p in to_compile
+            if not (p.endswith(".ncs") and f"{os.path.splitext(p)[0]}.nct" in to_compile)]
+
+
+def precompile_directory(directory: str, workers: int = None, manifest_path: str = None) -> dict:
+    """
+    Compile and validate every script in a directory in parallel and write a manifest of the results
+    :param directory: scripts directory
+    :param workers: number of worker processes (default CPU count)
+    :param manifest_path: path to write manifest to (default `MANIFEST_FILENAME` in `directory`)
+    :return: manifest dict
+    """
+    start = time.perf_counter()
+    paths = find_script_files(directory)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        entries = list(executor.map(precompile_file, paths))
+    scripts = dict()
+    for entry in entries:
+        name = os.path.splitext(entry.get("file") or entry["source"])[0]
+        scripts[name] = entry
+    manifest = {"version": MANIFEST_VERSION,
+                "generated": time.time(),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+                "errors": sum(1 for entry in entries if entry["errors"]),
+                "scripts": scripts}
+    manifest_path = manifest_path or os.path.join(directory, MANIFEST_FILENAME)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def load_manifest(directory: str) -> dict:
+    """
+    Load a precompile manifest
+    :param directory: scripts directory
+    :return: manifest dict, else an empty dict if there is no valid manifest
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_FILENAME)) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return dict()
+
+
+def get_manifest_entry(manifest: dict, directory: str, filename: str):
+    """
+    Get the manifest entry for a compiled script if it describes the file currently on disk
+    :param manifest: manifest dict
+    :param directory: scripts directory
+    :param filename: compiled script filename
+    :return: manifest entry, else None if the script hasn't been precompiled since it last changed
+    """
+    entry = manifest.get("scripts", {}).get(os.path.splitext(filename)[0])
+    if not entry or entry.get("file") != filename:
+        return None
+    try:
+        stat = os.stat(os.path.join(directory, filename))
+    except OSError:
+        return None
+    if stat.st_size != entry.get("size") or stat.st_mtime != entry.get("mtime"):
+        return None
+    return entry
+
+
+class ScriptCatalog:
+    """
+    Details of the compiled scripts in a directory, with an index of synonym phrases to script names. Details come from
+    the precompile manifest or container headers where those are current, so only scripts whose size or modification
+    time changed are decoded again.
+    """
+    def __init__(self, directory: str, file_ext: str = ".ncs"):
+        """
+        :param directory: scripts directory
+        :param file_ext: compiled script extension
+        """
+        self.directory = directory
+        self.file_ext = file_ext
+        self._scripts = dict()  # Dict of script names to ((size, mtime_ns), details)
+        self._synonyms = dict()  # Dict of normalized synonyms to script names
+        self._synonym_trie = dict()  # Nested dicts of synonym words; `None` keys hold script names
+        self._lock = Lock()
+
+    def invalidate(self):
+        """
+        Read every script again on the next refresh, i.e. after scripts were replaced without changing size or mtime
+        """
+        with self._lock:
+            self._scripts = {name: (None, details) for name, (_, details) in self._scripts.items()}
+
+    def refresh(self) -> bool:
+        """
+        Update the catalog with scripts added, removed, or changed since it was last read. Each script is compared by
+        its own size and mtime, so scripts edited in place (which leave the directory mtime unchanged) are picked up.
+        :return: True if any script was added, changed, or removed
+        """
+        with self._lock:
+            files = dict()
+            try:
+                with os.scandir(self.directory) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(self.file_ext):
+                            continue
+                        try:
+                            if entry.is_file():
+                                file_stat = entry.stat()
+                                files[entry.name[:-len(self.file_ext)]] = (file_stat.st_size,
+                                                                           file_stat.st_mtime_ns)
+                        except FileNotFoundError:
+                            pass  # Removed while listing
+            except FileNotFoundError:
+                pass
+            scripts = {name: self._scripts[name] for name, key in files.items()
+                       if name in self._scripts and self._scripts[name][0] == key}
+            changed = len(scripts) != len(self._scripts) or len(scripts) != len(files)
+            manifest = load_manifest(self.directory) if len(scripts) != len(files) else dict()
+            for name, key in files.items():
+                if name not in scripts:
+                    details = self._read_details(manifest, name + self.file_ext)
+                    if details is not None:
+                        scripts[name] = (key, details)
+            if changed:
+                self._scripts = scripts
+                self._index_synonyms()
+            return changed
+
+    def _read_details(self, manifest: dict, filename: str):
+        """
+        Read the details of one compiled script, decoding the script only if there is no current manifest entry or
+        container describing it
+        :param manifest: precompile manifest for the directory
+        :param filename: compiled script filename
+        :return: script details, else None if the script can't be read
+        """
+        entry = get_manifest_entry(manifest, self.directory, filename)
+        if entry and "details" in entry:
+            return entry["details"]
+        container = get_current_container(self.directory, filename)
+        if container and "details" in container.meta:
+            return container.meta["details"]
+        try:
+            cache = load_compiled_script(os.path.join(self.directory, filename))
+            return get_script_details(cache[FORMATTED_SCRIPT], cache[SCRIPT_META])
+        except Exception:
+            return None
+
+    def _index_synonyms(self):
+        synonyms, trie = dict(), dict()
+        for name in sorted(self._scripts):
+            for phrase in self._scripts[name][1]["synonyms"]:
+                phrase = normalize_synonym(phrase)
+                if not phrase or phrase in synonyms:
+                    continue
+                synonyms[phrase] = name
+                node = trie
+                for word in phrase.split():
+                    node = node.setdefault(word, dict())
+                node[None] = name
+        self._synonyms, self._synonym_trie = synonyms, trie
+
+    @property
+    def names(self) -> list:
+        """
+        Sorted names of catalogued scripts
+        """
+        return sorted(self._scripts)
+
+    @property
+    def synonyms(self) -> dict:
+        """
+        Dict of normalized synonym phrases to script names
+        """
+        return dict(self._synonyms)
+
+    def get_details(self, name: str):
+        """
+        Get the details of a script
+        :param name: script name (compiled filename without extension)
+        :return: details dict, else None if the script isn't catalogued
+        """
+        script = self._scripts.get(name)
+        return script[1] if script else None
+
+    def get_entries(self) -> list:
+        """
+        Get the details of every catalogued script
+        :return: list of details dicts with script `name`, sorted by name
+        """
+        return [{"name": name, **self._scripts[name][1]} for name in self.names]
+
+    def match_synonym(self, utterance: str):
+        """
+        Find the script a synonym in an utterance starts. An exact synonym is a single lookup; otherwise the longest
+        synonym found in the utterance is used.
+        :param utterance: utterance or phrase to match
+        :return: script name, else None if no synonym matched
+        """
+        phrase = normalize_synonym(utterance)
+        if phrase in self._synonyms:
+            return self._synonyms[phrase]
+        words = phrase.split()
+        match, match_length = None, 0
+        for start in range(len(words)):
+            node = self._synonym_trie
+            for idx in range(start, len(words)):
+                node = node.get(words[idx])
+                if node is None:
+                    break
+                if None in node and idx + 1 - start > match_length:
+                    match, match_length = node[None], idx + 1 - start
+        return match
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compile and validate all scripts in a directory")
+    parser.add_argument("directory", nargs="?",
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "script_txt"))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default CPU count)")
+    parser.add_argument("--manifest", default=None, help=f"manifest path (default <directory>/{MANIFEST_FILENAME})")
+    args = parser.parse_args(args)
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    manifest = precompile_directory(args.directory, args.workers, args.manifest)
+    for name, entry in sorted(manifest["scripts"].items()):
+        status = "ERROR" if entry["errors"] else "ok"
+        print(f"{status:<6}{name:<40}{entry.get('size', 0):>10}B  {entry.get('compile_ms', 0) + entry['validate_ms']:8.2f}ms"
+              f"  {'; '.join(entry['errors'] + entry['warnings'])}")
+    print(f"{len(manifest['scripts'])} scripts, {manifest['errors']} with errors, {manifest['elapsed_ms']:.1f}ms")
+    return 1 if manifest["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
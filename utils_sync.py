@@ -0,0 +1,192 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+
+from queue import Queue
+from threading import Thread, RLock
+from ovos_utils.log import LOG
+
+
+class ScriptSyncWorker:
+    """
+    Keeps a local scripts directory in sync with a git remote from a background thread. Only scripts changed between
+    the local and remote revisions are reported, so derived data can be invalidated per script.
+    """
+    def __init__(self, repo_path, on_change=None, script_extensions=(".ncs", ".nct")):
+        """
+        :param repo_path: path to local scripts repository (created or cloned if missing)
+        :param on_change: callback with a set of changed script basenames; called while `lock` is held
+        :param script_extensions: file extensions considered scripts
+        """
+        self.repo_path = repo_path
+        self.on_change = on_change
+        self.script_extensions = script_extensions
+        self.lock = RLock()             # Held while the working tree is updated; hold it to read a consistent script
+        self._requests = Queue()
+        self._thread = None
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        """
+        Start the background worker if it isn't already running
+        """
+        if not self.running:
+            self._thread = Thread(target=self._run, name="ScriptSyncWorker", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the background worker after any queued syncs complete
+        :param timeout: seconds to wait for the worker to exit
+        """
+        if self.running:
+            self._requests.put(None)
+            self._thread.join(timeout)
+
+    def request_sync(self, remote_url, branch, callback=None):
+        """
+        Queue a sync to run in the background
+        :param remote_url: git remote to sync from
+        :param branch: remote branch to sync to
+        :param callback: optional callback with (success, changed_scripts) on completion
+        """
+        self.start()
+        self._requests.put((remote_url, branch, callback))
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            remote_url, branch, callback = request
+            try:
+                changed = self.sync(remote_url, branch)
+                success = True
+            except Exception as e:
+                LOG.error(e)
+                changed = set()
+                success = False
+            if callback:
+                try:
+                    callback(success, changed)
+                except Exception as e:
+                    LOG.error(e)
+
+    def sync(self, remote_url, branch):
+        """
+        Fetch `branch` from `remote_url` and update the local scripts to match it
+        :param remote_url: git remote to sync from
+        :param branch: remote branch to sync to
+        :return: set of changed script basenames (without extension)
+        """
+        import git
+        from git import InvalidGitRepositoryError
+        backup_path = f"{self.repo_path}_bak"
+        try:
+            if not os.path.isdir(self.repo_path):
+                os.makedirs(self.repo_path)
+            repo = git.Repo(self.repo_path)
+        except InvalidGitRepositoryError:
+            # Clone into a new path and swap it in so the existing scripts stay readable until the clone completes
+            clone_path = f"{self.repo_path}_clone"
+            if os.path.isdir(clone_path):
+                shutil.rmtree(clone_path)
+            git.Repo.clone_from(remote_url, clone_path, branch=branch)
+            with self.lock:
+                shutil.move(self.repo_path, backup_path)
+                shutil.move(clone_path, self.repo_path)
+                repo = git.Repo(self.repo_path)
+                changed = self._script_names(item.path for item in repo.head.commit.tree.traverse()
+                                             if item.type == "blob")
+                self._notify(changed)
+            self._backup_old_scripts(backup_path)
+            return changed
+
+        # Check for configuration repo change
+        if remote_url not in repo.remote("origin").urls:
+            LOG.debug("Update remote!")
+            repo.delete_remote("origin")
+            repo.create_remote("origin", remote_url)
+
+        fetched = repo.remote("origin").fetch(branch)
+        new_commit = fetched[0].commit
+        try:
+            old_commit = repo.head.commit
+            changed_paths = [path for diff in old_commit.diff(new_commit) for path in (diff.a_path, diff.b_path)]
+        except ValueError:
+            # Repository has no commits yet
+            old_commit = None
+            changed_paths = [item.path for item in new_commit.tree.traverse() if item.type == "blob"]
+
+        # Local modifications are discarded by the reset, so those scripts change too
+        changed_paths.extend(diff.a_path for diff in repo.index.diff(None))
+        if old_commit:
+            changed_paths.extend(diff.a_path for diff in repo.index.diff(old_commit))
+        changed = self._script_names(changed_paths)
+
+        if old_commit != new_commit or changed:
+            with self.lock:
+                repo.git.reset("--hard", new_commit.hexsha)
+                self._notify(changed)
+        LOG.debug(f"Synced {self.repo_path} to {new_commit.hexsha}; changed={changed}")
+        self._backup_old_scripts(backup_path)
+        return changed
+
+    def _script_names(self, paths):
+        """
+        Get the set of script basenames in the passed repository paths
+        :param paths: iterable of paths relative to the repository root
+        :return: set of script names without extensions
+        """
+        names = set()
+        for path in paths:
+            if path:
+                name, ext = os.path.splitext(os.path.basename(path))
+                if ext in self.script_extensions:
+                    names.add(name)
+        return names
+
+    def _notify(self, changed):
+        if changed and self.on_change:
+            try:
+                self.on_change(changed)
+            except Exception as e:
+                LOG.error(e)
+
+    def _backup_old_scripts(self, backup_path):
+        """
+        Move non-git scripts replaced by a clone into the repository backup directory
+        :param backup_path: path scripts were moved to before cloning
+        """
+        if os.path.isdir(backup_path):
+            shutil.move(backup_path, os.path.join(self.repo_path, "backup", "old"))
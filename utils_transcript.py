@@ -0,0 +1,736 @@
+# NEON AI (TM) SOFTWARE, Software Development Kit & Application Framework
+# All trademark and other rights reserved by their respective owners
+# Copyright 2008-2022 Neongecko.com Inc.
+# Contributors: Daniel McKnight, Guy Daniels, Elon Gasper, Richard Leeds,
+# Regina Bloomstine, Casimiro Ferreira, Andrii Pernatii, Kirill Hrymailo
+# BSD-3 License
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+# 1. Redistributions of source code must retain the above copyright notice,
+#    this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+# 3. Neither the name of the copyright holder nor the names of its
+#    contributors may be used to endorse or promote products derived from this
+#    software without specific prior written permission.
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+# THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR
+# CONTRIBUTORS  BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+# EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+# PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA,
+# OR PROFITS;  OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+# LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+# NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE,  EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Indexed store and compaction of script transcripts. Transcript lines are appended to a SQLite database with indexes by
+script, user, speaker, and time and a full-text index of what was said, so transcripts can be queried without reading
+every transcript file. Existing transcript files can be ingested in bulk with the `neon-cc-transcripts` command
+installed with the skill:
+
+    neon-cc-transcripts script_transcript
+
+Finished transcript files are rolled into compressed archives (one per day or per script) with an index of each
+transcript's offset, so a transcript can be read without decompressing the rest of its archive.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+
+from collections import OrderedDict
+from functools import partial
+from queue import Empty, Queue
+from threading import Lock, Thread
+from ovos_utils.log import LOG
+
+TRANSCRIPT_DB = "transcripts.db"
+TRANSCRIPT_EXT = ".txt"
+INGEST_BATCH_SIZE = 500
+RUN_CACHE_SIZE = 256  # Recently appended runs kept in memory; others are looked up in the `runs` table
+
+# `{script}_{start_time}.txt`; script names may contain underscores
+_TRANSCRIPT_FILE = re.compile(r"^(?P<script>.+)_(?P<start_time>\d+)\.txt$")
+# `{iso time}, {speaker} said: "{text}"`
+_TRANSCRIPT_LINE = re.compile(r'^(?P<time>[^,]+), (?P<speaker>.*?) said: "(?P<text>.*)"\s*$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    script TEXT NOT NULL,
+    user TEXT,
+    start_time INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    script TEXT NOT NULL,
+    user TEXT,
+    speaker TEXT NOT NULL,
+    time REAL NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_script ON runs(script, start_time);
+CREATE INDEX IF NOT EXISTS lines_run ON lines(run_id, time);
+CREATE INDEX IF NOT EXISTS lines_script ON lines(script, time);
+CREATE INDEX IF NOT EXISTS lines_user ON lines(user, time);
+CREATE INDEX IF NOT EXISTS lines_speaker ON lines(speaker, time);
+CREATE INDEX IF NOT EXISTS lines_time ON lines(time);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_text USING fts5(text, content='lines', content_rowid='id');
+"""
+
+# Transcript archives: an index (`.ntx`) naming the current data file (`.ntz`) of independently compressed transcripts
+ARCHIVE_DIR = "archive"
+ARCHIVE_EXT = ".ntz"
+ARCHIVE_INDEX_EXT = ".ntx"
+ARCHIVE_VERSION = 1
+ARCHIVE_GROUPS = ("day", "script")
+
+# Columns returned by `TranscriptStore.query`
+_LINE_COLUMNS = ("script", "user", "start_time", "speaker", "time", "text")
+
+
+def transcript_source(script: str, start_time: int) -> str:
+    """
+    Get the transcript filename for a script run
+    :param script: script filename (without extension)
+    :param start_time: epoch second the script started
+    :return: transcript filename
+    """
+    return f"{script}_{start_time}{TRANSCRIPT_EXT}"
+
+
+def parse_transcript(text: str) -> list:
+    """
+    Parse transcript text into lines
+    :param text: transcript text, as written by the skill
+    :return: list of (epoch time, speaker, text); lines that aren't something said (i.e. headers) are skipped
+    """
+    lines = []
+    for line in text.splitlines():
+        match = _TRANSCRIPT_LINE.match(line)
+        if not match:
+            continue
+        try:
+            timestamp = datetime.datetime.fromisoformat(match.group("time")).timestamp()
+        except ValueError:
+            continue
+        lines.append((timestamp, match.group("speaker"), match.group("text")))
+    return lines
+
+
+def _read_text(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+class TranscriptStore:
+    """
+    Append-only SQLite store of transcript lines, safe to use from multiple threads
+    """
+    def __init__(self, path: str):
+        """
+        :param path: database path
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+        self._runs = OrderedDict()  # Recently used transcript sources to (run id, script, user)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _get_run(self, script: str, start_time: int, user: str = None, source: str = None) -> tuple:
+        """
+        Get or create the run a transcript belongs to; call with `_lock` held
+        :return: (run id, script, user)
+        """
+        source = source or transcript_source(script, start_time)
+        run = self._runs.get(source)
+        if run:
+            self._runs.move_to_end(source)
+            return run
+        self._connection.execute("INSERT OR IGNORE INTO runs (source, script, user, start_time) "
+                                 "VALUES (?, ?, ?, ?)", (source, script, user, start_time))
+        run_id, user = self._connection.execute("SELECT id, user FROM runs WHERE source = ?", (source,)).fetchone()
+        run = self._runs[source] = (run_id, script, user)
+        if len(self._runs) > RUN_CACHE_SIZE:
+            self._runs.popitem(last=False)
+        return run
+
+    def _insert_lines(self, run: tuple, lines: list):
+        """
+        Insert lines of one run; call with `_lock` held inside a transaction
+        :param run: (run id, script, user)
+        :param lines: list of (epoch time, speaker, text)
+        """
+        run_id, script, user = run
+        for timestamp, speaker, text in lines:
+            cursor = self._connection.execute("INSERT INTO lines (run_id, script, user, speaker, time, text) "
+                                              "VALUES (?, ?, ?, ?, ?, ?)",
+                                              (run_id, script, user, speaker, timestamp, text))
+            self._connection.execute("INSERT INTO lines_text (rowid, text) VALUES (?, ?)", (cursor.lastrowid, text))
+
+    def append(self, script: str, start_time: int, transcript: str, user: str = None) -> int:
+        """
+        Append transcript text from a running script
+        :param script: script filename (without extension)
+        :param start_time: epoch second the script started
+        :param transcript: transcript text, as written to the transcript file
+        :param user: user running the script
+        :return: number of lines stored
+        """
+        lines = parse_transcript(transcript)
+        with self._lock, self._connection:
+            run = self._get_run(script, start_time, user)
+            self._insert_lines(run, lines)
+        return len(lines)
+
+    @staticmethod
+    def _find_transcripts(directory: str, known: set) -> dict:
+        """
+        Find transcripts in a directory and its archives that aren't in the store
+        :param directory: transcript directory
+        :param known: transcript sources already stored
+        :return: dict of transcript filenames to functions reading their text, archived text first
+        """
+        readers = dict()
+        archive_directory = os.path.join(directory, ARCHIVE_DIR)
+        if os.path.isdir(archive_directory):
+            for index_file in sorted(os.listdir(archive_directory)):
+                if not index_file.endswith(ARCHIVE_INDEX_EXT):
+                    continue
+                archive = TranscriptArchive(archive_directory, os.path.splitext(index_file)[0])
+                for filename in archive.entries:
+                    if filename not in known:
+                        readers.setdefault(filename, []).append(partial(archive.read, filename))
+        for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else ():
+            if _TRANSCRIPT_FILE.match(filename) and filename not in known:
+                readers.setdefault(filename, []).append(partial(_read_text, os.path.join(directory, filename)))
+        return readers
+
+    def ingest_directory(self, directory: str, batch_size: int = INGEST_BATCH_SIZE) -> dict:
+        """
+        Store transcripts from a directory, including those compacted into its archives, that haven't been stored
+        yet. Transcripts are stored in transactions of `batch_size` runs and the lock is released between them so
+        appended lines aren't held up
+        :param directory: transcript directory
+        :param batch_size: number of transcripts stored per transaction
+        :return: dict of runs and lines ingested and elapsed milliseconds
+        """
+        start = time.perf_counter()
+        with self._lock:
+            known = {row[0] for row in self._connection.execute("SELECT source FROM runs")}
+        readers = self._find_transcripts(directory, known)
+        filenames = sorted(readers)
+        runs, lines = 0, 0
+        for i in range(0, len(filenames), max(batch_size, 1)):
+            batch = []
+            for filename in filenames[i:i + max(batch_size, 1)]:
+                try:
+                    batch.append((filename, parse_transcript("".join(read() for read in readers[filename]))))
+                except (OSError, UnicodeDecodeError, KeyError, zlib.error):
+                    # Removed or rewritten by compaction while ingesting; read again on the next ingest
+                    continue
+            with self._lock, self._connection:
+                for filename, parsed in batch:
+                    # Runs appended to since ingesting started are already stored
+                    if self._connection.execute("SELECT 1 FROM runs WHERE source = ?", (filename,)).fetchone():
+                        continue
+                    match = _TRANSCRIPT_FILE.match(filename)
+                    run = self._get_run(match.group("script"), int(match.group("start_time")), source=filename)
+                    self._insert_lines(run, parsed)
+                    runs += 1
+                    lines += len(parsed)
+        return {"runs": runs, "lines": lines, "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+    @staticmethod
+    def _build_query(script=None, user=None, speaker=None, start=None, end=None, text=None, limit=100) -> tuple:
+        """
+        Build the SQL query for `query`
+        :return: (sql, parameters)
+        """
+        clauses, params = [], []
+        for column, value in (("lines.script", script), ("lines.user", user), ("lines.speaker", speaker)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("lines.time >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("lines.time <= ?")
+            params.append(end)
+        if text:
+            clauses.append("lines.id IN (SELECT rowid FROM lines_text WHERE lines_text MATCH ?)")
+            params.append(text)
+        sql = "SELECT lines.script, lines.user, runs.start_time, lines.speaker, lines.time, lines.text " \
+              "FROM lines JOIN runs ON runs.id = lines.run_id"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY lines.time, lines.id LIMIT ?"
+        params.append(limit)
+        return sql, params
+
+    def query(self, script: str = None, user: str = None, speaker: str = None, start: float = None,
+              end: float = None, text: str = None, limit: int = 100) -> list:
+        """
+        Get transcript lines matching all passed filters, oldest first
+        :param script: script filename (without extension)
+        :param user: user who ran the script
+        :param speaker: who said the line
+        :param start: earliest epoch time
+        :param end: latest epoch time
+        :param text: full-text query (SQLite FTS5 syntax) for what was said
+        :param limit: maximum lines to return
+        :return: list of dicts of script, user, start_time, speaker, time, and text
+        """
+        sql, params = self._build_query(script, user, speaker, start, end, text, limit)
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [dict(zip(_LINE_COLUMNS, row)) for row in rows]
+
+    def explain(self, **filters) -> list:
+        """
+        Get the SQLite query plan for a `query` with the passed filters
+        :return: list of query plan steps
+        """
+        sql, params = self._build_query(**filters)
+        with self._lock:
+            return [row[-1] for row in self._connection.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def get_runs(self, script: str = None, start: float = None, end: float = None, limit: int = 100) -> list:
+        """
+        Get script runs, newest first
+        :param script: script filename (without extension)
+        :param start: earliest epoch second a run started
+        :param end: latest epoch second a run started
+        :param limit: maximum runs to return
+        :return: list of dicts of script, user, start_time, and lines
+        """
+        clauses, params = [], []
+        if script is not None:
+            clauses.append("runs.script = ?")
+            params.append(script)
+        if start is not None:
+            clauses.append("runs.start_time >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("runs.start_time <= ?")
+            params.append(end)
+        sql = "SELECT script, user, start_time, (SELECT COUNT(*) FROM lines WHERE lines.run_id = runs.id) FROM runs"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY start_time DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [dict(zip(("script", "user", "start_time", "lines"), row)) for row in rows]
+
+
+def archive_name(filename: str, group_by: str = "day"):
+    """
+    Get the name of the archive a transcript file is compacted into
+    :param filename: transcript filename
+    :param group_by: "day" to archive transcripts by the date a run started, else "script"
+    :return: archive name, else None if filename isn't a transcript
+    """
+    match = _TRANSCRIPT_FILE.match(filename)
+    if not match:
+        return None
+    if group_by == "script":
+        return f"script_{match.group('script')}"
+    return f"day_{datetime.date.fromtimestamp(int(match.group('start_time'))).isoformat()}"
+
+
+class TranscriptArchive:
+    """
+    Compressed transcripts in one data file with an index of each transcript's offset. Transcripts are only appended
+    until some are removed, which writes a new data file; the index is replaced last, so an interrupted write leaves
+    the archive as it was.
+    """
+    def __init__(self, directory: str, name: str):
+        """
+        :param directory: archive directory
+        :param name: archive name (see `archive_name`)
+        """
+        self.directory = directory
+        self.name = name
+        self.index_path = os.path.join(directory, name + ARCHIVE_INDEX_EXT)
+        self.data_file = f"{name}-0{ARCHIVE_EXT}"
+        self.size = 0
+        self.entries = dict()  # Dict of transcript filenames to [offset, compressed length, length, start time]
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+            if index.get("version") == ARCHIVE_VERSION:
+                self.data_file, self.size, self.entries = index["data"], index["size"], index["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @property
+    def data_path(self) -> str:
+        return os.path.join(self.directory, self.data_file)
+
+    def _write_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": ARCHIVE_VERSION, "data": self.data_file, "size": self.size,
+                       "entries": self.entries}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def read(self, filename: str) -> str:
+        """
+        Read one transcript
+        :param filename: transcript filename
+        :return: transcript text
+        """
+        offset, length = self.entries[filename][:2]
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            return zlib.decompress(f.read(length)).decode("utf-8")
+
+    def add(self, transcripts: dict, level: int = 6) -> int:
+        """
+        Append transcripts. A transcript already in the archive is replaced by its archived text followed by the new
+        text, for a transcript file written to again after it was archived.
+        :param transcripts: dict of transcript filenames to (text bytes, run start time)
+        :param level: zlib compression level
+        :return: compressed bytes written
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        written = 0
+        with open(self.data_path, "ab") as f:
+            # Drop anything appended after the index was last written
+            f.truncate(self.size)
+            for filename, (data, start_time) in transcripts.items():
+                if filename in self.entries:
+                    data = self.read(filename).encode("utf-8") + data
+                compressed = zlib.compress(data, level)
+                f.write(compressed)
+                self.entries[filename] = [self.size, len(compressed), len(data), start_time]
+                self.size += len(compressed)
+                written += len(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_index()
+        return written
+
+    def remove(self, filenames) -> int:
+        """
+        Remove transcripts, copying the rest to a new data file without decompressing them
+        :param filenames: transcript filenames to remove
+        :return: bytes freed
+        """
+        keep = {name: entry for name, entry in self.entries.items() if name not in set(filenames)}
+        if len(keep) == len(self.entries):
+            return 0
+        old_path, old_size = self.data_path, self.size
+        if keep:
+            generation = int(os.path.splitext(self.data_file)[0].rsplit("-", 1)[1]) + 1
+            self.data_file = f"{self.name}-{generation}{ARCHIVE_EXT}"
+            entries, size = dict(), 0
+            with open(old_path, "rb") as old, open(self.data_path, "wb") as new:
+                for name, (offset, length, raw_length, start_time) in sorted(keep.items(), key=lambda e: e[1][0]):
+                    old.seek(offset)
+                    new.write(old.read(length))
+                    entries[name] = [size, length, raw_length, start_time]
+                    size += length
+                new.flush()
+                os.fsync(new.fileno())
+            self.entries, self.size = entries, size
+            self._write_index()
+        else:
+            os.remove(self.index_path)
+            self.entries, self.size = dict(), 0
+        if os.path.isfile(old_path):
+            os.remove(old_path)
+        return old_size - self.size
+
+
+class TranscriptCompactor:
+    """
+    Rolls finished transcript files into compressed archives from a background thread, and removes archived
+    transcripts of runs older than the retention period
+    """
+    def __init__(self, directory: str, group_by: str = "day", retention_days: float = 0, level: int = 6,
+                 min_age: float = 86400):
+        """
+        :param directory: transcript directory; archives are written to `ARCHIVE_DIR` in it
+        :param group_by: "day" to archive transcripts by the date a run started, else "script"
+        :param retention_days: days archived transcripts are kept for (0 keeps them indefinitely)
+        :param level: zlib compression level
+        :param min_age: seconds since a transcript file was modified before a sweep considers it finished
+        """
+        if group_by not in ARCHIVE_GROUPS:
+            raise ValueError(f"group_by must be one of {ARCHIVE_GROUPS}")
+        self.directory = directory
+        self.archive_directory = os.path.join(directory, ARCHIVE_DIR)
+        self.group_by = group_by
+        self.retention_days = retention_days
+        self.level = level
+        self.min_age = min_age
+        self.lock = Lock()  # Held while archives are written
+        self._requests = Queue()
+        self._thread = None
+        self._archives = dict()  # Dict of archive names to (index mtime_ns, TranscriptArchive)
+        self._metrics = {"transcripts": 0, "bytes_in": 0, "bytes_out": 0, "disk_bytes_in": 0, "expired": 0,
+                         "bytes_expired": 0, "elapsed_ms": 0.0}
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        """
+        Start the background worker if it isn't already running
+        """
+        if not self.running:
+            self._thread = Thread(target=self._run, name="TranscriptCompactor", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the background worker after any queued compaction completes
+        :param timeout: seconds to wait for the worker to exit
+        """
+        if self.running:
+            self._requests.put(None)
+            self._thread.join(timeout)
+
+    def request_compaction(self, filenames=None):
+        """
+        Queue compaction of finished transcripts in the background
+        :param filenames: transcript filenames known to be finished, else None to sweep the directory for transcripts
+                          not modified in `min_age` seconds
+        """
+        self.start()
+        self._requests.put(tuple(filenames) if filenames else ())
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            # Requests queued while compacting are handled together
+            requests = [request]
+            while True:
+                try:
+                    requests.append(self._requests.get_nowait())
+                except Empty:
+                    break
+            stop = None in requests
+            requests = [request for request in requests if request is not None]
+            try:
+                if any(not request for request in requests):
+                    self.compact()
+                elif requests:
+                    self.compact({filename for request in requests for filename in request})
+                self.apply_retention()
+            except Exception as e:
+                LOG.error(e)
+            if stop:
+                break
+
+    def _get_archive(self, name: str) -> TranscriptArchive:
+        """
+        Get an archive, loading its index again only if it changed since it was last loaded; call with `lock` held
+        :param name: archive name
+        :return: TranscriptArchive
+        """
+        try:
+            mtime = os.stat(os.path.join(self.archive_directory, name + ARCHIVE_INDEX_EXT)).st_mtime_ns
+        except OSError:
+            # Not written yet
+            return TranscriptArchive(self.archive_directory, name)
+        cached = self._archives.get(name)
+        if not cached or cached[0] != mtime:
+            cached = (mtime, TranscriptArchive(self.archive_directory, name))
+            self._archives[name] = cached
+        return cached[1]
+
+    def _update_archive(self, archive: TranscriptArchive):
+        """
+        Keep an archive this compactor wrote loaded; call with `lock` held
+        """
+        try:
+            self._archives[archive.name] = (os.stat(archive.index_path).st_mtime_ns, archive)
+        except OSError:
+            self._archives.pop(archive.name, None)
+
+    def _find_finished(self) -> list:
+        """
+        Find transcript files not modified within `min_age` seconds
+        """
+        cutoff = time.time() - self.min_age
+        finished = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if _TRANSCRIPT_FILE.match(entry.name) and entry.is_file() and entry.stat().st_mtime < cutoff:
+                    finished.append(entry.name)
+        return finished
+
+    def compact(self, filenames=None) -> dict:
+        """
+        Move transcript files into archives
+        :param filenames: transcript filenames to archive, else None to archive all finished transcripts
+        :return: dict of transcripts archived, bytes read and written, and elapsed milliseconds
+        """
+        start = time.perf_counter()
+        with self.lock:
+            if filenames is None:
+                filenames = self._find_finished() if os.path.isdir(self.directory) else []
+            archives = dict()
+            disk_bytes = 0
+            for filename in sorted(filenames):
+                match = _TRANSCRIPT_FILE.match(filename)
+                if not match:
+                    continue
+                path = os.path.join(self.directory, filename)
+                try:
+                    stat = os.stat(path)
+                    with open(path, "rb") as f:
+                        data = f.read()
+                except OSError:
+                    continue
+                disk_bytes += getattr(stat, "st_blocks", 0) * 512 or stat.st_size
+                archives.setdefault(archive_name(filename, self.group_by), dict())[filename] = \
+                    (data, int(match.group("start_time")))
+            bytes_in, bytes_out, count = 0, 0, 0
+            for name, transcripts in archives.items():
+                archive = self._get_archive(name)
+                bytes_out += archive.add(transcripts, self.level)
+                self._update_archive(archive)
+                # Transcript files are removed once the archive index includes them
+                for filename, (data, _) in transcripts.items():
+                    os.remove(os.path.join(self.directory, filename))
+                    bytes_in += len(data)
+                    count += 1
+            elapsed = (time.perf_counter() - start) * 1000
+            self._metrics["transcripts"] += count
+            self._metrics["bytes_in"] += bytes_in
+            self._metrics["bytes_out"] += bytes_out
+            self._metrics["disk_bytes_in"] += disk_bytes
+            self._metrics["elapsed_ms"] += elapsed
+        if count:
+            LOG.info(f"Archived {count} transcripts, {bytes_in}B -> {bytes_out}B in {elapsed:.1f}ms")
+        return {"transcripts": count, "bytes_in": bytes_in, "bytes_out": bytes_out, "elapsed_ms": round(elapsed, 3)}
+
+    def _archive_names(self) -> list:
+        """
+        Get the names of archives in `archive_directory`
+        """
+        if not os.path.isdir(self.archive_directory):
+            return []
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(self.archive_directory)
+                      if f.endswith(ARCHIVE_INDEX_EXT))
+
+    def apply_retention(self, now: float = None) -> int:
+        """
+        Remove archived transcripts of runs started more than `retention_days` ago
+        :param now: current epoch time (default now)
+        :return: number of transcripts removed
+        """
+        if not self.retention_days:
+            return 0
+        cutoff = (now or time.time()) - self.retention_days * 86400
+        removed = 0
+        with self.lock:
+            for name in self._archive_names():
+                archive = self._get_archive(name)
+                expired = [filename for filename, entry in archive.entries.items() if entry[3] < cutoff]
+                if expired:
+                    self._metrics["bytes_expired"] += archive.remove(expired)
+                    self._update_archive(archive)
+                    removed += len(expired)
+            self._metrics["expired"] += removed
+        return removed
+
+    def read(self, filename: str) -> str:
+        """
+        Read a transcript, whether archived or not
+        :param filename: transcript filename
+        :return: transcript text
+        """
+        path = os.path.join(self.directory, filename)
+        text = ""
+        with self.lock:
+            for group_by in ARCHIVE_GROUPS:
+                name = archive_name(filename, group_by)
+                archive = self._get_archive(name) if name else None
+                if archive and filename in archive.entries:
+                    text = archive.read(filename)
+                    break
+            if os.path.isfile(path):
+                with open(path) as f:
+                    text += f.read()
+            elif not text:
+                raise FileNotFoundError(filename)
+        return text
+
+    def get_metrics(self) -> dict:
+        """
+        Get counts of transcripts archived and expired, bytes read, written, and saved, and compaction throughput
+        """
+        with self.lock:
+            metrics = dict(self._metrics)
+        metrics["bytes_saved"] = metrics["bytes_in"] - metrics["bytes_out"]
+        # Each transcript file used at least one filesystem block
+        metrics["disk_bytes_saved"] = metrics["disk_bytes_in"] - metrics["bytes_out"]
+        metrics["throughput_mb_s"] = round(metrics["bytes_in"] / metrics["elapsed_ms"] / 1000, 3) \
+            if metrics["elapsed_ms"] else 0.0
+        metrics["elapsed_ms"] = round(metrics["elapsed_ms"], 3)
+        return metrics
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Ingest transcript files into the transcript store and optionally "
+                                                 "archive finished transcripts")
+    parser.add_argument("directory", nargs="?",
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "script_transcript"))
+    parser.add_argument("--db", default=None, help=f"database path (default <directory>/{TRANSCRIPT_DB})")
+    parser.add_argument("--no-index", action="store_true", help="don't ingest transcripts into the database")
+    parser.add_argument("--compact", action="store_true", help="archive transcripts not modified in --min-age seconds")
+    parser.add_argument("--group-by", choices=ARCHIVE_GROUPS, default="day", help="archive per day or per script")
+    parser.add_argument("--min-age", type=float, default=86400)
+    parser.add_argument("--retention-days", type=float, default=0, help="days to keep archived transcripts (0: all)")
+    args = parser.parse_args(args)
+    if not os.path.isdir(args.directory):
+        parser.error(f"{args.directory} is not a directory")
+    if not args.no_index:
+        store = TranscriptStore(args.db or os.path.join(args.directory, TRANSCRIPT_DB))
+        result = store.ingest_directory(args.directory)
+        store.close()
+        print(f"{result['runs']} transcripts, {result['lines']} lines indexed in {result['elapsed_ms']:.1f}ms")
+    if args.compact:
+        compactor = TranscriptCompactor(args.directory, args.group_by, args.retention_days, min_age=args.min_age)
+        compactor.compact()
+        compactor.apply_retention()
+        metrics = compactor.get_metrics()
+        print(f"{metrics['transcripts']} transcripts archived, {metrics['bytes_in']}B -> {metrics['bytes_out']}B "
+              f"({metrics['disk_bytes_saved']}B disk saved) at {metrics['throughput_mb_s']}MB/s; "
+              f"{metrics['expired']} expired")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())